@@ -3,16 +3,28 @@ Django settings for refugee_management project.
 """
 
 import os
+import socket
+import sys
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Settings profile, chosen with DJANGO_PROFILE: dev (the default), test or prod.
+# `manage.py test` uses the test profile unless told otherwise.
+PROFILE = os.environ.get('DJANGO_PROFILE') or ('test' if sys.argv[1:2] == ['test'] else 'dev')
+if PROFILE not in ('dev', 'test', 'prod'):
+    raise ImproperlyConfigured('DJANGO_PROFILE must be one of: dev, test, prod')
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-vfvmz43m$eipuz2pg!5^1x4^)9+gu_pmr)ct0ie@6+svs^&6=)'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-vfvmz43m$eipuz2pg!5^1x4^)9+gu_pmr)ct0ie@6+svs^&6=)')
+if PROFILE == 'prod' and 'DJANGO_SECRET_KEY' not in os.environ:
+    raise ImproperlyConfigured('The prod profile needs DJANGO_SECRET_KEY.')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = PROFILE != 'prod'
 
 ALLOWED_HOSTS = []
 
@@ -54,12 +66,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'refugees.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'refugees.routers.PrimaryPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'refugees.sessions.SlidingSessionMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -67,7 +82,8 @@ ROOT_URLCONF = 'refugee_ms.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the request instrumentation
+        'BACKEND': 'refugees.instrumentation.InstrumentedTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,12 +100,127 @@ TEMPLATES = [
 WSGI_APPLICATION = 'refugee_ms.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
+# PostgreSQL is used when POSTGRES_DB is set, and is required by the prod profile. The
+# test profile also picks up a local PostgreSQL server when one answers; otherwise
+# development and tests run on SQLite.
+POSTGRES_HOST = os.environ.get('POSTGRES_HOST', 'localhost')
+POSTGRES_PORT = int(os.environ.get('POSTGRES_PORT', 5432))
+
+
+def postgres_reachable():
+    try:
+        import psycopg  # noqa: F401
+        with socket.create_connection((POSTGRES_HOST, POSTGRES_PORT), timeout=0.5):
+            return True
+    except (ImportError, OSError):
+        return False
+
+
+USE_POSTGRES = 'POSTGRES_DB' in os.environ or (PROFILE == 'test' and postgres_reachable())
+if PROFILE == 'prod' and not USE_POSTGRES:
+    raise ImproperlyConfigured('The prod profile needs PostgreSQL: set POSTGRES_DB and friends.')
+
+if USE_POSTGRES:
+    # DB_POOL picks how connections are reused:
+    #   persistent - each worker keeps its connection open for DB_CONN_MAX_AGE seconds
+    #   psycopg    - each worker keeps a psycopg connection pool (needs psycopg[pool])
+    #   pgbouncer  - connect through a server-side pooler such as PgBouncer in transaction
+    #                mode, which cannot keep the server-side cursors .iterator() would use
+    DB_POOL = os.environ.get('DB_POOL', 'persistent')
+    if DB_POOL not in ('persistent', 'psycopg', 'pgbouncer'):
+        raise ImproperlyConfigured('DB_POOL must be one of: persistent, psycopg, pgbouncer')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'refugee_ms'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': POSTGRES_HOST,
+            'PORT': POSTGRES_PORT,
+            # A pool manages connection lifetimes itself, so persistent connections are off there
+            'CONN_MAX_AGE': 0 if DB_POOL == 'psycopg' else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            # Check reused connections before each request instead of failing on a dead one
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': DB_POOL == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': 5,
+                'application_name': 'refugee_ms',
+            },
+            'TEST': {
+                'NAME': os.environ.get('POSTGRES_TEST_DB', 'test_refugee_ms'),
+            },
+        }
+    }
+    if DB_POOL == 'psycopg':
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': 10,
+        }
+    # Streaming replicas for read traffic, as comma-separated host[:port] entries
+    for number, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+        host, _, port = replica.strip().partition(':')
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': int(port or POSTGRES_PORT),
+            'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+            'TEST': {'MIRROR': 'default'},
+        }
+    INSTALLED_APPS.append('django.contrib.postgres')
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Tuned SQLite for offices that stay on it (SQLITE_TUNING=1). refugees.sqlite applies these
+# pragmas to each new connection: WAL lets readers carry on while a write commits, and
+# busy_timeout makes writers wait for the lock instead of failing at once.
+SQLITE_TUNING = not USE_POSTGRES and os.environ.get('SQLITE_TUNING') == '1'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # negative sizes are in KiB
+    'temp_store': 'memory',
+} if SQLITE_TUNING else {}
+if SQLITE_TUNING:
+    # Take the write lock when a transaction starts, so busy_timeout covers it; a deferred
+    # transaction that reads first fails outright if another writer got in meanwhile
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# With SQLITE_READ_ALIAS=1 the read-only views read through a second, read-only
+# connection to the same file, so they never queue behind a write transaction
+if not USE_POSTGRES and os.environ.get('SQLITE_READ_ALIAS') == '1':
+    DATABASES['readonly'] = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
     }
-}
+
+# Read-only views (dashboard, lists, details) spread their reads over these aliases;
+# a client's reads return to the primary for READ_YOUR_WRITES_SECONDS after it writes
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+DATABASE_ROUTERS = ['refugees.routers.ReplicaRouter']
+
+# Request instrumentation (refugees/instrumentation.py): the share of requests whose
+# queries, SQL and template time and response size are recorded, how many records each
+# process keeps in memory (summarized for staff at /perf/), and a file they are appended
+# to every PERF_FLUSH_EVERY records for `manage.py perfreport`
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', {'dev': 1.0, 'test': 0.0, 'prod': 0.01}[PROFILE]))
+PERF_BUFFER_SIZE = int(os.environ.get('PERF_BUFFER_SIZE', 10000))
+PERF_LOG_FILE = os.environ.get('PERF_LOG_FILE', '')
+PERF_FLUSH_EVERY = int(os.environ.get('PERF_FLUSH_EVERY', 100))
+
+# Serve the read-only pages with their async variants (refugees/async_views.py). asgi.py
+# turns this on; under WSGI each async view would run in an event loop of its own
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -126,6 +257,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # Refugee documents and CVs: one copy per distinct content under MEDIA_ROOT/blobs
+    'documents': {'BACKEND': 'refugees.storage.ContentAddressedStorage'},
+}
+
+# Documents stream straight into their storage; other uploads use Django's usual handlers
+FILE_UPLOAD_HANDLERS = [
+    'refugees.uploads.DocumentUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -138,8 +283,26 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
 # Session settings
+# SESSION_STRATEGY picks where sessions live:
+#   cached_db      - cache in front of the database; reads skip the database, writes go to both
+#   cache          - cache only; fastest, but sessions are lost if the cache is flushed
+#   signed_cookies - the session travels in a signed cookie; no server-side storage at all
+#   db             - database only
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_STRATEGY = os.environ.get('SESSION_STRATEGY', 'cached_db')
+if SESSION_STRATEGY not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_STRATEGY must be one of: {', '.join(SESSION_ENGINES)}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_STRATEGY]
 SESSION_COOKIE_AGE = 86400  # 1 day in seconds
-SESSION_SAVE_EVERY_REQUEST = True
+# Sliding expiry: rather than saving on every request, SlidingSessionMiddleware rewrites
+# a session (renewing its expiry) only once less than this many seconds of it remain
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_WITHIN = SESSION_COOKIE_AGE // 2
 
 # Crispy forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
@@ -166,7 +329,7 @@ MESSAGE_TAGS = {
     messages.ERROR: 'alert-danger',
 }
 
-# REST Framework settings (if you plan to add API functionality)
+# REST Framework settings for the versioned API under /api/v1/
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -175,8 +338,22 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10,
+    'DEFAULT_PAGINATION_CLASS': 'refugees.pagination.ApiCursorPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.URLPathVersioning',
+    'DEFAULT_VERSION': 'v1',
+    'ALLOWED_VERSIONS': ['v1'],
+    # The browsable API renders HTML forms per response; only offer it while developing
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'] + (
+        ['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+}
+
+# Cache for list and dashboard fragments; each process keeps its own while developing
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'refugee-ms',
+    }
 }
 
 # Security settings (for production)
@@ -191,10 +368,10 @@ if not DEBUG:
     SECURE_CONTENT_TYPE_NOSNIFF = True
     X_FRAME_OPTIONS = 'DENY'
     
-    # Cache settings for production
+    # Cache settings for production: shared by every worker, so invalidation reaches them all
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
-            'LOCATION': '127.0.0.1:11211',
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
         }
     }
@@ -1,39 +1,146 @@
-from django.contrib import admin
-from .models import CustomUser, Refugee, Housing, Job, JobApplication, HousingApplication
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q
+from django.shortcuts import render
+from django.urls import path
+from django.utils.text import smart_split, unescape_string_literal
+from .intake import IntakeFormatError, import_refugees
+from .models import CustomUser, Refugee, Housing, Job, JobApplication, HousingApplication, Task
+from .pagination import ApproximateCountPaginator
+
+# Rejected rows listed on the intake result page
+INTAKE_ERRORS_SHOWN = 200
+
+# Lookups for the admin's search_fields prefixes; unprefixed fields match substrings
+SEARCH_LOOKUPS = {'^': 'istartswith', '=': 'iexact', '@': 'search'}
+
+
+class RefugeeImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV or XLSX sheet with one refugee per row')
+    dry_run = forms.BooleanField(required=False, label='Validate only')
+
+def search_condition(model, path, lookup, term):
+    """Match term on a field reached through forward relations, as nested id subqueries.
+
+    Joining would make the database walk the changelist's own table; with subqueries it
+    starts from the searched column's index and looks rows up by foreign key.
+    """
+    name, *rest = path
+    if not rest:
+        return Q(**{f'{name}__{lookup}': term})
+    related = model._meta.get_field(name).related_model
+    matches = related._default_manager.filter(search_condition(related, rest, lookup, term))
+    return Q(**{f'{name}__in': matches.values('pk')})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables too big to count on every page view.
+
+    Search fields should be prefix (^) or exact (=) lookups on the columns given a
+    case-insensitive index in migration 0010; a substring search scans the table.
+    """
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        if not search_fields or not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        condition = Q()
+        for term in smart_split(search_term):
+            if term.startswith(('"', "'")) and term[0] == term[-1]:
+                term = unescape_string_literal(term)
+            term_condition = Q()
+            for field in search_fields:
+                lookup = SEARCH_LOOKUPS.get(field[0], 'icontains')
+                term_condition |= search_condition(self.model, field.lstrip('^=@').split('__'), lookup, term)
+            condition &= term_condition
+        # Search only follows forward relations, so it cannot duplicate rows
+        return queryset.filter(condition), False
 
 
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name', 'user_type')
     list_filter = ('user_type',)
-    search_fields = ('username', 'email', 'first_name', 'last_name')
+    search_fields = ('^username', '=email', '^first_name', '^last_name')
 
 @admin.register(Refugee)
-class RefugeeAdmin(admin.ModelAdmin):
+class RefugeeAdmin(LargeTableAdmin):
     list_display = ('user', 'country_of_origin', 'family_size', 'registered_at', 'status')
     list_filter = ('country_of_origin', 'status')
-    search_fields = ('user__username', 'user__email', 'country_of_origin')
+    list_select_related = ('user',)
+    search_fields = ('^user__username', '=user__email', '^country_of_origin')
+    autocomplete_fields = ('user',)
+    change_list_template = 'admin/refugees/refugee/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='refugees_refugee_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        result = None
+        if request.method == 'POST':
+            form = RefugeeImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                try:
+                    result = import_refugees(upload, upload.name, dry_run=form.cleaned_data['dry_run'])
+                except IntakeFormatError as error:
+                    messages.error(request, str(error))
+                else:
+                    verb = 'would be imported' if form.cleaned_data['dry_run'] else 'imported'
+                    messages.success(request, f'{result.created} of {result.rows} refugees {verb}; '
+                                              f'{result.failed} rows rejected.')
+        else:
+            form = RefugeeImportForm()
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import refugees',
+            'form': form,
+            'result': result,
+            'errors': result.errors[:INTAKE_ERRORS_SHOWN] if result else [],
+        }
+        return render(request, 'admin/refugees/refugee/import.html', context)
 
 @admin.register(Housing)
-class HousingAdmin(admin.ModelAdmin):
+class HousingAdmin(LargeTableAdmin):
     list_display = ('name', 'location', 'housing_type', 'capacity', 'current_occupancy', 'status')
     list_filter = ('housing_type', 'status')
-    search_fields = ('name', 'location')
+    search_fields = ('^name', '^location')
+    raw_id_fields = ('ngo',)
 
 @admin.register(Job)
-class JobAdmin(admin.ModelAdmin):
+class JobAdmin(LargeTableAdmin):
     list_display = ('title', 'employer', 'location', 'job_type', 'posted_at', 'deadline', 'is_active')
     list_filter = ('job_type', 'is_active')
-    search_fields = ('title', 'employer', 'location')
+    search_fields = ('^title', '^employer', '^location')
+    raw_id_fields = ('ngo',)
 
 @admin.register(JobApplication)
-class JobApplicationAdmin(admin.ModelAdmin):
+class JobApplicationAdmin(LargeTableAdmin):
     list_display = ('refugee', 'job', 'status', 'applied_at', 'last_updated')
     list_filter = ('status', 'applied_at')
-    search_fields = ('refugee__user__username', 'job__title')
+    list_select_related = ('refugee__user', 'job')
+    search_fields = ('^refugee__user__username', '^job__title')
+    autocomplete_fields = ('refugee', 'job')
 
 @admin.register(HousingApplication)
-class HousingApplicationAdmin(admin.ModelAdmin):
+class HousingApplicationAdmin(LargeTableAdmin):
     list_display = ('refugee', 'housing', 'status', 'application_date', 'decision_date')
     list_filter = ('status', 'application_date')
-    search_fields = ('refugee__user__username', 'housing__name')
+    list_select_related = ('refugee__user', 'housing')
+    search_fields = ('^refugee__user__username', '^housing__name')
+    autocomplete_fields = ('refugee', 'housing')
+
+@admin.register(Task)
+class TaskAdmin(LargeTableAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
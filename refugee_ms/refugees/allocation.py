@@ -0,0 +1,264 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Housing, HousingApplication, Refugee
+from .counters import counter_keys, mark_counted, move
+from .caching import expire_scopes, invalidation_scopes
+
+# Search nodes the exact solver may visit before settling for the best allocation found so far
+EXACT_SOLVER_NODE_LIMIT = 200000
+# Larger instances go straight to the greedy result; the search recurses once per family
+EXACT_SOLVER_MAX_FAMILIES = 200
+
+
+class SearchBudgetExceeded(Exception):
+    pass
+
+
+class Allocation:
+    """A proposed set of housing approvals and the people they house"""
+
+    def __init__(self, assignments, units, exact=False):
+        self.assignments = assignments
+        self.units = units
+        self.exact = exact
+
+    @property
+    def people_housed(self):
+        return sum(application.refugee.family_size for application in self.assignments)
+
+    @property
+    def application_ids(self):
+        return [application.pk for application in self.assignments]
+
+    def __len__(self):
+        return len(self.assignments)
+
+
+def remaining_capacity(housing):
+    return max(housing.capacity - housing.current_occupancy, 0)
+
+
+def pending_applications(ngo=None):
+    """Pending applications for allocatable units from families not yet housed"""
+    already_housed = HousingApplication.objects.filter(refugee=OuterRef('refugee'), status='approved')
+    queryset = HousingApplication.objects.select_related('refugee__user', 'housing').filter(
+        status='pending', housing__status='available',
+    ).exclude(Exists(already_housed))
+    if ngo is not None:
+        queryset = queryset.filter(housing__ngo=ngo)
+    return list(queryset.order_by('application_date', 'pk'))
+
+
+def greedy_allocation(applications, capacities):
+    """Best-fit decreasing: place the largest families first, each in the tightest unit it applied to"""
+    by_refugee = defaultdict(list)
+    for application in applications:
+        by_refugee[application.refugee_id].append(application)
+    # Larger families are harder to place; among equals, earlier applicants go first
+    families = sorted(by_refugee.values(), key=lambda apps: (-apps[0].refugee.family_size, apps[0].application_date))
+
+    remaining = dict(capacities)
+    assignments = []
+    for family_applications in families:
+        size = family_applications[0].refugee.family_size
+        fitting = [app for app in family_applications if remaining.get(app.housing_id, 0) >= size]
+        if not fitting:
+            continue
+        choice = min(fitting, key=lambda app: (remaining[app.housing_id] - size, app.application_date))
+        remaining[choice.housing_id] -= size
+        assignments.append(choice)
+    return assignments
+
+
+def exact_allocation(applications, capacities, lower_bound=(), node_limit=EXACT_SOLVER_NODE_LIMIT):
+    """Branch and bound over families.
+
+    Returns (assignments, proven_optimal). When the node budget runs out the best
+    allocation found so far, never worse than lower_bound, is returned unproven.
+    """
+    by_refugee = defaultdict(list)
+    for application in applications:
+        by_refugee[application.refugee_id].append(application)
+    families = sorted(by_refugee.values(), key=lambda apps: -apps[0].refugee.family_size)
+    if len(families) > EXACT_SOLVER_MAX_FAMILIES:
+        return list(lower_bound), False
+    sizes = [apps[0].refugee.family_size for apps in families]
+    # suffix[i] is the most people that families[i:] could possibly add
+    suffix = [0] * (len(families) + 1)
+    for i in range(len(families) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + sizes[i]
+
+    best = {'people': sum(app.refugee.family_size for app in lower_bound), 'assignments': list(lower_bound)}
+    remaining = dict(capacities)
+    chosen = []
+    visited = [0]
+
+    def search(i, people):
+        visited[0] += 1
+        if visited[0] > node_limit:
+            raise SearchBudgetExceeded
+        if people > best['people']:
+            best['people'] = people
+            best['assignments'] = list(chosen)
+        if i == len(families) or people + suffix[i] <= best['people']:
+            return
+        size = sizes[i]
+        for application in families[i]:
+            if remaining.get(application.housing_id, 0) >= size:
+                remaining[application.housing_id] -= size
+                chosen.append(application)
+                search(i + 1, people + size)
+                chosen.pop()
+                remaining[application.housing_id] += size
+        search(i + 1, people)
+
+    try:
+        search(0, 0)
+    except SearchBudgetExceeded:
+        return best['assignments'], False
+    return best['assignments'], True
+
+
+def propose_allocation(ngo=None, exact=True):
+    """Choose which pending applications to approve so the most people are housed within capacity.
+
+    Each family is housed at most once, only in a unit it applied to, and no unit
+    is filled beyond its remaining capacity.
+    """
+    applications = pending_applications(ngo)
+    units = {app.housing_id: app.housing for app in applications}
+    capacities = {housing_id: remaining_capacity(housing) for housing_id, housing in units.items()}
+
+    assignments = greedy_allocation(applications, capacities)
+    optimal = False
+    if exact:
+        assignments, optimal = exact_allocation(applications, capacities, lower_bound=assignments)
+    assignments.sort(key=lambda app: (app.housing.name, app.application_date))
+    return Allocation(assignments, units, exact=optimal)
+
+
+def apply_allocation(application_ids, ngo=None):
+    """Approve the given applications in one transaction.
+
+    Each approval re-checks capacity as it claims room, so the batch is safe to apply
+    after review even if other decisions were made meanwhile. Returns (approved, skipped):
+    the approved applications and the ids of those that could no longer be approved.
+    """
+    approved, skipped = [], []
+    with transaction.atomic():
+        for application_id in sorted(set(int(pk) for pk in application_ids)):
+            try:
+                approved.append(approve_housing_application(application_id, ngo=ngo))
+            except (ApprovalError, HousingApplication.DoesNotExist):
+                skipped.append(application_id)
+    return approved, skipped
+
+
+class ApprovalError(Exception):
+    """Raised when an application cannot be moved to the requested status"""
+
+
+def locked_application(application_id, ngo=None):
+    queryset = HousingApplication.objects.select_related('housing', 'refugee__user')
+    if ngo is not None:
+        queryset = queryset.filter(housing__ngo=ngo)
+    return queryset.select_for_update(of=('self',)).get(pk=application_id)
+
+
+def approve_housing_application(application_id, ngo=None):
+    """Approve a pending application and claim room for the family in one transaction.
+
+    Room is claimed with a guarded UPDATE that only matches while the unit is available
+    and the family still fits, so concurrent approvals can never overfill a unit, even
+    on backends without row locks. The unit is marked occupied once it is full. The
+    refugee row is locked before checking for an earlier approval, and the
+    housingapp_one_approved_per_refugee constraint backs that check up, so a family is
+    never housed twice.
+    """
+    with transaction.atomic():
+        application = locked_application(application_id, ngo)
+        housing = application.housing
+        size = application.refugee.family_size
+        if application.status != 'pending':
+            raise ApprovalError(f'This application has already been {application.status}.')
+        # Lock the family so two approvals of its applications for different units queue up here
+        Refugee.objects.select_for_update().get(pk=application.refugee_id)
+        if HousingApplication.objects.filter(refugee_id=application.refugee_id, status='approved').exists():
+            raise ApprovalError(f'{application.refugee.user.get_full_name()} already has approved housing.')
+
+        now = timezone.now()
+        claimed = Housing.objects.filter(
+            pk=housing.pk, status='available', current_occupancy__lte=F('capacity') - size,
+        ).update(current_occupancy=F('current_occupancy') + size, last_updated=now)
+        if not claimed:
+            raise ApprovalError(f'{housing.name} no longer has room for a family of {size}.')
+        filled = Housing.objects.filter(
+            pk=housing.pk, status='available', current_occupancy__gte=F('capacity'),
+        ).update(status='occupied', last_updated=now)
+        try:
+            decided = HousingApplication.objects.filter(pk=application.pk, status='pending').update(
+                status='approved', decision_date=now, last_updated=now,
+            )
+        except IntegrityError:
+            # housingapp_one_approved_per_refugee, where row locks did not serialize the approvals
+            raise ApprovalError(f'{application.refugee.user.get_full_name()} already has approved housing.')
+        if not decided:
+            # Someone else decided it first; leaving the block rolls back the claimed room
+            raise ApprovalError('This application was decided by someone else.')
+
+        # Queryset updates skip the model signals, so move the dashboard counters here
+        move(counter_keys(application), ['housing_applications_total'])
+        if filled:
+            move([f'housing_{housing.housing_type}_available'], [f'housing_{housing.housing_type}_occupied'])
+        # ...and retire the cached fragments showing either row
+        expire_scopes(invalidation_scopes(application) + invalidation_scopes(housing))
+
+    application.status = 'approved'
+    application.decision_date = now
+    housing.refresh_from_db()
+    mark_counted(application)
+    mark_counted(housing)
+    return application
+
+
+def reject_housing_application(application_id, ngo=None):
+    """Reject an application, releasing the family's room if it had been approved"""
+    with transaction.atomic():
+        application = locked_application(application_id, ngo)
+        housing = application.housing
+        previous_status = application.status
+        if previous_status == 'rejected':
+            raise ApprovalError('This application has already been rejected.')
+
+        now = timezone.now()
+        decided = HousingApplication.objects.filter(pk=application.pk, status=previous_status).update(
+            status='rejected', decision_date=now, last_updated=now,
+        )
+        if not decided:
+            raise ApprovalError('This application was decided by someone else.')
+        old_keys = counter_keys(application)
+        application.status = 'rejected'
+        move(old_keys, counter_keys(application))
+
+        if previous_status == 'approved':
+            Housing.objects.filter(pk=housing.pk).update(
+                current_occupancy=Greatest(F('current_occupancy') - application.refugee.family_size, 0),
+                last_updated=now,
+            )
+            reopened = Housing.objects.filter(
+                pk=housing.pk, status='occupied', current_occupancy__lt=F('capacity'),
+            ).update(status='available', last_updated=now)
+            if reopened:
+                move([f'housing_{housing.housing_type}_occupied'], [f'housing_{housing.housing_type}_available'])
+        expire_scopes(invalidation_scopes(application) + invalidation_scopes(housing))
+
+    application.decision_date = now
+    housing.refresh_from_db()
+    mark_counted(application)
+    mark_counted(housing)
+    return application
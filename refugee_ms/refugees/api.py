@@ -0,0 +1,95 @@
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+
+from .models import NGO
+from .pagination import ApiCursorPagination
+from .serializers import (
+    RefugeeSerializer, NGOSerializer, HousingSerializer, JobSerializer,
+    HousingApplicationSerializer, JobApplicationSerializer,
+)
+from . import views
+
+
+class ReadOnlyApiViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read-only endpoints scoped like the matching list view, with ?fields= sparse fieldsets.
+
+    List responses are built from QuerySet.values() rows whenever the serializer can
+    produce every requested field from one, which avoids instantiating models and
+    running the serializer field machinery per row.
+    """
+    pagination_class = ApiCursorPagination
+    list_view = None
+    cursor_ordering = ('-id',)
+    fields_param = 'fields'
+
+    def get_requested_fields(self):
+        raw = self.request.query_params.get(self.fields_param, '')
+        requested = [name for name in raw.split(',') if name]
+        unknown = set(requested) - set(self.serializer_class.field_names())
+        if unknown:
+            raise ValidationError({self.fields_param: f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_base_queryset(self):
+        try:
+            return views.list_view_queryset(self.list_view, self.request)
+        except ObjectDoesNotExist:
+            # The user has no refugee/NGO profile to scope by yet
+            return self.list_view.model.objects.none()
+
+    def get_queryset(self):
+        return self.serializer_class.load_relations(self.get_base_queryset())
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        if not serializer.can_serialize_values():
+            return super().list(request, *args, **kwargs)
+        # Keyset columns are fetched alongside the requested ones so the cursor can be built from each row
+        ordering_fields = [field.lstrip('-') for field in self.cursor_ordering]
+        rows = self.get_base_queryset().values(*set(serializer.values_lookups()) | set(ordering_fields))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(serializer.represent_values(page))
+
+
+class RefugeeViewSet(ReadOnlyApiViewSet):
+    serializer_class = RefugeeSerializer
+    list_view = views.RefugeeListView
+    cursor_ordering = ('-registered_at', '-id')
+
+
+class HousingViewSet(ReadOnlyApiViewSet):
+    serializer_class = HousingSerializer
+    list_view = views.HousingListView
+    cursor_ordering = ('-created_at', '-id')
+
+
+class JobViewSet(ReadOnlyApiViewSet):
+    serializer_class = JobSerializer
+    list_view = views.JobListView
+    cursor_ordering = ('-posted_at', '-id')
+
+
+class HousingApplicationViewSet(ReadOnlyApiViewSet):
+    serializer_class = HousingApplicationSerializer
+    list_view = views.HousingApplicationListView
+    cursor_ordering = ('-application_date', '-id')
+
+
+class JobApplicationViewSet(ReadOnlyApiViewSet):
+    serializer_class = JobApplicationSerializer
+    list_view = views.JobApplicationListView
+    cursor_ordering = ('-applied_at', '-id')
+
+
+class NGOViewSet(ReadOnlyApiViewSet):
+    serializer_class = NGOSerializer
+    cursor_ordering = ('organization_name', 'id')
+
+    def get_base_queryset(self):
+        # NGO profiles are public to every signed-in user
+        return NGO.objects.all()
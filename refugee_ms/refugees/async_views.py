@@ -0,0 +1,209 @@
+"""Async variants of the read-only pages, served in place of views.py's under ASGI.
+
+Each variant reuses its sync view's querysets, permissions and templates but awaits
+every query through the async ORM, so a worker keeps serving other requests while one
+waits on the database or cache. Templates still render synchronously, in a thread,
+once the rows they show are loaded.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+
+from . import views
+from .caching import FRAGMENT_CACHE_TIMEOUT, FragmentCacheMixin, acached_value, ascope_version
+from .conditional import add_validators
+from .models import CustomUser, NGO
+from .pagination import apaginate_keyset
+from .routers import read_alias, reading_from, rendered
+from .stats import get_dashboard_stats
+
+
+async def load_user(request):
+    """Set request.user to the signed-in user with their refugee or NGO profile already loaded.
+
+    Templates and get_queryset() then read the user and profile without querying.
+    """
+    user = await request.auser()
+    if user.is_authenticated:
+        user = await CustomUser.objects.select_related('refugee', 'ngo').aget(pk=user.pk)
+    request.user = user
+    return user
+
+
+async def fetch(queryset):
+    return [row async for row in queryset]
+
+
+async def fragment_rows(fragment, vary, queryset):
+    """Rows for a list shown in a {% cache %} fragment, unless that fragment is cached.
+
+    A cached fragment gets the lazy queryset, which only runs if the fragment expires
+    before the template reaches it.
+    """
+    if fragment is not None and await cache.ahas_key(make_template_fragment_key(fragment, [vary])):
+        return queryset
+    return await fetch(queryset)
+
+
+@login_required
+async def dashboard(request):
+    user = await load_user(request)
+    with reading_from(read_alias()):
+        context = views.dashboard_profile_context(user)
+        context['fragment_timeout'] = FRAGMENT_CACHE_TIMEOUT
+        try:
+            lists = views.dashboard_lists(user)
+        except AttributeError:
+            lists = None
+
+        # The figures, activity feed and lists are independent, so they are awaited together
+        pending = {
+            'stats': acached_value('dashboard_stats', views.DASHBOARD_STATS_SCOPES,
+                                   sync_to_async(get_dashboard_stats)),
+            'recent_activities': acached_value('recent_activities', views.RECENT_ACTIVITY_SCOPES,
+                                               sync_to_async(views.recent_activities)),
+        }
+        if lists is not None:
+            audience, scopes = views.dashboard_vary_scopes(user)
+            context['dashboard_vary'] = vary = f'{audience}|{await ascope_version(*scopes)}'
+            for name, (queryset, fragment) in lists.items():
+                pending[name] = fragment_rows(fragment, vary, queryset)
+            if user.user_type == 'refugee':
+                context['refugee'] = user.refugee
+                pending['available_jobs'] = sync_to_async(views.recommended_or_recent_jobs)(user.refugee, 5)
+            elif user.user_type == 'ngo':
+                context['ngo'] = user.ngo
+            else:
+                pending['total_ngos'] = acached_value('total_ngos', ['ngos'], NGO.objects.acount)
+        context.update(zip(pending, await asyncio.gather(*pending.values())))
+        context.update(views.dashboard_stats_context(context.pop('stats')))
+        return await sync_to_async(render)(request, 'refugees/dashboard.html', context)
+
+
+class AsyncReadMixin:
+    """Async request handling for the read-only class-based views.
+
+    Replaces the sync dispatch() of LoginRequiredMixin, UserPassesTestMixin and
+    ReadReplicaMixin, and ConditionalGetMixin's get(). Subclasses load the page's
+    rows in aload().
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await load_user(request)
+        with reading_from(read_alias()):
+            if isinstance(self, LoginRequiredMixin) and not user.is_authenticated:
+                return self.handle_no_permission()
+            if isinstance(self, UserPassesTestMixin) and not await self.atest_func():
+                return self.handle_no_permission()
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            return await handler(request, *args, **kwargs)
+
+    async def atest_func(self):
+        return self.test_func()
+
+    async def get(self, request, *args, **kwargs):
+        # Pending flash messages are shown once by the next rendered page, so always render it
+        if get_messages(request):
+            return await self.render_page()
+        etag, last_modified = await self.aget_validators(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await self.render_page()
+        return add_validators(response, etag, timestamp)
+
+    async def render_page(self):
+        context = await self.aload()
+        return await sync_to_async(rendered)(self.render_to_response(context))
+
+
+class AsyncListMixin(AsyncReadMixin):
+    """Async counterpart of ListView.get() with the cursor pagination, search and fragment cache"""
+
+    async def aload(self):
+        self.cached_listing = None
+        self.fragment_vary = None
+        if isinstance(self, FragmentCacheMixin) and self.caches_listing():
+            self.fragment_vary = self.fragment_vary_for(await ascope_version(*self.get_fragment_scopes()))
+            self.cached_listing = await cache.aget(make_template_fragment_key(self.fragment_name, [self.fragment_vary]))
+
+        queryset = self.get_queryset()
+        if self.cached_listing is not None:
+            # The rows come from the cached fragment; don't query for them
+            queryset = queryset.none()
+        page_size = self.get_paginate_by(queryset)
+        if page_size:
+            self.page = await apaginate_keyset(
+                queryset, self.keyset_field, page_size,
+                cursor=self.request.GET.get(self.cursor_kwarg), descending=self.keyset_descending,
+            )
+            self.object_list = self.page.object_list
+        else:
+            self.object_list = await fetch(queryset)
+        return self.get_context_data()
+
+    def paginate_queryset(self, queryset, page_size):
+        # aload() already fetched the page
+        return None, self.page, self.page.object_list, self.page.has_other_pages()
+
+
+class AsyncDetailMixin(AsyncReadMixin):
+    """Async counterpart of DetailView.get()"""
+
+    async def aget_object(self):
+        if getattr(self, 'object', None) is None:
+            try:
+                self.object = await self.get_queryset().aget(pk=self.kwargs[self.pk_url_kwarg])
+            except self.model.DoesNotExist:
+                raise Http404(f'No {self.model._meta.verbose_name} found matching the query')
+        return self.object
+
+    async def aload(self):
+        return self.get_context_data(object=await self.aget_object())
+
+
+class RefugeeListView(AsyncListMixin, views.RefugeeListView):
+    pass
+
+
+class RefugeeDetailView(AsyncDetailMixin, views.RefugeeDetailView):
+
+    async def atest_func(self):
+        if self.request.user.user_type in ['admin', 'ngo']:
+            return True
+        return (await self.aget_object()).user_id == self.request.user.pk
+
+
+class HousingListView(AsyncListMixin, views.HousingListView):
+    pass
+
+
+class HousingDetailView(AsyncDetailMixin, views.HousingDetailView):
+    pass
+
+
+class JobListView(AsyncListMixin, views.JobListView):
+    pass
+
+
+class JobDetailView(AsyncDetailMixin, views.JobDetailView):
+    pass
+
+
+class HousingApplicationListView(AsyncListMixin, views.HousingApplicationListView):
+    pass
+
+
+class JobApplicationListView(AsyncListMixin, views.JobApplicationListView):
+    pass
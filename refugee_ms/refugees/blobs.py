@@ -0,0 +1,132 @@
+import os
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Refugee, JobApplication, StoredBlob, document_storage
+from .storage import BLOB_DIR, TEMP_DIR, is_blob_name
+
+# File fields kept in the content-addressed documents storage, per model
+BLOB_FIELDS = {
+    Refugee: ('documents',),
+    JobApplication: ('resume',),
+}
+
+# Seconds an unreferenced blob is kept, so an upload whose row is still being saved keeps its file
+ORPHAN_GRACE = 3600
+
+
+def file_name(value):
+    """The stored name held by a file field's value, '' when empty"""
+    return getattr(value, 'name', value) or ''
+
+
+# Reference counting
+
+def touch(name):
+    """Mark a blob as just used; returns False if no such blob is recorded"""
+    return StoredBlob.objects.filter(name=name).update(touched_at=timezone.now()) > 0
+
+
+def record(name, size, now):
+    """Record a newly stored blob and queue its post-processing"""
+    from .tasks import enqueue
+
+    blob, created = StoredBlob.objects.get_or_create(name=name, defaults={'size': size, 'touched_at': now})
+    if created:
+        enqueue('process_document', blob=name)
+    else:
+        StoredBlob.objects.filter(pk=blob.pk).update(touched_at=now)
+
+
+def retain(name):
+    if is_blob_name(name):
+        StoredBlob.objects.filter(name=name).update(references=F('references') + 1, touched_at=timezone.now())
+
+
+def release(name):
+    if is_blob_name(name):
+        StoredBlob.objects.filter(name=name).update(references=F('references') - 1, touched_at=timezone.now())
+
+
+def move_reference(old_name, new_name):
+    if old_name != new_name:
+        release(old_name)
+        retain(new_name)
+
+
+def recount_references():
+    """Recount every blob's references from the file fields; returns the number of blobs corrected"""
+    counts = {}
+    for model, fields in BLOB_FIELDS.items():
+        for field in fields:
+            rows = (model._default_manager.filter(**{f'{field}__startswith': f'{BLOB_DIR}/'})
+                    .values_list(field).annotate(count=Count('pk')).order_by())
+            for name, count in rows:
+                counts[name] = counts.get(name, 0) + count
+    corrected = 0
+    with transaction.atomic():
+        for blob in StoredBlob.objects.select_for_update().only('name', 'references'):
+            if blob.references != counts.get(blob.name, 0):
+                StoredBlob.objects.filter(pk=blob.pk).update(references=counts.get(blob.name, 0))
+                corrected += 1
+    return corrected
+
+
+# Garbage collection
+
+def collect_garbage(grace=ORPHAN_GRACE, dry_run=False):
+    """Delete unreferenced blobs, files with no blob record and abandoned uploads older than grace.
+
+    Returns counts of each and the bytes freed.
+    """
+    storage = document_storage()
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    result = {'blobs': 0, 'stray_files': 0, 'bytes': 0}
+
+    orphans = StoredBlob.objects.filter(references__lte=0, touched_at__lt=cutoff)
+    for pk in orphans.values_list('pk', flat=True).iterator():
+        with transaction.atomic():
+            # Re-checked under a lock: an upload of the same content may have claimed it meanwhile
+            blob = orphans.select_for_update().filter(pk=pk).first()
+            if blob is None:
+                continue
+            result['blobs'] += 1
+            result['bytes'] += blob.size
+            if not dry_run:
+                blob.delete()
+                remove(storage.path(blob.name))
+                if blob.thumbnail:
+                    remove(storage.path(blob.thumbnail))
+
+    root = storage.path(BLOB_DIR)
+    if not os.path.isdir(root):
+        return result
+    oldest = time.time() - grace
+    for directory, _, files in os.walk(root):
+        paths = [os.path.join(directory, file) for file in files]
+        old = [path for path in paths if os.path.getmtime(path) < oldest]
+        if not old:
+            continue
+        if os.path.abspath(directory) == os.path.abspath(storage.path(TEMP_DIR)):
+            stray = old
+        else:
+            names = {os.path.relpath(path, storage.location).replace(os.sep, '/'): path for path in old}
+            known = set(StoredBlob.objects.filter(name__in=names).values_list('name', flat=True))
+            stray = [path for name, path in names.items() if name not in known]
+        for path in stray:
+            result['stray_files'] += 1
+            result['bytes'] += os.path.getsize(path)
+            if not dry_run:
+                remove(path)
+    return result
+
+
+def remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,150 @@
+import time
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication, NGO
+
+# Upper bound on how long a cached fragment or value is served
+FRAGMENT_CACHE_TIMEOUT = 600
+
+SCOPE_KEY_PREFIX = 'refugees:scope:'
+
+
+# Scopes are named slices of data ('housing', 'jobs:ngo:4', ...), each with a version
+# number held in the cache. Cached fragments put the versions of every scope they read
+# into their key, so bumping a scope's version retires exactly the fragments built from it.
+
+def scope_versions(scopes):
+    """Return {scope: version}, starting unseen scopes at the current time.
+
+    A version lost to eviction restarts from the clock rather than from zero, so it
+    can never come back as a value some older fragment was keyed on.
+    """
+    keys = {SCOPE_KEY_PREFIX + scope: scope for scope in scopes}
+    versions = cache.get_many(list(keys))
+    for key in keys.keys() - versions.keys():
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+async def ascope_versions(scopes):
+    """scope_versions() for async views"""
+    keys = {SCOPE_KEY_PREFIX + scope: scope for scope in scopes}
+    versions = await cache.aget_many(list(keys))
+    for key in keys.keys() - versions.keys():
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        versions[key] = await cache.aget(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def scope_version(*scopes):
+    """A single string identifying the current versions of scopes, for use in cache keys"""
+    return join_versions(scopes, scope_versions(scopes))
+
+
+async def ascope_version(*scopes):
+    return join_versions(scopes, await ascope_versions(scopes))
+
+
+def join_versions(scopes, versions):
+    return ':'.join(f'{scope}.{versions[scope]}' for scope in scopes)
+
+
+def bump_scopes(scopes):
+    for scope in scopes:
+        key = SCOPE_KEY_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def expire_scopes(scopes):
+    # Bump after commit, or a concurrent request could cache the old rows under the new version
+    transaction.on_commit(lambda: bump_scopes(scopes))
+
+
+def invalidation_scopes(instance):
+    """The scopes whose cached fragments show instance"""
+    if isinstance(instance, Refugee):
+        return ['refugees']
+    if isinstance(instance, NGO):
+        return ['ngos']
+    if isinstance(instance, Housing):
+        return ['housing', f'housing:ngo:{instance.ngo_id}']
+    if isinstance(instance, Job):
+        return ['jobs', f'jobs:ngo:{instance.ngo_id}']
+    if isinstance(instance, HousingApplication):
+        ngo_id = Housing.objects.filter(pk=instance.housing_id).values_list('ngo_id', flat=True).first()
+        return ['housing_applications', f'housing_applications:ngo:{ngo_id}']
+    if isinstance(instance, JobApplication):
+        ngo_id = Job.objects.filter(pk=instance.job_id).values_list('ngo_id', flat=True).first()
+        return ['job_applications', f'job_applications:ngo:{ngo_id}']
+    return []
+
+
+def cached_value(name, scopes, compute, timeout=FRAGMENT_CACHE_TIMEOUT):
+    """Return compute() cached until any of scopes changes"""
+    return cache.get_or_set(f'refugees:value:{name}:{scope_version(*scopes)}', compute, timeout)
+
+
+async def acached_value(name, scopes, compute, timeout=FRAGMENT_CACHE_TIMEOUT):
+    """cached_value() for async views; compute is a coroutine function"""
+    key = f'refugees:value:{name}:{await ascope_version(*scopes)}'
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aadd(key, value, timeout)
+    return value
+
+
+class FragmentCacheMixin:
+    """ListView mixin serving the listing fragment from the cache per user type (and per NGO).
+
+    The template wraps its listing in {% cache fragment_timeout <fragment_name> fragment_vary %}.
+    When that fragment is already cached the view hands it over as cached_listing and
+    skips the listing query entirely. Searches are not cached.
+    """
+    fragment_name = None
+
+    def get_fragment_scopes(self):
+        raise NotImplementedError
+
+    def get_fragment_timeout(self):
+        return FRAGMENT_CACHE_TIMEOUT
+
+    def get_fragment_vary(self):
+        return self.fragment_vary_for(scope_version(*self.get_fragment_scopes()))
+
+    def fragment_vary_for(self, version):
+        user = self.request.user
+        audience = f'ngo:{user.ngo.pk}' if user.user_type == 'ngo' else user.user_type
+        return f'{audience}|{version}|{self.request.GET.urlencode()}'
+
+    def caches_listing(self):
+        return not self.request.GET.get(getattr(self, 'search_kwarg', 'q'), '').strip()
+
+    def get(self, request, *args, **kwargs):
+        self.cached_listing = None
+        self.fragment_vary = None
+        if self.caches_listing():
+            self.fragment_vary = self.get_fragment_vary()
+            self.cached_listing = cache.get(make_template_fragment_key(self.fragment_name, [self.fragment_vary]))
+        return super().get(request, *args, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cached_listing is not None:
+            # The rows come from the cached fragment; don't query for them
+            queryset = queryset.none()
+        return super().paginate_queryset(queryset, page_size)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cached_listing'] = mark_safe(self.cached_listing) if self.cached_listing is not None else None
+        context['fragment_vary'] = self.fragment_vary
+        context['fragment_timeout'] = self.get_fragment_timeout() if self.fragment_vary else 0
+        return context
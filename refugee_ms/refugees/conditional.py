@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .caching import ascope_version, scope_version
+
+
+def freshness(sources, field='last_updated'):
+    """Return (latest timestamp, fingerprint) over querysets, one aggregate query each.
+
+    The fingerprint holds each source's newest timestamp and row count, so removing a
+    row changes it even though no remaining row's timestamp moved.
+    """
+    return combine_freshness([freshness_queryset(queryset).aggregate(**freshness_aggregates(field))
+                              for queryset in sources])
+
+
+async def afreshness(sources, field='last_updated'):
+    """freshness() for async views, awaiting the aggregates together"""
+    rows = await asyncio.gather(*(freshness_queryset(queryset).aaggregate(**freshness_aggregates(field))
+                                  for queryset in sources))
+    return combine_freshness(rows)
+
+
+def freshness_queryset(queryset):
+    return queryset if queryset.query.is_sliced else queryset.order_by()
+
+
+def freshness_aggregates(field):
+    return {'latest': Max(field), 'count': Count('pk')}
+
+
+def combine_freshness(rows):
+    latest = None
+    fingerprint = []
+    for row in rows:
+        fingerprint.append((row['latest'].isoformat() if row['latest'] else '', row['count']))
+        if row['latest'] and (latest is None or row['latest'] > latest):
+            latest = row['latest']
+    return latest, fingerprint
+
+
+class ConditionalGetMixin:
+    """Answer repeat GETs with 304 Not Modified when nothing the page shows has changed.
+
+    List views name the cache scopes their page reads in get_freshness_scopes(), and the
+    ETag is built from those scopes' versions: a cache read, with no query over the whole
+    unpaginated list. Views without scopes list what the page renders in
+    get_freshness_sources(), querysets whose newest last_updated and row count are
+    checked before any rendering; these also give the Last-Modified header. Pages are
+    per user, so the ETag also covers the viewer and the full path, and responses are
+    marked private so shared caches never store them.
+    """
+
+    def get_freshness_scopes(self):
+        return None
+
+    def get_freshness_sources(self):
+        return [self.get_queryset()]
+
+    def get_validators(self, request):
+        scopes = self.get_freshness_scopes()
+        if scopes is not None:
+            return self.validators(request, None, scope_version(*scopes))
+        return self.validators(request, *freshness(self.get_freshness_sources()))
+
+    async def aget_validators(self, request):
+        scopes = self.get_freshness_scopes()
+        if scopes is not None:
+            return self.validators(request, None, await ascope_version(*scopes))
+        return self.validators(request, *await afreshness(self.get_freshness_sources()))
+
+    def validators(self, request, latest, fingerprint):
+        viewer = (request.user.pk, getattr(request.user, 'user_type', ''))
+        digest = hashlib.sha256(repr((viewer, request.get_full_path(), fingerprint)).encode()).hexdigest()
+        return quote_etag(digest[:32]), latest
+
+    def get(self, request, *args, **kwargs):
+        # Pending flash messages are shown once by the next rendered page, so always render it
+        if get_messages(request):
+            return super().get(request, *args, **kwargs)
+        etag, last_modified = self.get_validators(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return add_validators(response, etag, timestamp)
+
+
+def add_validators(response, etag, timestamp):
+    response.headers.setdefault('ETag', etag)
+    if timestamp is not None:
+        response.headers.setdefault('Last-Modified', http_date(timestamp))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
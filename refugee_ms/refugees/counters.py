@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication, DashboardCounter
+
+
+# Fields each counted model's counter keys are derived from
+COUNTER_FIELDS = {
+    Refugee: ('gender',),
+    Housing: ('housing_type', 'status'),
+    Job: ('is_active',),
+    HousingApplication: ('status',),
+    JobApplication: ('status',),
+}
+
+# Counter holding each counted model's row count
+TOTAL_COUNTERS = {
+    Refugee: 'refugees_total',
+    Housing: 'housing_total',
+    Job: 'jobs_total',
+    HousingApplication: 'housing_applications_total',
+    JobApplication: 'job_applications_total',
+}
+
+
+def counter_keys(instance):
+    """Return the counter names an instance contributes one unit to"""
+    if isinstance(instance, Refugee):
+        return ['refugees_total', f'refugees_gender_{instance.gender}']
+    if isinstance(instance, Housing):
+        return ['housing_total', f'housing_{instance.housing_type}_{instance.status}']
+    if isinstance(instance, Job):
+        return ['jobs_total'] + (['jobs_active'] if instance.is_active else [])
+    if isinstance(instance, HousingApplication):
+        return ['housing_applications_total'] + (
+            ['housing_applications_pending'] if instance.status == 'pending' else [])
+    if isinstance(instance, JobApplication):
+        return ['job_applications_total'] + (
+            ['job_applications_pending'] if instance.status == 'pending' else [])
+    return []
+
+
+def bump(names, delta):
+    """Atomically add delta to each named counter, creating missing rows"""
+    if not names or not delta:
+        return
+    with transaction.atomic():
+        updated = DashboardCounter.objects.filter(name__in=names).update(value=F('value') + delta)
+        if updated < len(names):
+            existing = set(DashboardCounter.objects.filter(name__in=names).values_list('name', flat=True))
+            for name in names:
+                if name not in existing:
+                    counter, created = DashboardCounter.objects.get_or_create(name=name, defaults={'value': delta})
+                    if not created:
+                        DashboardCounter.objects.filter(pk=counter.pk).update(value=F('value') + delta)
+
+
+def mark_counted(instance):
+    """Record that the counters already reflect instance as it is now.
+
+    Call this after changing rows with queryset updates, so a later save() of the
+    same in-memory object does not apply the change to the counters a second time.
+    """
+    instance._counter_keys = counter_keys(instance)
+
+
+def move(old_keys, new_keys):
+    """Shift one unit from the counters in old_keys to those in new_keys"""
+    bump([key for key in old_keys if key not in new_keys], -1)
+    bump([key for key in new_keys if key not in old_keys], 1)
+
+
+def compute_counters():
+    """Recount every counter from the source tables"""
+    from .stats import refugee_stats, housing_stats, job_stats, application_stats
+
+    refugees = refugee_stats()
+    housing = housing_stats()
+    jobs = job_stats()
+    applications = application_stats()
+
+    values = {
+        'refugees_total': refugees['total'],
+        'housing_total': housing['total'],
+        'jobs_total': jobs['total'],
+        'jobs_active': jobs['active'],
+        'housing_applications_total': HousingApplication.objects.count(),
+        'housing_applications_pending': applications['pending_housing'],
+        'job_applications_total': JobApplication.objects.count(),
+        'job_applications_pending': applications['pending_jobs'],
+    }
+    for code, count in refugees['by_gender'].items():
+        values[f'refugees_gender_{code}'] = count
+    for housing_type, statuses in housing['by_type'].items():
+        for status, count in statuses.items():
+            values[f'housing_{housing_type}_{status}'] = count
+    return values
+
+
+def rebuild_counters():
+    """Replace the stored counters with freshly computed values.
+
+    Rows are upserted on their unique name rather than deleted and re-inserted: two
+    first reads of an empty table both rebuild, and neither can lock rows that don't
+    exist yet, so the later one overwrites the earlier one's rows instead of colliding.
+    """
+    values = compute_counters()
+    with transaction.atomic():
+        DashboardCounter.objects.exclude(name__in=values).delete()
+        DashboardCounter.objects.bulk_create(
+            [DashboardCounter(name=name, value=value) for name, value in values.items()],
+            update_conflicts=True, unique_fields=['name'], update_fields=['value', 'last_updated'],
+        )
+    return values
+
+
+def total_count(model):
+    """Row count of a counted model read from its counter, or None if it has none"""
+    if model not in TOTAL_COUNTERS:
+        return None
+    return read_counters().get(TOTAL_COUNTERS[model], 0)
+
+
+def read_counters():
+    """Load all counters with a single query, rebuilding them if the table is empty"""
+    values = dict(DashboardCounter.objects.values_list('name', 'value'))
+    if not values:
+        values = rebuild_counters()
+    return values
@@ -0,0 +1,75 @@
+import logging
+import os
+
+from django.utils import timezone
+
+from .models import StoredBlob, document_storage
+
+logger = logging.getLogger(__name__)
+
+# Directory, under the storage root, holding one thumbnail per image blob
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZE = (320, 320)
+
+
+def sniff_content_type(header):
+    """Content type from a file's first bytes; uploads' declared types are not trusted"""
+    if header.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image/tiff'
+    return 'application/octet-stream'
+
+
+def count_pages(path):
+    """Pages in the PDF at path, or None without pypdf"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning('Counting PDF pages requires pypdf; skipping %s', path)
+        return None
+    return len(PdfReader(path).pages)
+
+
+def make_thumbnail(path, digest):
+    """Write a JPEG thumbnail of the image at path; returns its storage name, or None without Pillow"""
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning('Image thumbnails require Pillow; skipping %s', path)
+        return None
+    storage = document_storage()
+    name = f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}.jpg'
+    os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+    with Image.open(path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.convert('RGB').save(storage.path(name), 'JPEG', quality=80)
+    return name
+
+
+def process_blob(name):
+    """Record a stored document's type, and its page count or thumbnail; run by the process_document task"""
+    blob = StoredBlob.objects.filter(name=name).first()
+    if blob is None or blob.processed_at is not None:
+        return
+    path = document_storage().path(name)
+    with open(path, 'rb') as file:
+        content_type = sniff_content_type(file.read(16))
+    digest = os.path.splitext(os.path.basename(name))[0]
+
+    page_count, thumbnail = None, ''
+    if content_type == 'application/pdf':
+        page_count = count_pages(path)
+    elif content_type.startswith('image/'):
+        thumbnail = make_thumbnail(path, digest) or ''
+    StoredBlob.objects.filter(pk=blob.pk).update(
+        content_type=content_type, page_count=page_count, thumbnail=thumbnail, processed_at=timezone.now(),
+    )
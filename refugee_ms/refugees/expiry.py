@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .caching import expire_scopes
+from .counters import bump
+from .matching import invalidate_job_index
+from .models import Job, JobApplication, Task
+from .tasks import enqueue
+
+SWEEP_TASK = 'expire_jobs'
+
+
+def expire_jobs(now=None):
+    """Close active jobs whose deadline has passed, and expire pending applications to closed jobs.
+
+    Both are bulk updates, which skip the model signals, so the counters, cached
+    fragments and the matching index are brought up to date here. Returns the number
+    of jobs closed and applications expired.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = Job.objects.filter(is_active=True, deadline__lte=now)
+        job_ngos = set(due.order_by().values_list('ngo_id', flat=True).distinct())
+        closed = due.update(is_active=False, last_updated=now)
+
+        # Covers jobs closed by hand too, not only those closed by this sweep
+        stale = JobApplication.objects.filter(status='pending', job__is_active=False)
+        application_ngos = set(stale.order_by().values_list('job__ngo_id', flat=True).distinct())
+        expired = stale.update(status='expired', last_updated=now)
+
+        bump(['jobs_active'], -closed)
+        bump(['job_applications_pending'], -expired)
+        scopes = []
+        if closed:
+            scopes += ['jobs'] + [f'jobs:ngo:{ngo_id}' for ngo_id in job_ngos]
+        if expired:
+            scopes += ['job_applications'] + [f'job_applications:ngo:{ngo_id}' for ngo_id in application_ngos]
+        expire_scopes(scopes)
+        if closed:
+            transaction.on_commit(invalidate_job_index)
+    return closed, expired
+
+
+def schedule_sweep(at):
+    """Queue a sweep for when at passes, unless one is already due by then"""
+    if Task.objects.filter(name=SWEEP_TASK, status='queued', run_after__lte=at).exists():
+        return None
+    return enqueue(SWEEP_TASK, delay=max((at - timezone.now()).total_seconds(), 0))
+
+
+def schedule_next_sweep():
+    """Queue a sweep for the next deadline among the open jobs, if there is one"""
+    deadline = Job.objects.filter(is_active=True).aggregate(Min('deadline'))['deadline__min']
+    if deadline is not None:
+        return schedule_sweep(deadline)
+    return None
@@ -0,0 +1,143 @@
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication
+
+# Rows fetched from the database per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class ExportError(Exception):
+    """Raised for an export request that names unknown columns or bad filter values"""
+
+
+class ExportSpec:
+    """What one dataset exposes: column name -> ORM lookup, the filterable fields and its date field"""
+
+    def __init__(self, model, columns, default_columns, filters, date_field):
+        self.model = model
+        self.columns = columns
+        self.default_columns = default_columns
+        self.filters = filters
+        self.date_field = date_field
+
+    def select_columns(self, requested=None):
+        if not requested:
+            return list(self.default_columns)
+        unknown = [column for column in requested if column not in self.columns]
+        if unknown:
+            raise ExportError(f"Unknown columns: {', '.join(unknown)}. "
+                              f"Available: {', '.join(self.columns)}")
+        return list(requested)
+
+
+REFUGEE_COLUMNS = {
+    'id': 'pk', 'username': 'user__username', 'first_name': 'user__first_name', 'last_name': 'user__last_name',
+    'email': 'user__email', 'date_of_birth': 'date_of_birth', 'gender': 'gender', 'family_size': 'family_size',
+    'country_of_origin': 'country_of_origin', 'native_language': 'native_language',
+    'education_level': 'education_level', 'skills': 'skills', 'medical_conditions': 'medical_conditions',
+    'emergency_contact': 'emergency_contact', 'status': 'status', 'registered_at': 'registered_at',
+}
+HOUSING_COLUMNS = {
+    'id': 'pk', 'name': 'name', 'ngo': 'ngo__organization_name', 'location': 'location', 'address': 'address',
+    'housing_type': 'housing_type', 'capacity': 'capacity', 'current_occupancy': 'current_occupancy',
+    'status': 'status', 'cost_per_month': 'cost_per_month', 'created_at': 'created_at',
+}
+JOB_COLUMNS = {
+    'id': 'pk', 'title': 'title', 'employer': 'employer', 'ngo': 'ngo__organization_name', 'location': 'location',
+    'job_type': 'job_type', 'salary_range': 'salary_range', 'posted_at': 'posted_at', 'deadline': 'deadline',
+    'is_active': 'is_active',
+}
+HOUSING_APPLICATION_COLUMNS = {
+    'id': 'pk', 'refugee_id': 'refugee_id', 'refugee': 'refugee__user__username', 'housing_id': 'housing_id',
+    'housing': 'housing__name', 'status': 'status', 'application_date': 'application_date',
+    'decision_date': 'decision_date',
+}
+JOB_APPLICATION_COLUMNS = {
+    'id': 'pk', 'refugee_id': 'refugee_id', 'refugee': 'refugee__user__username', 'job_id': 'job_id',
+    'job': 'job__title', 'status': 'status', 'applied_at': 'applied_at', 'last_updated': 'last_updated',
+    'interview_date': 'interview_date',
+}
+
+EXPORTS = {
+    # Medical and emergency-contact details are only exported when asked for by name
+    'refugees': ExportSpec(
+        Refugee, REFUGEE_COLUMNS,
+        [column for column in REFUGEE_COLUMNS if column not in ('medical_conditions', 'emergency_contact')],
+        ('status', 'gender', 'country_of_origin'), 'registered_at',
+    ),
+    'housing': ExportSpec(Housing, HOUSING_COLUMNS, list(HOUSING_COLUMNS),
+                          ('status', 'housing_type', 'location'), 'created_at'),
+    'jobs': ExportSpec(Job, JOB_COLUMNS, list(JOB_COLUMNS), ('is_active', 'job_type', 'location'), 'posted_at'),
+    'housing-applications': ExportSpec(HousingApplication, HOUSING_APPLICATION_COLUMNS,
+                                       list(HOUSING_APPLICATION_COLUMNS), ('status', 'housing'), 'application_date'),
+    'job-applications': ExportSpec(JobApplication, JOB_APPLICATION_COLUMNS, list(JOB_APPLICATION_COLUMNS),
+                                   ('status', 'job'), 'applied_at'),
+}
+
+
+def parse_moment(value):
+    # Malformed dates parse to None; well-formed but impossible ones such as 2024-13-45 raise ValueError
+    try:
+        moment = parse_datetime(value) or parse_date(value)
+    except ValueError:
+        raise ExportError(f'Invalid date: {value}')
+    if moment is None:
+        raise ExportError(f'Invalid date: {value}')
+    return moment
+
+
+def filter_export(spec, queryset, params):
+    """Apply the dataset's field filters plus since/until on its date field from a mapping of params"""
+    conditions = {field: params[field] for field in spec.filters if params.get(field)}
+    if params.get('since'):
+        conditions[f'{spec.date_field}__gte'] = parse_moment(params['since'])
+    if params.get('until'):
+        conditions[f'{spec.date_field}__lt'] = parse_moment(params['until'])
+    if 'is_active' in conditions:
+        conditions['is_active'] = conditions['is_active'].lower() in ('1', 'true', 'yes')
+    try:
+        return queryset.filter(**conditions)
+    except (ValidationError, ValueError) as error:
+        raise ExportError(f'Invalid filter value: {error}')
+
+
+def export_rows(spec, queryset, columns):
+    """Yield value tuples for columns in primary-key order, fetching EXPORT_CHUNK_SIZE rows at a time"""
+    lookups = [spec.columns[column] for column in columns]
+    # values_list skips model instantiation and iterator() skips the result cache, so memory stays flat
+    return queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+class Echo:
+    """A write-only file whose write() hands back what it was given, for feeding csv.writer into a stream"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_export(file_format, columns, rows):
+    if file_format == 'csv':
+        return stream_csv(columns, rows)
+    return stream_jsonl(columns, rows)
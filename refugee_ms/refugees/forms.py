@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from .models import CustomUser, Refugee, Housing, Job, JobApplication, HousingApplication, NGO
+from .uploads import check_upload
 
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -92,6 +93,9 @@ class RefugeeForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-select'})
         }
 
+    def clean_documents(self):
+        return check_upload(self.cleaned_data.get('documents'))
+
 class HousingForm(forms.ModelForm):
     class Meta:
         model = Housing
@@ -223,6 +227,9 @@ class JobApplicationForm(forms.ModelForm):
             })
         }
 
+    def clean_resume(self):
+        return check_upload(self.cleaned_data.get('resume'))
+
 class HousingApplicationForm(forms.ModelForm):
     class Meta:
         model = HousingApplication
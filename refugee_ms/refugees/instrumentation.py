@@ -0,0 +1,226 @@
+import atexit
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+# The record of the sampled request being served, if any; queries and renders add to it
+_current = ContextVar('perf_record', default=None)
+
+# The most recent records of this process, newest last
+RECORDS = deque(maxlen=getattr(settings, 'PERF_BUFFER_SIZE', 10000))
+
+# Records waiting to be appended to settings.PERF_LOG_FILE
+_unflushed = []
+_flush_lock = threading.Lock()
+
+# Duplicated fingerprints kept per record, most repeated first
+DUPLICATES_KEPT = 3
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+
+def fingerprint(sql):
+    """sql with its literal values blanked, so the same query with other values matches"""
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _STRING.sub('?', sql)
+    return _NUMBER.sub('?', sql)
+
+
+class RequestRecord:
+    """What one sampled request cost"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.template_seconds = 0.0
+
+    def add_query(self, sql, seconds):
+        self.queries.append((sql, seconds))
+
+    def as_dict(self, view, method, status, size):
+        counts = Counter(fingerprint(sql) for sql, _ in self.queries)
+        return {
+            'at': time.time(),
+            'view': view,
+            'method': method,
+            'status': status,
+            'ms': round(1000 * (time.perf_counter() - self.started), 3),
+            'queries': len(self.queries),
+            'sql_ms': round(1000 * sum(seconds for _, seconds in self.queries), 3),
+            'duplicate_queries': len(self.queries) - len(counts),
+            'duplicates': [[sql, count] for sql, count in counts.most_common(DUPLICATES_KEPT) if count > 1],
+            'template_ms': round(1000 * self.template_seconds, 3),
+            'bytes': size,
+        }
+
+
+@contextmanager
+def recording():
+    """Attribute the queries and template renders made inside the block to a new RequestRecord"""
+    record = RequestRecord()
+    token = _current.set(record)
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+
+
+def save(data):
+    RECORDS.append(data)
+    if getattr(settings, 'PERF_LOG_FILE', ''):
+        with _flush_lock:
+            _unflushed.append(data)
+            if len(_unflushed) >= settings.PERF_FLUSH_EVERY:
+                _flush()
+
+
+def flush():
+    """Append the records not yet written to settings.PERF_LOG_FILE"""
+    with _flush_lock:
+        _flush()
+
+
+def _flush():
+    if not _unflushed or not getattr(settings, 'PERF_LOG_FILE', ''):
+        return
+    lines = ''.join(json.dumps(data) + '\n' for data in _unflushed)
+    with open(settings.PERF_LOG_FILE, 'a') as log:
+        log.write(lines)
+    _unflushed.clear()
+
+
+atexit.register(flush)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing each query of a sampled request"""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    began = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.add_query(sql, time.perf_counter() - began)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """connection_created hook installing record_query on every connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """The Django template backend, timing each page render of a sampled request"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    def __init__(self, wrapped):
+        self._wrapped = wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return self._wrapped.render(context, request)
+        began = time.perf_counter()
+        try:
+            return self._wrapped.render(context, request)
+        finally:
+            record.template_seconds += time.perf_counter() - began
+
+
+class QueryInstrumentationMiddleware:
+    """Record the cost of a sample of requests: time, queries, SQL time, repeated queries,
+    template time and response size, under the URL name the request resolved to.
+
+    PERF_SAMPLE_RATE is the share of requests recorded; the rest pay for one random number.
+    Records go to RECORDS, a ring buffer of the latest PERF_BUFFER_SIZE, and when PERF_LOG_FILE
+    is set are appended to it as JSON lines every PERF_FLUSH_EVERY records, for perfreport.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        with recording() as record:
+            response = self.get_response(request)
+        save(self.describe(record, request, response))
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        with recording() as record:
+            response = await self.get_response(request)
+        save(self.describe(record, request, response))
+        return response
+
+    def sampled(self):
+        rate = settings.PERF_SAMPLE_RATE
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+    def describe(self, record, request, response):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else ''
+        size = None if response.streaming else len(response.content)
+        return record.as_dict(view, request.method, response.status_code, size)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(records):
+    """Per-view statistics over records: {view: {'requests', 'ms', 'queries', ...}}.
+
+    Each measure maps 'p50', 'p95' and 'p99' to its percentiles; 'duplicates' is the
+    fingerprint repeated most often within one request, with that count.
+    """
+    by_view = {}
+    for data in records:
+        by_view.setdefault(data['view'], []).append(data)
+    summary = {}
+    for view, rows in by_view.items():
+        stats = {'requests': len(rows)}
+        for measure in ('ms', 'queries', 'sql_ms', 'duplicate_queries', 'template_ms', 'bytes'):
+            values = sorted(row[measure] for row in rows if row[measure] is not None)
+            stats[measure] = {name: percentile(values, fraction)
+                              for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))}
+        worst = max((duplicate for row in rows for duplicate in row['duplicates']), key=lambda d: d[1], default=None)
+        stats['duplicates'] = tuple(worst) if worst else None
+        summary[view] = stats
+    return summary
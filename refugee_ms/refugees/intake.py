@@ -0,0 +1,194 @@
+import csv
+import io
+import os
+from collections import Counter
+
+from django import forms
+from django.db import IntegrityError, transaction
+
+from .caching import expire_scopes
+from .counters import bump
+from .forms import RefugeeForm
+from .models import CustomUser, Refugee
+
+# Rows validated and written per transaction
+INTAKE_CHUNK_SIZE = 1000
+
+INTAKE_USER_FIELDS = ('username', 'email', 'first_name', 'last_name', 'phone_number')
+INTAKE_REFUGEE_FIELDS = tuple(field for field in RefugeeForm._meta.fields if field != 'documents')
+INTAKE_COLUMNS = INTAKE_USER_FIELDS + INTAKE_REFUGEE_FIELDS
+INTAKE_REQUIRED_COLUMNS = ('username', 'first_name', 'last_name', 'date_of_birth', 'gender', 'family_size',
+                           'country_of_origin', 'native_language')
+
+# Values used when a sheet leaves an optional column out or blank
+INTAKE_DEFAULTS = {'status': 'pending'}
+
+
+class IntakeUserForm(forms.ModelForm):
+    first_name = forms.CharField(required=True)
+    last_name = forms.CharField(required=True)
+
+    class Meta:
+        model = CustomUser
+        fields = list(INTAKE_USER_FIELDS)
+
+    def validate_unique(self):
+        # Usernames are checked against the database once per chunk instead of once per row
+        pass
+
+
+class IntakeFormatError(Exception):
+    """Raised when an intake file cannot be read at all"""
+
+
+class IntakeResult:
+    """Running totals and per-row errors of one intake run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, field, message):
+        self.errors.append((line, field, message))
+
+    @property
+    def failed(self):
+        return len({line for line, _, _ in self.errors})
+
+    def write_errors(self, stream):
+        writer = csv.writer(stream)
+        writer.writerow(['line', 'field', 'error'])
+        writer.writerows(self.errors)
+
+
+def read_rows(file, name=''):
+    """Yield (line number, row dict) from a CSV or XLSX upload without loading it whole"""
+    if os.path.splitext(name or getattr(file, 'name', '') or '')[1].lower() == '.xlsx':
+        yield from read_xlsx_rows(file)
+        return
+    if not isinstance(file, io.TextIOBase):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(file)
+    check_columns(reader.fieldnames)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise IntakeFormatError('Reading .xlsx files requires openpyxl; upload a CSV export instead.')
+    worksheet = load_workbook(file, read_only=True, data_only=True).active
+    rows = worksheet.iter_rows(values_only=True)
+    header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+    check_columns(header)
+    for line, values in enumerate(rows, start=2):
+        yield line, {column: '' if value is None else value for column, value in zip(header, values)}
+
+
+def check_columns(header):
+    missing = set(INTAKE_REQUIRED_COLUMNS) - set(header or ())
+    if missing:
+        raise IntakeFormatError(f"Missing required columns: {', '.join(sorted(missing))}")
+
+
+def clean_row(line, row, result):
+    """Validate one row with the intake and RefugeeForm rules; returns (user, refugee) or None"""
+    data = {}
+    for column in INTAKE_COLUMNS:
+        value = row.get(column)
+        value = '' if value is None else str(value).strip()
+        data[column] = value or INTAKE_DEFAULTS.get(column, '')
+
+    user_form = IntakeUserForm(data)
+    refugee_form = RefugeeForm(data)
+    user_valid, refugee_valid = user_form.is_valid(), refugee_form.is_valid()
+    if not (user_valid and refugee_valid):
+        for form in (user_form, refugee_form):
+            for field, messages in form.errors.items():
+                for message in messages:
+                    result.add_error(line, field, message)
+        return None
+
+    user = user_form.save(commit=False)
+    user.user_type = 'refugee'
+    # Hashing a password per row would dominate the import; imported users sign in via password reset
+    user.set_unusable_password()
+    return user, refugee_form.save(commit=False)
+
+
+def import_chunk(rows, result, seen_usernames, dry_run=False):
+    """Validate and bulk-insert one chunk of rows in a single transaction"""
+    cleaned = []
+    for line, row in rows:
+        pair = clean_row(line, row, result)
+        if pair is not None:
+            cleaned.append((line, pair))
+
+    taken = taken_usernames(cleaned)
+    accepted = []
+    for line, (user, refugee) in cleaned:
+        if user.username in taken or user.username in seen_usernames:
+            result.add_error(line, 'username', f'A user named {user.username} already exists.')
+            continue
+        seen_usernames.add(user.username)
+        accepted.append((line, (user, refugee)))
+
+    while accepted and not dry_run:
+        try:
+            write_chunk([pair for _, pair in accepted])
+            break
+        except IntegrityError:
+            # A signup or another import took one of these names after the check above
+            taken = taken_usernames(accepted)
+            if not taken:
+                raise
+            for line, (user, _) in accepted:
+                if user.username in taken:
+                    result.add_error(line, 'username', f'A user named {user.username} already exists.')
+            accepted = [(line, (user, refugee)) for line, (user, refugee) in accepted if user.username not in taken]
+    result.created += len(accepted)
+
+
+def taken_usernames(cleaned):
+    usernames = [user.username for _, (user, _) in cleaned]
+    return set(CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+
+def write_chunk(accepted):
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create([user for user, _ in accepted])
+        for user, (_, refugee) in zip(users, accepted):
+            refugee.user = user
+        refugees = Refugee.objects.bulk_create([refugee for _, refugee in accepted])
+        # bulk_create skips the model signals, so the dashboard counters are bumped here
+        bump(['refugees_total'], len(refugees))
+        for gender, count in Counter(refugee.gender for refugee in refugees).items():
+            bump([f'refugees_gender_{gender}'], count)
+        expire_scopes(['refugees'])
+
+
+def import_refugees(file, name='', chunk_size=INTAKE_CHUNK_SIZE, dry_run=False, progress=None):
+    """Stream refugee rows from a CSV/XLSX file into users and profiles.
+
+    Valid rows are inserted chunk by chunk; invalid rows are skipped and reported in
+    the result's errors. progress, if given, is called with the result after each chunk.
+    """
+    result = IntakeResult()
+    seen_usernames = set()
+    chunk = []
+    for line, row in read_rows(file, name):
+        result.rows += 1
+        chunk.append((line, row))
+        if len(chunk) >= chunk_size:
+            import_chunk(chunk, result, seen_usernames, dry_run)
+            chunk = []
+            if progress:
+                progress(result)
+    if chunk:
+        import_chunk(chunk, result, seen_usernames, dry_run)
+        if progress:
+            progress(result)
+    return result
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from refugees.allocation import approve_housing_application, ApprovalError
+from refugees.models import NGO, Housing, HousingApplication, Refugee
+
+
+class Command(BaseCommand):
+    help = ('Run concurrent approvers against one housing listing and report throughput. '
+            'Creates its own scratch NGO, housing and refugees and deletes them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--approvers', type=int, default=8, help='Number of concurrent approver threads')
+        parser.add_argument('--applications', type=int, default=200, help='Pending applications to decide')
+        parser.add_argument('--capacity', type=int, default=100, help='Capacity of the contested listing')
+        parser.add_argument('--family-size', type=int, default=1)
+        parser.add_argument('--retries', type=int, default=20,
+                            help='Retries per approval when the database reports a lock conflict')
+
+    def handle(self, *args, **options):
+        if options['approvers'] < 1 or options['applications'] < 1:
+            raise CommandError('--approvers and --applications must be positive.')
+        tag = uuid.uuid4().hex[:8]
+        housing, application_ids = self.create_fixture(tag, options)
+        try:
+            results = self.run_approvers(application_ids, options)
+            self.report(housing, results, options)
+        finally:
+            get_user_model().objects.filter(username__startswith=f'bench-{tag}-').delete()
+
+    def create_fixture(self, tag, options):
+        User = get_user_model()
+        with transaction.atomic():
+            ngo_user = User.objects.create_user(username=f'bench-{tag}-ngo', user_type='ngo')
+            ngo = NGO.objects.create(
+                user=ngo_user, organization_name=f'Benchmark {tag}', registration_number=f'bench-{tag}',
+                description='Benchmark fixture', contact_email='bench@example.org', contact_phone='0',
+                address='-', areas_of_focus='-', established_date=timezone.now().date(),
+            )
+            housing = Housing.objects.create(
+                ngo=ngo, name=f'Benchmark {tag}', description='Benchmark fixture', location='-', address='-',
+                capacity=options['capacity'], housing_type='shelter',
+            )
+            application_ids = []
+            for i in range(options['applications']):
+                user = User.objects.create_user(username=f'bench-{tag}-{i}', user_type='refugee')
+                refugee = Refugee.objects.create(
+                    user=user, gender='O', family_size=options['family_size'],
+                    country_of_origin='-', native_language='-',
+                )
+                application_ids.append(HousingApplication.objects.create(refugee=refugee, housing=housing).pk)
+        return housing, application_ids
+
+    def run_approvers(self, application_ids, options):
+        queue = list(application_ids)
+        queue_lock = threading.Lock()
+        results = {'approved': 0, 'refused': 0, 'lock_retries': 0, 'failed': 0}
+        results_lock = threading.Lock()
+        start = threading.Barrier(options['approvers'] + 1)
+
+        def record(key, amount=1):
+            with results_lock:
+                results[key] += amount
+
+        def approver():
+            start.wait()
+            try:
+                while True:
+                    with queue_lock:
+                        if not queue:
+                            return
+                        application_id = queue.pop()
+                    for attempt in range(options['retries'] + 1):
+                        try:
+                            approve_housing_application(application_id)
+                            record('approved')
+                            break
+                        except ApprovalError:
+                            record('refused')
+                            break
+                        except OperationalError:
+                            # Lock conflict on backends that serialise writers; back off and retry
+                            record('lock_retries')
+                            time.sleep(0.001 * 2 ** min(attempt, 6))
+                    else:
+                        record('failed')
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=approver) for _ in range(options['approvers'])]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        results['seconds'] = time.perf_counter() - began
+        return results
+
+    def report(self, housing, results, options):
+        housing.refresh_from_db()
+        decided = results['approved'] + results['refused']
+        expected = min(options['applications'], options['capacity'] // options['family_size'])
+        self.stdout.write(f"Approvers:        {options['approvers']}")
+        self.stdout.write(f"Applications:     {options['applications']} (family size {options['family_size']})")
+        self.stdout.write(f"Approved:         {results['approved']} (expected {expected})")
+        self.stdout.write(f"Refused (full):   {results['refused']}")
+        self.stdout.write(f"Lock retries:     {results['lock_retries']}")
+        self.stdout.write(f"Gave up:          {results['failed']}")
+        self.stdout.write(f"Occupancy:        {housing.current_occupancy}/{housing.capacity} ({housing.status})")
+        self.stdout.write(f"Elapsed:          {results['seconds']:.3f}s")
+        self.stdout.write(f"Throughput:       {decided / results['seconds']:.1f} decisions/s")
+        if housing.current_occupancy > housing.capacity:
+            raise CommandError('Housing was overfilled: concurrent approvals are not safe.')
+        if results['failed'] == 0 and results['approved'] != expected:
+            raise CommandError('Unexpected number of approvals.')
+        self.stdout.write(self.style.SUCCESS('No overbooking detected.'))
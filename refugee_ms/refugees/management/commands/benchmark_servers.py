@@ -0,0 +1,162 @@
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+# How each server is started: the module run with `python -m`, its arguments, and whether
+# the read-only pages are served by their async variants
+SERVERS = {
+    'wsgi': ('gunicorn', lambda port, options: [
+        'refugee_ms.wsgi:app', '--bind', f'127.0.0.1:{port}',
+        '--workers', str(options['workers']), '--threads', str(options['threads']),
+    ], '0'),
+    'asgi': ('uvicorn', lambda port, options: [
+        'refugee_ms.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(options['workers']), '--no-access-log',
+    ], '1'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare requests per second for the read-only pages under gunicorn (WSGI, sync views) '
+            'and uvicorn (ASGI, async views). Both servers use the current settings and database. '
+            'Creates its own scratch user and deletes it afterwards; sessions must live somewhere '
+            'the server processes can read, so not in a local-memory cache.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive clients')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+        parser.add_argument('--paths', nargs='+', help='Pages to request in turn (default: dashboard and lists)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['workers'] < 1:
+            raise CommandError('--requests, --concurrency and --workers must be positive.')
+        for server in options['servers']:
+            module = SERVERS[server][0]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'The {server} benchmark needs {module}; install it with `pip install {module}`.')
+        paths = options['paths'] or [
+            reverse(name) for name in ('dashboard', 'job_list', 'housing_list', 'refugee_list', 'job_application_list')
+        ]
+
+        user = get_user_model().objects.create_user(username=f'bench-{uuid.uuid4().hex[:8]}-servers', user_type='admin')
+        try:
+            client = Client()
+            client.force_login(user)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+            self.stdout.write(f"{'Server':<8}{'Requests/s':>12}{'Mean ms':>10}{'p95 ms':>10}{'Errors':>8}")
+            for server in options['servers']:
+                results = self.run_server(server, paths, cookie, options)
+                self.stdout.write(
+                    f"{server:<8}{results['rate']:>12.1f}{results['mean_ms']:>10.2f}"
+                    f"{results['p95_ms']:>10.2f}{results['errors']:>8}"
+                )
+        finally:
+            user.delete()
+
+    def run_server(self, server, paths, cookie, options):
+        module, arguments, async_views = SERVERS[server]
+        port = free_port()
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, DJANGO_ASYNC_VIEWS=async_views)
+        # Server logs go to a file: a pipe nobody reads would stall the server once full
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen(
+            [sys.executable, '-m', module, *arguments(port, options)],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            self.wait_until_ready(process, port, server, log)
+            # Warm every worker's connections and caches before timing
+            self.drive(port, paths, cookie, options['concurrency'], options['concurrency'] * len(paths))
+            return self.drive(port, paths, cookie, options['concurrency'], options['requests'])
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+    def wait_until_ready(self, process, port, server, log, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'{server} server exited:\n{log.read().decode(errors="replace")[-2000:]}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                connection.request('GET', reverse('health_check'))
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'{server} server did not answer on port {port} within {timeout}s.')
+
+    def drive(self, port, paths, cookie, concurrency, requests):
+        counts = [requests // concurrency] * concurrency
+        counts[0] += requests - sum(counts)
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+
+        def worker(count, offset):
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            timings, failed = [], 0
+            start.wait()
+            for i in range(count):
+                path = paths[(offset + i) % len(paths)]
+                began = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers={'Cookie': cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection.close()
+                    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                timings.append(time.perf_counter() - began)
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+                errors[0] += failed
+
+        threads = [threading.Thread(target=worker, args=(count, offset)) for offset, count in enumerate(counts) if count]
+        start = threading.Barrier(len(threads) + 1)
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        latencies.sort()
+        return {
+            'rate': len(latencies) / elapsed,
+            'mean_ms': 1000 * sum(latencies) / len(latencies),
+            'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+            'errors': errors[0],
+        }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
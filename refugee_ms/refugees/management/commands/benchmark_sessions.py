@@ -0,0 +1,95 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+# The old configuration: database sessions written on every request
+LEGACY_MODE = 'legacy'
+
+
+class Command(BaseCommand):
+    help = ('Compare requests per second for a signed-in user across the session strategies. '
+            "'legacy' is database sessions saved on every request; the others use sliding expiry. "
+            'Creates its own scratch user and deletes it afterwards.')
+
+    def add_arguments(self, parser):
+        modes = [LEGACY_MODE] + list(settings.SESSION_ENGINES)
+        parser.add_argument('--modes', nargs='+', choices=modes, default=modes)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per mode')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent clients, each with its own session')
+        parser.add_argument('--path', help='Page to request (default: the dashboard)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive.')
+        path = options['path'] or reverse('dashboard')
+        username = f'bench-{uuid.uuid4().hex[:8]}-sessions'
+        user = get_user_model().objects.create_user(username=username, user_type='admin')
+        try:
+            self.stdout.write(f"{'Mode':<16}{'Requests/s':>12}{'Mean ms':>10}{'Errors':>8}")
+            for mode in options['modes']:
+                results = self.run_mode(mode, user, path, options)
+                self.stdout.write(
+                    f"{mode:<16}{results['rate']:>12.1f}{results['mean_ms']:>10.2f}{results['errors']:>8}"
+                )
+        finally:
+            user.delete()
+
+    def mode_settings(self, mode):
+        if mode == LEGACY_MODE:
+            return {'SESSION_ENGINE': settings.SESSION_ENGINES['db'], 'SESSION_SAVE_EVERY_REQUEST': True}
+        return {'SESSION_ENGINE': settings.SESSION_ENGINES[mode], 'SESSION_SAVE_EVERY_REQUEST': False}
+
+    def run_mode(self, mode, user, path, options):
+        with override_settings(**self.mode_settings(mode)):
+            # Clients load the session middleware on first use, so build them under the override
+            clients = []
+            for _ in range(options['concurrency']):
+                client = Client()
+                client.force_login(user)
+                client.get(path)
+                clients.append(client)
+
+            counts = [options['requests'] // len(clients)] * len(clients)
+            counts[0] += options['requests'] - sum(counts)
+            results = {'errors': 0, 'requests': 0}
+            results_lock = threading.Lock()
+            start = threading.Barrier(len(clients) + 1)
+
+            def worker(client, count):
+                start.wait()
+                errors = 0
+                try:
+                    for _ in range(count):
+                        try:
+                            if client.get(path).status_code != 200:
+                                errors += 1
+                        except OperationalError:
+                            # Writers queue up behind each other on SQLite
+                            errors += 1
+                finally:
+                    connections.close_all()
+                with results_lock:
+                    results['errors'] += errors
+                    results['requests'] += count
+
+            threads = [threading.Thread(target=worker, args=pair) for pair in zip(clients, counts)]
+            for thread in threads:
+                thread.start()
+            start.wait()
+            began = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - began
+
+        return {
+            'rate': results['requests'] / seconds,
+            'mean_ms': 1000 * seconds * len(clients) / results['requests'],
+            'errors': results['errors'],
+        }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from refugees.blobs import ORPHAN_GRACE, collect_garbage, recount_references
+from refugees.models import StoredBlob
+
+
+class Command(BaseCommand):
+    help = ('Delete stored documents no longer referenced by any refugee or application, along '
+            'with abandoned uploads. Blobs are kept for --grace seconds after they were last used.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=ORPHAN_GRACE,
+                            help='Seconds an unreferenced blob or stray file is kept')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recount references from the database first, correcting any drift')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['grace'] < 0:
+            raise CommandError('--grace cannot be negative.')
+        if options['recount']:
+            self.stdout.write(f'Corrected the reference count of {recount_references()} blobs.')
+        result = collect_garbage(grace=options['grace'], dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['blobs']} unreferenced blobs and {result['stray_files']} stray files, "
+            f"{result['bytes']} bytes."
+        ))
+        totals = StoredBlob.objects.aggregate(blobs=Count('id'), size=Sum('size'), references=Sum('references'))
+        self.stdout.write(f"{totals['blobs']} blobs ({totals['size'] or 0} bytes) serve "
+                          f"{totals['references'] or 0} stored files.")
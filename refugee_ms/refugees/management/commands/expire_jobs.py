@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from refugees.expiry import expire_jobs
+
+
+class Command(BaseCommand):
+    help = ('Close jobs whose deadline has passed and expire pending applications to closed jobs. '
+            'Run it from cron, or leave it to the expire_jobs background task.')
+
+    def handle(self, *args, **options):
+        closed, expired = expire_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} expired jobs; expired {expired} pending applications.'))
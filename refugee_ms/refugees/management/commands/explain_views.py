@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from refugees import views
+
+LIST_VIEWS = [
+    views.RefugeeListView,
+    views.HousingListView,
+    views.JobListView,
+    views.HousingApplicationListView,
+    views.JobApplicationListView,
+]
+
+
+class Command(BaseCommand):
+    help = "Print the database EXPLAIN plan for each list view's first page, per user type"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-type', choices=['refugee', 'ngo', 'admin'], action='append',
+                            help='Only explain views as this user type (repeatable)')
+        parser.add_argument('--view', action='append', help='Only explain the named view class (repeatable)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run the queries and report actual costs where the backend supports it')
+
+    def handle(self, *args, **options):
+        user_types = options['user_type'] or ['refugee', 'ngo', 'admin']
+        view_classes = [view for view in LIST_VIEWS
+                        if not options['view'] or view.__name__ in options['view']]
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor == 'postgresql':
+                explain_options['analyze'] = True
+            else:
+                self.stdout.write(self.style.WARNING(f'--analyze is not supported on {connection.vendor}; ignoring.'))
+        factory = RequestFactory()
+
+        for user_type in user_types:
+            user = get_user_model().objects.filter(user_type=user_type).order_by('pk').first()
+            if user is None:
+                self.stdout.write(self.style.WARNING(f'No {user_type} user found; skipping.'))
+                continue
+            for view_class in view_classes:
+                request = factory.get('/')
+                request.user = user
+                view = view_class()
+                view.setup(request)
+                try:
+                    queryset = view.get_queryset()
+                except AttributeError:
+                    # The user has no refugee/NGO profile the view can scope by
+                    self.stdout.write(self.style.WARNING(
+                        f'{view_class.__name__} as {user_type}: user has no profile; skipping.'))
+                    continue
+                field = view.keyset_field
+                page = queryset.order_by(f'-{field}', '-pk')[:view.paginate_by + 1]
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{view_class.__name__} as {user_type} ({user.username})'))
+                self.stdout.write(str(page.query))
+                self.stdout.write(page.explain(**explain_options))
+                self.stdout.write('')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from refugees.export import EXPORTS, EXPORT_FORMATS, ExportError, export_rows, filter_export, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream a full data extract as CSV or JSON Lines without loading it into memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--columns', help='Comma-separated columns to include (default: the standard set)')
+        parser.add_argument('--filter', action='append', default=[], metavar='FIELD=VALUE',
+                            help='Only export rows matching FIELD=VALUE (repeatable)')
+        parser.add_argument('--since', help='Only rows dated on or after this date/time')
+        parser.add_argument('--until', help='Only rows dated before this date/time')
+        parser.add_argument('--output', help='Write to this file instead of standard output')
+
+    def handle(self, *args, **options):
+        spec = EXPORTS[options['dataset']]
+        params = {'since': options['since'], 'until': options['until']}
+        for condition in options['filter']:
+            field, separator, value = condition.partition('=')
+            if not separator or field not in spec.filters:
+                raise CommandError(f"Filters must look like FIELD=VALUE with FIELD one of: {', '.join(spec.filters)}")
+            params[field] = value
+
+        requested = [column for column in (options['columns'] or '').split(',') if column]
+        try:
+            columns = spec.select_columns(requested)
+            queryset = filter_export(spec, spec.model.objects.all(), params)
+        except ExportError as error:
+            raise CommandError(str(error))
+
+        lines = stream_export(options['format'], columns, export_rows(spec, queryset, columns))
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
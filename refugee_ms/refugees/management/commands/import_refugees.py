@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from refugees.intake import INTAKE_CHUNK_SIZE, IntakeFormatError, import_refugees
+
+
+class Command(BaseCommand):
+    help = 'Bulk-register refugees from a CSV or XLSX registration sheet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with one refugee per row')
+        parser.add_argument('--chunk-size', type=int, default=INTAKE_CHUNK_SIZE,
+                            help='Rows validated and inserted per transaction')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without saving anything')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        started = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{result.rows} rows read, {result.created} imported, '
+                              f'{result.failed} rejected ({result.rows / elapsed:.0f} rows/s)')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_refugees(file, options['path'], chunk_size=options['chunk_size'],
+                                         dry_run=options['dry_run'], progress=progress)
+        except (OSError, IntakeFormatError) as error:
+            raise CommandError(str(error))
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as report:
+                result.write_errors(report)
+        elif result.errors:
+            for line, field, message in result.errors[:20]:
+                self.stderr.write(f'line {line}: {field}: {message}')
+            if len(result.errors) > 20:
+                self.stderr.write(f'... {len(result.errors) - 20} more; use --errors to save the full report')
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} of {result.rows} refugees {verb} in {time.perf_counter() - started:.1f}s; '
+            f'{result.failed} rows rejected.'))
@@ -0,0 +1,108 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import URLResolver
+
+from refugees import urls
+from refugees.instrumentation import summarize
+
+SORT_KEYS = {
+    'p95': lambda item: -(item[1]['ms']['p95'] or 0),
+    'requests': lambda item: -item[1]['requests'],
+    'queries': lambda item: -(item[1]['queries']['p95'] or 0),
+    'name': lambda item: item[0],
+}
+
+
+def url_names(patterns):
+    """Every route name in patterns, includes followed, in order"""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from url_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+class Command(BaseCommand):
+    help = ('Summarize the requests recorded by QueryInstrumentationMiddleware: p50/p95/p99 time, '
+            'queries, SQL and template time and response size per URL name of refugees/urls.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JSON lines written by the middleware (default: PERF_LOG_FILE)')
+        parser.add_argument('--hours', type=float, help='Only requests from the last this many hours')
+        parser.add_argument('--sort', choices=list(SORT_KEYS), default='p95')
+        parser.add_argument('--all', action='store_true',
+                            help='Include admin pages and requests that matched no URL')
+
+    def handle(self, *args, **options):
+        path = options['file'] or settings.PERF_LOG_FILE
+        if not path:
+            raise CommandError('No records to read: pass --file or set PERF_LOG_FILE. '
+                               'Without a file, /perf/ shows the requests a running process recorded.')
+        try:
+            records, malformed = self.read(path, options['hours'])
+        except FileNotFoundError:
+            raise CommandError(f'{path} does not exist; nothing has been recorded yet.')
+        if malformed:
+            self.stdout.write(f'Skipped {malformed} malformed lines in {path}.')
+
+        names = list(dict.fromkeys(url_names(urls.urlpatterns)))
+        if not options['all']:
+            records = [data for data in records if data['view'] in names]
+        if not records:
+            self.stdout.write('No requests recorded.')
+            return
+        summary = summarize(records)
+
+        self.stdout.write(f'{len(records)} requests over {len(summary)} views\n')
+        self.stdout.write(
+            f"{'View':<34}{'Requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'Queries':>8}{'SQL ms':>8}{'Dups':>6}{'Tmpl ms':>8}{'KB':>7}"
+        )
+        for view, stats in sorted(summary.items(), key=SORT_KEYS[options['sort']]):
+            self.stdout.write(
+                f"{view or '(unresolved)':<34}{stats['requests']:>9}"
+                f"{fmt(stats['ms']['p50'])}{fmt(stats['ms']['p95'])}{fmt(stats['ms']['p99'])}"
+                f"{fmt(stats['queries']['p95'], 8, 0)}{fmt(stats['sql_ms']['p95'], 8)}"
+                f"{fmt(stats['duplicate_queries']['p95'], 6, 0)}{fmt(stats['template_ms']['p95'], 8)}"
+                f"{fmt(stats['bytes']['p50'] and stats['bytes']['p50'] / 1024, 7)}"
+            )
+        self.stdout.write('Times are percentiles; Queries, SQL ms, Dups and Tmpl ms are p95s, KB is the median.')
+
+        repeated = [(view, stats['duplicates']) for view, stats in summary.items() if stats['duplicates']]
+        if repeated:
+            self.stdout.write('\nMost repeated query per view (likely N+1):')
+            for view, (sql, count) in sorted(repeated, key=lambda item: -item[1][1]):
+                self.stdout.write(f'  {view}: {count}x {sql[:160]}')
+
+        unseen = [name for name in names if name not in summary]
+        if unseen:
+            self.stdout.write(f"\nNo requests recorded for: {', '.join(unseen)}")
+
+    def read(self, path, hours):
+        """Return (records, malformed line count).
+
+        Worker processes append to the same file, so a line can be cut short by a crash
+        or interleaved with another process's write; such lines are skipped.
+        """
+        since = time.time() - hours * 3600 if hours else None
+        records, malformed = [], 0
+        with open(path) as log:
+            for line in log:
+                try:
+                    data = json.loads(line)
+                    recent = since is None or data['at'] >= since
+                except (ValueError, KeyError, TypeError):
+                    malformed += 1
+                    continue
+                if recent:
+                    records.append(data)
+        return records, malformed
+
+
+def fmt(value, width=9, digits=1):
+    if value is None:
+        return f"{'-':>{width}}"
+    return f'{value:>{width}.{digits}f}'
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from refugees.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard counters from the source tables'
+
+    def handle(self, *args, **options):
+        values = rebuild_counters()
+        for name, value in sorted(values.items()):
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(values)} dashboard counters.'))
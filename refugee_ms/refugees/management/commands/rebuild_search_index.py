@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from refugees.search import SEARCH_FIELDS, rebuild_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the full-text search tables for job and housing listings'
+
+    def handle(self, *args, **options):
+        if not uses_fts():
+            self.stdout.write('This database indexes listings with expression indexes; nothing to rebuild.')
+            return
+        for model in SEARCH_FIELDS:
+            count = rebuild_index(model)
+            self.stdout.write(f'{model.__name__}: indexed {count} rows')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
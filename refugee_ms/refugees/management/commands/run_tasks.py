@@ -0,0 +1,96 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+
+from refugees.tasks import TASK_RETENTION_DAYS, claim_task, prune_tasks, run_task
+
+# Seconds between deletions of old finished tasks
+PRUNE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = ('Run queued background tasks. Several workers, on this or other machines, may run '
+            'at once: each task is claimed by exactly one of them. No broker is needed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Tasks to run at the same time')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait before looking again when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--max-tasks', type=int, help='Exit after about this many tasks (workers finish the task in hand)')
+        parser.add_argument('--keep-done-days', type=float, default=TASK_RETENTION_DAYS,
+                            help='Delete tasks that finished successfully more than this many days ago, '
+                                 'checked hourly while the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('--concurrency must be positive.')
+        if options['keep_done_days'] < 0:
+            raise CommandError('--keep-done-days cannot be negative.')
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.results = {'done': 0, 'failed': 0}
+        self.next_prune = 0
+        name = f'{socket.gethostname()}:{os.getpid()}'
+
+        if options['concurrency'] == 1:
+            self.work(name, options)
+        else:
+            threads = [
+                threading.Thread(target=self.work, args=(f'{name}:{number}', options), daemon=True)
+                for number in range(options['concurrency'])
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                for thread in threads:
+                    while thread.is_alive():
+                        thread.join(timeout=0.5)
+            except KeyboardInterrupt:
+                # Let running tasks finish; a task killed halfway is retried after TASK_LOCK_TIMEOUT
+                self.stop.set()
+                for thread in threads:
+                    thread.join()
+        self.stdout.write(f"Completed {self.results['done']} tasks; {self.results['failed']} failed or await a retry.")
+
+    def work(self, worker, options):
+        try:
+            while not self.stop.is_set():
+                try:
+                    claimed = claim_task(worker)
+                except OperationalError:
+                    # Another worker holds the write lock (SQLite); try again shortly
+                    self.stop.wait(0.05)
+                    continue
+                if claimed is None:
+                    self.prune(options['keep_done_days'])
+                    if options['burst']:
+                        return
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                succeeded = run_task(claimed)
+                with self.lock:
+                    self.results['done' if succeeded else 'failed'] += 1
+                    if options['max_tasks'] and sum(self.results.values()) >= options['max_tasks']:
+                        self.stop.set()
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+    def prune(self, days):
+        """Delete old finished tasks, at most once per PRUNE_INTERVAL across this process's workers"""
+        with self.lock:
+            if time.monotonic() < self.next_prune:
+                return
+            self.next_prune = time.monotonic() + PRUNE_INTERVAL
+        try:
+            pruned = prune_tasks(days)
+        except OperationalError:
+            # Another worker holds the write lock (SQLite); the next interval tries again
+            return
+        if pruned:
+            self.stdout.write(f'Deleted {pruned} tasks finished more than {days:g} days ago.')
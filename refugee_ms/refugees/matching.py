@@ -0,0 +1,145 @@
+import re
+import threading
+import time
+
+import numpy as np
+
+from .models import Job
+
+# BM25 tuning constants
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# How long a process keeps its in-memory index before rebuilding it, in seconds.
+# Job saves in the same process invalidate it immediately.
+INDEX_TTL = 300
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in is it of on or the to with will you your '
+    'we our must able experience required years year skills skill'.split()
+)
+
+_TOKEN_RE = re.compile(r'[a-z0-9][a-z0-9+#]*')
+
+
+def tokenize(text):
+    """Lowercase word tokens with stop words and single characters removed"""
+    return [token for token in _TOKEN_RE.findall((text or '').lower())
+            if len(token) > 1 and token not in STOP_WORDS]
+
+
+def refugee_profile(refugee):
+    return ' '.join([refugee.skills, refugee.education_level, refugee.native_language])
+
+
+class JobIndex:
+    """Inverted index of job text holding precomputed BM25 weights per (term, job).
+
+    Postings are stored term-major in flat NumPy arrays: the postings of the term
+    with id t are job_rows[offsets[t]:offsets[t + 1]] with weights[...] alongside.
+    """
+
+    def __init__(self, job_ids, documents):
+        self.job_ids = np.asarray(job_ids, dtype=np.int64)
+        self.vocabulary = {}
+        rows, terms, counts = [], [], []
+        lengths = np.zeros(len(documents), dtype=np.float64)
+        for row, document in enumerate(documents):
+            tokens = tokenize(document)
+            lengths[row] = len(tokens)
+            frequencies = {}
+            for token in tokens:
+                term = self.vocabulary.setdefault(token, len(self.vocabulary))
+                frequencies[term] = frequencies.get(term, 0) + 1
+            rows.extend([row] * len(frequencies))
+            terms.extend(frequencies.keys())
+            counts.extend(frequencies.values())
+
+        rows = np.asarray(rows, dtype=np.int64)
+        terms = np.asarray(terms, dtype=np.int64)
+        tf = np.asarray(counts, dtype=np.float64)
+
+        n_docs = len(documents)
+        doc_freq = np.bincount(terms, minlength=len(self.vocabulary)).astype(np.float64)
+        idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        avg_length = (lengths.mean() if n_docs else 0) or 1.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / avg_length)
+        weights = idf[terms] * tf * (BM25_K1 + 1) / (tf + norm)
+
+        order = np.argsort(terms, kind='stable')
+        self.job_rows = rows[order]
+        self.weights = weights[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)))))
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, queryset=None):
+        """Index the text of every currently open job"""
+        if queryset is None:
+            queryset = Job.objects.filter(is_active=True)
+        rows = list(queryset.order_by('pk').values_list('pk', 'title', 'requirements', 'description'))
+        return cls([row[0] for row in rows], [' '.join(row[1:]) for row in rows])
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def scores(self, text):
+        """BM25 score of every indexed job against text, as one array"""
+        scores = np.zeros(len(self.job_ids), dtype=np.float64)
+        terms = {self.vocabulary[token] for token in tokenize(text) if token in self.vocabulary}
+        if not terms:
+            return scores
+        slices = [np.arange(self.offsets[t], self.offsets[t + 1]) for t in terms]
+        postings = np.concatenate(slices)
+        scores += np.bincount(self.job_rows[postings], weights=self.weights[postings], minlength=len(scores))
+        return scores
+
+    def top_k(self, text, k=5, exclude=()):
+        """Return [(job_id, score)] for the k best-matching jobs with a positive score"""
+        scores = self.scores(text)
+        if exclude:
+            scores[np.isin(self.job_ids, list(exclude))] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.lexsort((-self.job_ids[candidates], -scores[candidates]))]
+        return [(int(self.job_ids[row]), float(scores[row])) for row in candidates]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_job_index():
+    """Return this process's job index, rebuilding it when invalidated or older than INDEX_TTL"""
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.built_at > INDEX_TTL:
+        with _index_lock:
+            if _index is index or _index is None:
+                _index = JobIndex.build()
+            index = _index
+    return index
+
+
+def invalidate_job_index():
+    global _index
+    _index = None
+
+
+def recommend_jobs(refugee, k=5, exclude_applied=True):
+    """Return up to k open Job objects best matching the refugee's profile, each with match_score set"""
+    exclude = set()
+    if exclude_applied:
+        exclude = set(refugee.jobapplication_set.values_list('job_id', flat=True))
+    ranked = get_job_index().top_k(refugee_profile(refugee), k=k, exclude=exclude)
+    jobs = Job.objects.select_related('ngo').in_bulk([job_id for job_id, _ in ranked])
+    recommendations = []
+    for job_id, score in ranked:
+        job = jobs.get(job_id)
+        if job is not None and job.is_active:
+            job.match_score = score
+            recommendations.append(job)
+    return recommendations
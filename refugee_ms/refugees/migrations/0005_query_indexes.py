@@ -0,0 +1,85 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0004_dashboardcounter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='housing',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='housing_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housing',
+            index=models.Index(fields=['ngo', '-created_at', '-id'], name='housing_ngo_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housing',
+            index=models.Index(fields=['-created_at', '-id'], name='housing_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housing',
+            index=models.Index(fields=['housing_type', 'status'], name='housing_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['-application_date', '-id'], name='housingapp_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['refugee', '-application_date', '-id'], name='housingapp_refugee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['housing', '-application_date', '-id'], name='housingapp_housing_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['status', '-application_date'], name='housingapp_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-posted_at', '-id', 'deadline'], name='job_active_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['ngo', '-posted_at', '-id'], name='job_ngo_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['-posted_at', '-id'], name='job_posted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['is_active', 'deadline'], name='job_active_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['-applied_at', '-id'], name='jobapp_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['job', '-applied_at', '-id'], name='jobapp_job_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['status', '-applied_at'], name='jobapp_status_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refugee',
+            index=models.Index(fields=['-registered_at', '-id'], name='refugee_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refugee',
+            index=models.Index(fields=['gender'], name='refugee_gender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='refugee',
+            index=models.Index(fields=['country_of_origin'], name='refugee_country_idx'),
+        ),
+    ]
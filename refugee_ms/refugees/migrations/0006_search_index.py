@@ -0,0 +1,46 @@
+from django.db import migrations
+
+SEARCH_FIELDS = {
+    'job': ('title', 'description', 'requirements', 'location', 'employer'),
+    'housing': ('name', 'description', 'location', 'amenities'),
+}
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    for model_name, fields in SEARCH_FIELDS.items():
+        model = apps.get_model('refugees', model_name)
+        table = model._meta.db_table
+        if connection.vendor == 'sqlite':
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({', '.join(fields)}, tokenize='porter unicode61')"
+            )
+            source_fields = ', '.join(f"COALESCE({field}, '')" for field in fields)
+            schema_editor.execute(
+                f"INSERT INTO {table}_fts (rowid, {', '.join(fields)}) SELECT id, {source_fields} FROM {table}"
+            )
+        elif connection.vendor == 'postgresql':
+            from django.contrib.postgres.indexes import GinIndex
+            from django.contrib.postgres.search import SearchVector
+            schema_editor.add_index(model, GinIndex(SearchVector(*fields, config='english'), name=f'{model_name}_search_idx'))
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    for model_name in SEARCH_FIELDS:
+        model = apps.get_model('refugees', model_name)
+        if connection.vendor == 'sqlite':
+            schema_editor.execute(f'DROP TABLE IF EXISTS {model._meta.db_table}_fts')
+        elif connection.vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {model_name}_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
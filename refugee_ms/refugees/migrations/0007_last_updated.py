@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:02
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def backfill_last_updated(apps, schema_editor):
+    # Start from the most recent change we know of rather than the migration time
+    Job = apps.get_model('refugees', 'Job')
+    HousingApplication = apps.get_model('refugees', 'HousingApplication')
+    Job.objects.update(last_updated=F('posted_at'))
+    HousingApplication.objects.update(last_updated=Coalesce('decision_date', 'application_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housingapplication',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='last_updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_last_updated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def close_expired_jobs(apps, schema_editor):
+    # Run the first sweep here so is_active is accurate from this migration on
+    Job = apps.get_model('refugees', 'Job')
+    JobApplication = apps.get_model('refugees', 'JobApplication')
+    DashboardCounter = apps.get_model('refugees', 'DashboardCounter')
+    now = timezone.now()
+    Job.objects.filter(is_active=True, deadline__lte=now).update(is_active=False, last_updated=now)
+    JobApplication.objects.filter(status='pending', job__is_active=False).update(status='expired', last_updated=now)
+    # The counters gain jobs_active; dropping them makes the next read rebuild them all
+    DashboardCounter.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0008_task'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_active_posted_idx',
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending Review'), ('shortlisted', 'Shortlisted'), ('interview', 'Interview Stage'), ('offered', 'Job Offered'), ('accepted', 'Offer Accepted'), ('rejected', 'Rejected'), ('withdrawn', 'Withdrawn'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-posted_at', '-id'], name='job_active_posted_idx'),
+        ),
+        migrations.RunPython(close_expired_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# Columns the admin searches by case-insensitive prefix or exact match, per model
+PREFIX_SEARCH_FIELDS = {
+    'customuser': ('username', 'email', 'first_name', 'last_name'),
+    'refugee': ('country_of_origin',),
+    'housing': ('name', 'location'),
+    'job': ('title', 'employer', 'location'),
+}
+
+
+def index_name(model_name, field):
+    return f'{model_name}_{field}_prefix_idx'
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # istartswith and iexact compile to LIKE on SQLite and UPPER(...) LIKE/= on PostgreSQL,
+    # which only an index with the matching collation or expression can serve
+    connection = schema_editor.connection
+    for model_name, fields in PREFIX_SEARCH_FIELDS.items():
+        table = apps.get_model('refugees', model_name)._meta.db_table
+        for field in fields:
+            name = index_name(model_name, field)
+            if connection.vendor == 'sqlite':
+                schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({field} COLLATE NOCASE)')
+            elif connection.vendor == 'postgresql':
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {name} ON {table} ((UPPER({field}::text)) text_pattern_ops)'
+                )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    for model_name, fields in PREFIX_SEARCH_FIELDS.items():
+        for field in fields:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {index_name(model_name, field)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0009_job_expiry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:45
+
+import django.utils.timezone
+import refugees.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0010_admin_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='resume',
+            field=models.FileField(blank=True, storage=refugees.models.document_storage, upload_to='job_applications/'),
+        ),
+        migrations.AlterField(
+            model_name='refugee',
+            name='documents',
+            field=models.FileField(blank=True, storage=refugees.models.document_storage, upload_to='refugee_documents/'),
+        ),
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('references', models.IntegerField(default=0)),
+                ('touched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['references', 'touched_at'], name='storedblob_orphan_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0011_document_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedblob',
+            name='content_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedblob',
+            name='thumbnail',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
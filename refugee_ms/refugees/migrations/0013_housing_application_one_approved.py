@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refugees', '0012_document_processing'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='housingapplication',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'approved')), fields=('refugee',), name='housingapp_one_approved_per_refugee'),
+        ),
+    ]
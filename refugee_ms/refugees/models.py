@@ -1,9 +1,15 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import storages
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
 
+def document_storage():
+    # Resolved from settings.STORAGES so tests and deployments can swap the backend
+    return storages['documents']
+
+
 class CustomUser(AbstractUser):
     USER_TYPE_CHOICES = [
         ('refugee', 'Refugee'),
@@ -37,7 +43,7 @@ class Refugee(models.Model):
     skills = models.TextField(blank=True)
     medical_conditions = models.TextField(blank=True)
     emergency_contact = models.CharField(max_length=100, blank=True)
-    documents = models.FileField(upload_to='refugee_documents/', blank=True)
+    documents = models.FileField(upload_to='refugee_documents/', storage=document_storage, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     registered_at = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
@@ -45,6 +51,13 @@ class Refugee(models.Model):
     def __str__(self):
         return f"{self.user.get_full_name()} from {self.country_of_origin}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-registered_at', '-id'], name='refugee_registered_idx'),
+            models.Index(fields=['gender'], name='refugee_gender_idx'),
+            models.Index(fields=['country_of_origin'], name='refugee_country_idx'),
+        ]
+
 class Housing(models.Model):
     HOUSING_TYPE_CHOICES = [
         ('camp', 'Refugee Camp'),
@@ -77,6 +90,14 @@ class Housing(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_housing_type_display()})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='housing_status_created_idx'),
+            models.Index(fields=['ngo', '-created_at', '-id'], name='housing_ngo_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='housing_created_idx'),
+            models.Index(fields=['housing_type', 'status'], name='housing_type_status_idx'),
+        ]
+
     @property
     def is_available(self):
         return self.status == 'available' and self.current_occupancy < self.capacity
@@ -94,10 +115,24 @@ class HousingApplication(models.Model):
     application_date = models.DateTimeField(auto_now_add=True)
     decision_date = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
+    last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.refugee.user.get_full_name()} - {self.housing.name}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-application_date', '-id'], name='housingapp_date_idx'),
+            models.Index(fields=['refugee', '-application_date', '-id'], name='housingapp_refugee_date_idx'),
+            models.Index(fields=['housing', '-application_date', '-id'], name='housingapp_housing_date_idx'),
+            models.Index(fields=['status', '-application_date'], name='housingapp_status_date_idx'),
+        ]
+        constraints = [
+            # A family is housed in one unit at a time
+            models.UniqueConstraint(fields=['refugee'], condition=models.Q(status='approved'),
+                                    name='housingapp_one_approved_per_refugee'),
+        ]
+
 class Job(models.Model):
     JOB_TYPE_CHOICES = [
         ('full_time', 'Full Time'),
@@ -117,11 +152,23 @@ class Job(models.Model):
     posted_at = models.DateTimeField(auto_now_add=True)
     deadline = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    last_updated = models.DateTimeField(auto_now=True)
     ngo = models.ForeignKey('NGO', on_delete=models.CASCADE, related_name='job_listings', null=True)
 
     def __str__(self):
         return f"{self.title} at {self.employer}"
 
+    class Meta:
+        indexes = [
+            # Open listings shown to refugees: active rows only, newest first. Jobs past their
+            # deadline are closed by the expiry sweeper (expiry.py), so is_active alone decides
+            models.Index(fields=['-posted_at', '-id'], name='job_active_posted_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['ngo', '-posted_at', '-id'], name='job_ngo_posted_idx'),
+            models.Index(fields=['-posted_at', '-id'], name='job_posted_idx'),
+            models.Index(fields=['is_active', 'deadline'], name='job_active_deadline_idx'),
+        ]
+
     @property
     def is_expired(self):
         return timezone.now() > self.deadline
@@ -135,13 +182,14 @@ class JobApplication(models.Model):
         ('accepted', 'Offer Accepted'),
         ('rejected', 'Rejected'),
         ('withdrawn', 'Withdrawn'),
+        ('expired', 'Expired'),
     ]
 
     refugee = models.ForeignKey(Refugee, on_delete=models.CASCADE)
     job = models.ForeignKey(Job, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     cover_letter = models.TextField(blank=True)
-    resume = models.FileField(upload_to='job_applications/', blank=True)
+    resume = models.FileField(upload_to='job_applications/', storage=document_storage, blank=True)
     applied_at = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
     interview_date = models.DateTimeField(null=True, blank=True)
@@ -152,6 +200,11 @@ class JobApplication(models.Model):
 
     class Meta:
         unique_together = ('refugee', 'job')
+        indexes = [
+            models.Index(fields=['-applied_at', '-id'], name='jobapp_applied_idx'),
+            models.Index(fields=['job', '-applied_at', '-id'], name='jobapp_job_applied_idx'),
+            models.Index(fields=['status', '-applied_at'], name='jobapp_status_applied_idx'),
+        ]
 
 class NGO(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='ngo')
@@ -169,4 +222,63 @@ class NGO(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.organization_name
\ No newline at end of file
+        return self.organization_name
+
+class DashboardCounter(models.Model):
+    """Denormalized dashboard metric kept up to date by the signal handlers in signals.py"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class Task(models.Model):
+    """A unit of background work, run by the run_tasks worker (see tasks.py)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+class StoredBlob(models.Model):
+    """One file in the content-addressed document storage and the number of fields pointing at it"""
+    name = models.CharField(max_length=100, unique=True)
+    size = models.BigIntegerField()
+    references = models.IntegerField(default=0)
+    # Last stored, referenced or released; unreferenced blobs are collected once this is old enough
+    touched_at = models.DateTimeField(default=timezone.now)
+    # Filled in by the process_document task (see documents.py)
+    content_type = models.CharField(max_length=100, blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.CharField(max_length=100, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['references', 'touched_at'], name='storedblob_orphan_idx'),
+        ]
@@ -0,0 +1,205 @@
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+from .counters import total_count
+
+CURSOR_SALT = 'refugees.pagination.cursor'
+
+# Rows an approximate count will count exactly before settling for "at least this many"
+APPROXIMATE_COUNT_LIMIT = 10000
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing with opaque cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(direction, value, pk):
+    # Full-precision ISO strings; anything coarser would skip rows sharing a millisecond
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return signing.dumps([direction, value, pk], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    try:
+        direction, value, pk = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise Http404('Invalid page cursor.')
+    if direction not in ('next', 'prev'):
+        raise Http404('Invalid page cursor.')
+    return direction, value, pk
+
+
+def paginate_keyset(queryset, field_name, page_size, cursor=None, descending=True):
+    """Return a KeysetPage of queryset ordered by (field_name, pk) starting after cursor.
+
+    Rows are located with a range condition on the ordering columns rather than an
+    OFFSET, so the cost of a page does not grow with how deep into the listing it is.
+    """
+    queryset, forwards = keyset_queryset(queryset, field_name, cursor, descending)
+    return keyset_page(queryset, field_name, list(queryset[:page_size + 1]), page_size, cursor, forwards)
+
+
+async def apaginate_keyset(queryset, field_name, page_size, cursor=None, descending=True):
+    """paginate_keyset() for async views"""
+    queryset, forwards = keyset_queryset(queryset, field_name, cursor, descending)
+    rows = [row async for row in queryset[:page_size + 1]]
+    return keyset_page(queryset, field_name, rows, page_size, cursor, forwards)
+
+
+def keyset_queryset(queryset, field_name, cursor, descending):
+    """Order and filter queryset to the rows after cursor; returns it and whether it walks forwards"""
+    field = queryset.model._meta.get_field(field_name)
+    direction, value, pk = decode_cursor(cursor) if cursor else ('next', None, None)
+    if value is not None:
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            raise Http404('Invalid page cursor.')
+
+    # Walking backwards reverses the listing order, then the page is flipped back
+    forwards = direction == 'next'
+    ascending = forwards != descending
+    order = [field_name, 'pk'] if ascending else [f'-{field_name}', '-pk']
+    queryset = queryset.order_by(*order)
+    if value is not None:
+        lookup = 'gt' if ascending else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{field_name}__{lookup}': value}) | Q(**{field_name: value, f'pk__{lookup}': pk})
+        )
+    return queryset, forwards
+
+
+def keyset_page(queryset, field_name, rows, page_size, cursor, forwards):
+    """Build the KeysetPage from up to page_size + 1 rows fetched from keyset_queryset()"""
+    attname = queryset.model._meta.get_field(field_name).attname
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forwards:
+        rows.reverse()
+
+    def cursor_for(direction, row):
+        return encode_cursor(direction, getattr(row, attname), row.pk)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or not forwards:
+            next_cursor = cursor_for('next', rows[-1])
+        if cursor and (has_more or forwards):
+            previous_cursor = cursor_for('prev', rows[0])
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """ListView mixin paginating by an opaque ?cursor= instead of page numbers"""
+    paginate_by = 25
+    keyset_field = None
+    keyset_descending = True
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        page = paginate_keyset(
+            queryset,
+            self.keyset_field,
+            page_size,
+            cursor=self.request.GET.get(self.cursor_kwarg),
+            descending=self.keyset_descending,
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        if page is not None:
+            context['next_page_query'] = self._cursor_query(page.next_cursor)
+            context['previous_page_query'] = self._cursor_query(page.previous_cursor)
+        return context
+
+    def _cursor_query(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = cursor
+        return params.urlencode()
+
+
+class ApiCursorPagination(CursorPagination):
+    """Opaque cursors over each viewset's keyset ordering, so deep pages cost the same as the first"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        return view.cursor_ordering
+
+
+def estimated_count(queryset):
+    """A cheap row count for an unfiltered queryset, or None when there is none to be had.
+
+    Counted models read their maintained total; on PostgreSQL other tables use the
+    planner's estimate, which is only trusted for tables too big to count quickly.
+    """
+    if queryset.query.where or queryset.query.is_sliced:
+        return None
+    model = queryset.model
+    count = total_count(model)
+    if count is not None:
+        return count
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > APPROXIMATE_COUNT_LIMIT:
+            return int(row[0])
+    return None
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator for big admin changelists that avoids COUNT(*) over whole tables.
+
+    Unfiltered lists are sized from estimated_count(), or counted exactly when it has
+    no estimate (small PostgreSQL tables, and every table of a model without a
+    maintained counter on other backends), so every row stays reachable. Filtered
+    lists count at most APPROXIMATE_COUNT_LIMIT matches, so rows past that are
+    reached by narrowing the filter.
+    """
+    count_limit = APPROXIMATE_COUNT_LIMIT
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            return queryset.count()
+        return queryset[:self.count_limit].count()
@@ -0,0 +1,137 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Replica reads are sent to while a read-only view runs; None means the primary
+_read_alias = ContextVar('read_alias', default=None)
+# Set while the client is still pinned to the primary by an earlier write
+_pinned = ContextVar('pinned_to_primary', default=False)
+# Set once the current request (or command) has written
+_wrote = ContextVar('wrote', default=False)
+
+PIN_COOKIE_NAME = 'primary_pin'
+
+
+def read_alias():
+    """A configured read replica to serve this request's reads, or None to read from the primary"""
+    replicas = [alias for alias in getattr(settings, 'READ_REPLICAS', ()) if alias in settings.DATABASES]
+    return random.choice(replicas) if replicas else None
+
+
+def rendered(response):
+    # Templates evaluate their querysets while rendering, so render before leaving the replica
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads made inside read-only views to a replica; writes always go to the primary.
+
+    Reads stay on the primary once the request has written, and for READ_YOUR_WRITES_SECONDS
+    after any earlier write by the same client (see PrimaryPinningMiddleware), so people
+    see their own changes before replication catches up. Replicas hold the same data as
+    the primary, so rows loaded from one may be saved through or related to the other.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get() or _wrote.get():
+            return None
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        # Without this, saving a row loaded from a replica would try to write there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """Pin a client's reads to the primary for a few seconds after it writes.
+
+    The pin is a short-lived cookie holding its expiry time, so it costs no session write.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        pinned_token = _pinned.set(self.is_pinned(request))
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+        return self.pin(response) if wrote else response
+
+    async def __acall__(self, request):
+        pinned_token = _pinned.set(self.is_pinned(request))
+        wrote_token = _wrote.set(False)
+        try:
+            response = await self.get_response(request)
+            wrote = _wrote.get()
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+        return self.pin(response) if wrote else response
+
+    def pin(self, response):
+        seconds = settings.READ_YOUR_WRITES_SECONDS
+        response.set_cookie(
+            PIN_COOKIE_NAME, str(time.time() + seconds), max_age=seconds,
+            secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+        )
+        return response
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class ReadReplicaMixin:
+    """View mixin serving the whole request's reads from a replica, when one is configured"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with reading_from(read_alias()):
+            return rendered(super().dispatch(request, *args, **kwargs))
+
+
+def read_from_replica(view):
+    """Function-view counterpart of ReadReplicaMixin"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with reading_from(read_alias()):
+            return rendered(view(request, *args, **kwargs))
+    return wrapper
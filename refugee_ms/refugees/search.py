@@ -0,0 +1,159 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Housing, Job
+
+# Columns indexed for full-text search, per model
+SEARCH_FIELDS = {
+    Job: ('title', 'description', 'requirements', 'location', 'employer'),
+    Housing: ('name', 'description', 'location', 'amenities'),
+}
+
+# Ranked search results are capped rather than paginated
+SEARCH_RESULT_LIMIT = 100
+
+SEARCH_CONFIG = 'english'
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query or '')
+
+
+def fts_match_expression(query):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+
+def search_vector(model):
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector(*SEARCH_FIELDS[model], config=SEARCH_CONFIG)
+
+
+# SQLite FTS5 index maintenance
+
+def create_fts_table(model, cursor):
+    table = fts_table(model)
+    columns = ', '.join(SEARCH_FIELDS[model])
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5({columns}, tokenize='porter unicode61')"
+    )
+
+
+def drop_fts_table(model, cursor):
+    cursor.execute(f'DROP TABLE IF EXISTS {fts_table(model)}')
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def index_instance(instance):
+    """Write one row's searchable text into its FTS table"""
+    if not uses_fts():
+        return
+    model = type(instance)
+    table = fts_table(model)
+    fields = SEARCH_FIELDS[model]
+    values = [getattr(instance, field) or '' for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, {', '.join(fields)}) VALUES (%s{', %s' * len(fields)})",
+            [instance.pk, *values],
+        )
+
+
+def unindex_instance(instance):
+    if not uses_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {fts_table(type(instance))} WHERE rowid = %s', [instance.pk])
+
+
+def rebuild_index(model):
+    """Repopulate a model's FTS table from the source table; returns the row count"""
+    if not uses_fts():
+        return model.objects.count()
+    table = fts_table(model)
+    fields = ', '.join(SEARCH_FIELDS[model])
+    source_fields = ', '.join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS[model])
+    with connection.cursor() as cursor:
+        create_fts_table(model, cursor)
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f'INSERT INTO {table} (rowid, {fields}) SELECT id, {source_fields} FROM {model._meta.db_table}'
+        )
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        return cursor.fetchone()[0]
+
+
+# Querying
+
+def search(queryset, query, limit=SEARCH_RESULT_LIMIT):
+    """Filter queryset to rows matching query, best matches first, annotated with search_rank.
+
+    Pass limit=None for every match.
+    """
+    model = queryset.model
+    if not search_terms(query):
+        return queryset.none()
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.annotate(
+            search_vector=search_vector(model),
+            search_rank=SearchRank(search_vector(model), search_query),
+        ).filter(search_vector=search_query).order_by('-search_rank', '-pk')[:limit]
+
+    if uses_fts():
+        table = fts_table(model)
+        # bm25() is lower for better matches; negate it so search_rank sorts like PostgreSQL's
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.rowid = {model._meta.db_table}.id', f'{table} MATCH %s'],
+            params=[fts_match_expression(query)],
+            select={'search_rank': f'-bm25({table})'},
+        ).order_by('-search_rank', '-pk')[:limit]
+
+    # Backends without a full-text engine fall back to a substring scan
+    condition = Q()
+    for term in search_terms(query):
+        term_condition = Q()
+        for field in SEARCH_FIELDS[model]:
+            term_condition |= Q(**{f'{field}__icontains': term})
+        condition &= term_condition
+    return queryset.filter(condition).order_by('-pk')[:limit]
+
+
+class SearchMixin:
+    """ListView mixin adding ranked full-text search through ?q="""
+    search_kwarg = 'q'
+    search_limit = SEARCH_RESULT_LIMIT
+
+    def get_search_query(self):
+        return self.request.GET.get(self.search_kwarg, '').strip()
+
+    def get_paginate_by(self, queryset):
+        # Ranked results are already capped, so cursor pagination is only used for browsing
+        if self.get_search_query():
+            return None
+        return super().get_paginate_by(queryset)
+
+    def apply_search(self, queryset):
+        query = self.get_search_query()
+        if query:
+            return search(queryset, query, limit=self.search_limit)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_query'] = self.get_search_query()
+        context['search_result_limit'] = SEARCH_RESULT_LIMIT
+        return context
@@ -0,0 +1,169 @@
+from decimal import Decimal
+from datetime import datetime
+
+from rest_framework import serializers
+
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication, NGO
+
+
+class SparseFieldsetSerializer(serializers.ModelSerializer):
+    """ModelSerializer that trims itself to ?fields= and can serialize plain value rows.
+
+    select_related/prefetch_related name the relations its fields read, so views can
+    load them with the queryset. value_lookups maps each field that can be read straight
+    from QuerySet.values() to its lookup; list endpoints use them to skip model
+    instances and per-field serializer work when every requested field has one.
+    """
+    select_related = ()
+    prefetch_related = ()
+    value_lookups = {}
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def field_names(cls):
+        return list(cls.Meta.fields)
+
+    @classmethod
+    def load_relations(cls, queryset):
+        return queryset.select_related(*cls.select_related).prefetch_related(*cls.prefetch_related)
+
+    def can_serialize_values(self):
+        return all(name in self.value_lookups for name in self.fields)
+
+    def values_lookups(self):
+        return [self.value_lookups[name] for name in self.fields]
+
+    def represent_values(self, rows):
+        """Turn QuerySet.values() rows into the same dicts to_representation would produce"""
+        names = list(self.fields)
+        lookups = [self.value_lookups[name] for name in names]
+        # Dates and decimals must be formatted by their field; everything else passes through
+        converted = {}
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup in zip(names, lookups):
+                value = row[lookup]
+                if isinstance(value, (datetime, Decimal)):
+                    if name not in converted:
+                        converted[name] = self.fields[name].to_representation
+                    value = converted[name](value)
+                item[name] = value
+            data.append(item)
+        return data
+
+
+class RefugeeSerializer(SparseFieldsetSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+
+    select_related = ('user',)
+    value_lookups = {
+        'id': 'id', 'username': 'user__username', 'first_name': 'user__first_name',
+        'last_name': 'user__last_name', 'date_of_birth': 'date_of_birth', 'gender': 'gender',
+        'family_size': 'family_size', 'country_of_origin': 'country_of_origin',
+        'native_language': 'native_language', 'education_level': 'education_level', 'skills': 'skills',
+        'status': 'status', 'registered_at': 'registered_at', 'last_updated': 'last_updated',
+    }
+
+    class Meta:
+        model = Refugee
+        fields = ['id', 'username', 'first_name', 'last_name', 'date_of_birth', 'gender', 'family_size',
+                  'country_of_origin', 'native_language', 'education_level', 'skills', 'status',
+                  'registered_at', 'last_updated']
+
+
+class NGOSerializer(SparseFieldsetSerializer):
+    housing_listings = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    job_listings = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    prefetch_related = ('housing_listings', 'job_listings')
+    value_lookups = {
+        'id': 'id', 'organization_name': 'organization_name', 'registration_number': 'registration_number',
+        'description': 'description', 'website': 'website', 'contact_email': 'contact_email',
+        'contact_phone': 'contact_phone', 'address': 'address', 'areas_of_focus': 'areas_of_focus',
+        'established_date': 'established_date',
+    }
+
+    class Meta:
+        model = NGO
+        fields = ['id', 'organization_name', 'registration_number', 'description', 'website', 'contact_email',
+                  'contact_phone', 'address', 'areas_of_focus', 'established_date',
+                  'housing_listings', 'job_listings']
+
+
+class HousingSerializer(SparseFieldsetSerializer):
+    ngo_name = serializers.CharField(source='ngo.organization_name', read_only=True, default=None)
+
+    select_related = ('ngo',)
+    value_lookups = {
+        'id': 'id', 'ngo': 'ngo_id', 'ngo_name': 'ngo__organization_name', 'name': 'name',
+        'description': 'description', 'location': 'location', 'address': 'address', 'capacity': 'capacity',
+        'current_occupancy': 'current_occupancy', 'housing_type': 'housing_type', 'amenities': 'amenities',
+        'status': 'status', 'cost_per_month': 'cost_per_month', 'created_at': 'created_at',
+        'last_updated': 'last_updated',
+    }
+
+    class Meta:
+        model = Housing
+        fields = ['id', 'ngo', 'ngo_name', 'name', 'description', 'location', 'address', 'capacity',
+                  'current_occupancy', 'housing_type', 'amenities', 'status', 'cost_per_month',
+                  'created_at', 'last_updated']
+
+
+class JobSerializer(SparseFieldsetSerializer):
+    ngo_name = serializers.CharField(source='ngo.organization_name', read_only=True, default=None)
+
+    select_related = ('ngo',)
+    value_lookups = {
+        'id': 'id', 'ngo': 'ngo_id', 'ngo_name': 'ngo__organization_name', 'title': 'title',
+        'description': 'description', 'location': 'location', 'employer': 'employer', 'job_type': 'job_type',
+        'salary_range': 'salary_range', 'requirements': 'requirements', 'benefits': 'benefits',
+        'posted_at': 'posted_at', 'deadline': 'deadline', 'is_active': 'is_active',
+    }
+
+    class Meta:
+        model = Job
+        fields = ['id', 'ngo', 'ngo_name', 'title', 'description', 'location', 'employer', 'job_type',
+                  'salary_range', 'requirements', 'benefits', 'posted_at', 'deadline', 'is_active']
+
+
+class HousingApplicationSerializer(SparseFieldsetSerializer):
+    refugee_username = serializers.CharField(source='refugee.user.username', read_only=True)
+    housing_name = serializers.CharField(source='housing.name', read_only=True)
+
+    select_related = ('refugee__user', 'housing')
+    value_lookups = {
+        'id': 'id', 'refugee': 'refugee_id', 'refugee_username': 'refugee__user__username',
+        'housing': 'housing_id', 'housing_name': 'housing__name', 'status': 'status',
+        'application_date': 'application_date', 'decision_date': 'decision_date', 'notes': 'notes',
+    }
+
+    class Meta:
+        model = HousingApplication
+        fields = ['id', 'refugee', 'refugee_username', 'housing', 'housing_name', 'status',
+                  'application_date', 'decision_date', 'notes']
+
+
+class JobApplicationSerializer(SparseFieldsetSerializer):
+    refugee_username = serializers.CharField(source='refugee.user.username', read_only=True)
+    job_title = serializers.CharField(source='job.title', read_only=True)
+
+    select_related = ('refugee__user', 'job')
+    value_lookups = {
+        'id': 'id', 'refugee': 'refugee_id', 'refugee_username': 'refugee__user__username', 'job': 'job_id',
+        'job_title': 'job__title', 'status': 'status', 'cover_letter': 'cover_letter',
+        'applied_at': 'applied_at', 'last_updated': 'last_updated', 'interview_date': 'interview_date',
+        'notes': 'notes',
+    }
+
+    class Meta:
+        model = JobApplication
+        fields = ['id', 'refugee', 'refugee_username', 'job', 'job_title', 'status', 'cover_letter',
+                  'applied_at', 'last_updated', 'interview_date', 'notes']
@@ -0,0 +1,62 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Session key holding when the session was last written, in seconds since the epoch
+REFRESHED_AT_KEY = '_refreshed_at'
+
+
+def refresh_window(expiry_age):
+    """Seconds before expiry within which a request rewrites the session"""
+    return getattr(settings, 'SESSION_REFRESH_WITHIN', expiry_age // 2)
+
+
+class SlidingSessionMiddleware:
+    """Extend active sessions without writing them on every request.
+
+    SESSION_SAVE_EVERY_REQUEST turns every page view into a session write. Instead the
+    session remembers when it was last written and is only marked modified, and so saved
+    with a fresh expiry and cookie, once less than SESSION_REFRESH_WITHIN seconds of its
+    lifetime remain. Anonymous visitors without a session are left alone.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is not None and not session.is_empty() and self.needs_refresh(session):
+            session[REFRESHED_AT_KEY] = int(time.time())
+        return response
+
+    async def __acall__(self, request):
+        # The same as __call__, loading the session without blocking the event loop
+        response = await self.get_response(request)
+        session = getattr(request, 'session', None)
+        if session is not None and not session.is_empty():
+            refreshed_at = await session.aget(REFRESHED_AT_KEY)
+            if self.is_due(session, refreshed_at, await session.aget_expiry_age()):
+                await session.aset(REFRESHED_AT_KEY, int(time.time()))
+        return response
+
+    def needs_refresh(self, session):
+        return self.is_due(session, session.get(REFRESHED_AT_KEY), session.get_expiry_age())
+
+    def is_due(self, session, refreshed_at, expiry_age):
+        if session.modified:
+            # It is being saved anyway, so restart the window from this write
+            return True
+        if refreshed_at is None:
+            # Loading may reveal a stale cookie for a session that no longer exists
+            return not session.is_empty()
+        return int(time.time()) - refreshed_at >= expiry_age - refresh_window(expiry_age)
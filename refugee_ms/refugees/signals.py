@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+
+from .blobs import BLOB_FIELDS, file_name, move_reference, release
+from .counters import COUNTER_FIELDS, counter_keys, bump, move
+from .search import SEARCH_FIELDS, index_instance, unindex_instance
+from .matching import invalidate_job_index
+from .caching import expire_scopes, invalidation_scopes
+from .expiry import schedule_sweep
+from .sqlite import configure_connection
+from .instrumentation import instrument_connection
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication, NGO
+
+
+def remember_counter_keys(sender, instance, **kwargs):
+    # Keep the keys the row was loaded with so updates can move it between counters.
+    # Rows loaded with the relevant fields deferred are resolved lazily in pre_save.
+    if not instance.pk or instance.get_deferred_fields() & set(COUNTER_FIELDS[sender]):
+        instance._counter_keys = None
+    else:
+        instance._counter_keys = counter_keys(instance)
+
+
+def load_missing_counter_keys(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk or getattr(instance, '_counter_keys', None) is not None:
+        return
+    stored = sender._default_manager.filter(pk=instance.pk).first()
+    instance._counter_keys = counter_keys(stored) if stored else []
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_keys = counter_keys(instance)
+    old_keys = [] if created else (getattr(instance, '_counter_keys', None) or [])
+    move(old_keys, new_keys)
+    instance._counter_keys = new_keys
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    bump(getattr(instance, '_counter_keys', None) or counter_keys(instance), -1)
+
+
+for model in COUNTER_FIELDS:
+    post_init.connect(remember_counter_keys, sender=model, dispatch_uid=f'counters_init_{model.__name__}')
+    pre_save.connect(load_missing_counter_keys, sender=model, dispatch_uid=f'counters_pre_save_{model.__name__}')
+    post_save.connect(update_counters_on_save, sender=model, dispatch_uid=f'counters_save_{model.__name__}')
+    post_delete.connect(update_counters_on_delete, sender=model, dispatch_uid=f'counters_delete_{model.__name__}')
+
+
+def remember_blob_names(sender, instance, **kwargs):
+    # Raw column values; a deferred field is looked up in pre_save if the row is saved
+    instance._blob_names = {field: file_name(instance.__dict__.get(field)) for field in BLOB_FIELDS[sender]
+                            if field in instance.__dict__}
+
+
+def load_missing_blob_names(sender, instance, raw=False, **kwargs):
+    if raw or not instance.pk:
+        return
+    missing = [field for field in BLOB_FIELDS[sender] if field not in instance._blob_names]
+    if missing:
+        stored = sender._default_manager.filter(pk=instance.pk).values(*missing).first() or {}
+        instance._blob_names.update({field: file_name(stored.get(field)) for field in missing})
+
+
+def update_blob_references(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    for field in BLOB_FIELDS[sender]:
+        name = file_name(getattr(instance, field))
+        move_reference('' if created else instance._blob_names.get(field, ''), name)
+        instance._blob_names[field] = name
+
+
+def release_blobs(sender, instance, **kwargs):
+    # Runs before the delete, in its transaction, so deferred fields can still be loaded
+    for field in BLOB_FIELDS[sender]:
+        release(file_name(getattr(instance, field)))
+
+
+for model in BLOB_FIELDS:
+    post_init.connect(remember_blob_names, sender=model, dispatch_uid=f'blobs_init_{model.__name__}')
+    pre_save.connect(load_missing_blob_names, sender=model, dispatch_uid=f'blobs_pre_save_{model.__name__}')
+    post_save.connect(update_blob_references, sender=model, dispatch_uid=f'blobs_save_{model.__name__}')
+    pre_delete.connect(release_blobs, sender=model, dispatch_uid=f'blobs_delete_{model.__name__}')
+
+
+def index_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_instance(instance)
+
+
+def remove_from_search(sender, instance, **kwargs):
+    unindex_instance(instance)
+
+
+for model in SEARCH_FIELDS:
+    post_save.connect(index_for_search, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    post_delete.connect(remove_from_search, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+
+
+def reset_job_index(sender, instance, raw=False, **kwargs):
+    invalidate_job_index()
+
+
+post_save.connect(reset_job_index, sender=Job, dispatch_uid='matching_save_job')
+post_delete.connect(reset_job_index, sender=Job, dispatch_uid='matching_delete_job')
+
+
+def schedule_job_expiry(sender, instance, raw=False, **kwargs):
+    # Make sure a sweep will close the job once its deadline passes
+    if not raw and instance.is_active:
+        transaction.on_commit(lambda: schedule_sweep(instance.deadline))
+
+
+post_save.connect(schedule_job_expiry, sender=Job, dispatch_uid='expiry_save_job')
+
+
+def expire_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        expire_scopes(invalidation_scopes(instance))
+
+
+def remember_cache_scopes(sender, instance, **kwargs):
+    # Resolve the owning NGO while cascaded parents still exist
+    instance._cache_scopes = invalidation_scopes(instance)
+
+
+def expire_deleted_fragments(sender, instance, **kwargs):
+    expire_scopes(getattr(instance, '_cache_scopes', None) or invalidation_scopes(instance))
+
+
+for model in (Refugee, Housing, Job, JobApplication, HousingApplication, NGO):
+    post_save.connect(expire_fragments, sender=model, dispatch_uid=f'cache_save_{model.__name__}')
+    pre_delete.connect(remember_cache_scopes, sender=model, dispatch_uid=f'cache_pre_delete_{model.__name__}')
+    post_delete.connect(expire_deleted_fragments, sender=model, dispatch_uid=f'cache_delete_{model.__name__}')
+
+
+connection_created.connect(configure_connection, dispatch_uid='sqlite_pragmas')
+connection_created.connect(instrument_connection, dispatch_uid='query_instrumentation')
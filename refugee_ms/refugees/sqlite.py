@@ -0,0 +1,21 @@
+from django.conf import settings
+
+# Pragmas stored in the database file rather than the connection; read-only connections skip them
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+
+def is_read_only(connection):
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created hook applying settings.SQLITE_PRAGMAS to every new SQLite connection"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    read_only = is_read_only(connection)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if read_only and name in PERSISTENT_PRAGMAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
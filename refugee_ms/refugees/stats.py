@@ -0,0 +1,72 @@
+from django.db.models import Count, Q
+
+from .models import Refugee, Housing, Job, JobApplication, HousingApplication
+from .counters import read_counters
+
+
+def refugee_stats():
+    """Total refugees plus a per-gender breakdown in a single query"""
+    aggregates = {'total': Count('id')}
+    for code, _ in Refugee.GENDER_CHOICES:
+        aggregates[f'gender_{code}'] = Count('id', filter=Q(gender=code))
+    counts = Refugee.objects.aggregate(**aggregates)
+    return {
+        'total': counts['total'],
+        'by_gender': {code: counts[f'gender_{code}'] for code, _ in Refugee.GENDER_CHOICES},
+    }
+
+
+def housing_stats():
+    """Housing totals and per-type status counts from one grouped query"""
+    by_type = {code: {status: 0 for status, _ in Housing.STATUS_CHOICES}
+               for code, _ in Housing.HOUSING_TYPE_CHOICES}
+    total = 0
+    available = 0
+    rows = Housing.objects.order_by().values('housing_type', 'status').annotate(count=Count('id'))
+    for row in rows:
+        total += row['count']
+        if row['status'] == 'available':
+            available += row['count']
+        if row['housing_type'] in by_type and row['status'] in by_type[row['housing_type']]:
+            by_type[row['housing_type']][row['status']] = row['count']
+    return {'total': total, 'available': available, 'by_type': by_type}
+
+
+def job_stats():
+    """Total and currently active jobs in a single query"""
+    return Job.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+
+
+def application_stats():
+    """Pending application counts for both application tables"""
+    return {
+        'pending_housing': HousingApplication.objects.filter(status='pending').count(),
+        'pending_jobs': JobApplication.objects.filter(status='pending').count(),
+    }
+
+
+def get_dashboard_stats():
+    """Collect every number shown on the dashboard from the maintained counters"""
+    counters = read_counters()
+    housing_types = [code for code, _ in Housing.HOUSING_TYPE_CHOICES]
+    return {
+        'total_refugees': counters.get('refugees_total', 0),
+        'total_housing': counters.get('housing_total', 0),
+        'total_jobs': counters.get('jobs_total', 0),
+        'available_housing_count': sum(counters.get(f'housing_{code}_available', 0) for code in housing_types),
+        'active_jobs': counters.get('jobs_active', 0),
+        'pending_applications': counters.get('housing_applications_pending', 0) +
+                                counters.get('job_applications_pending', 0),
+        'demographics': {
+            'labels': [label for _, label in Refugee.GENDER_CHOICES],
+            'data': [counters.get(f'refugees_gender_{code}', 0) for code, _ in Refugee.GENDER_CHOICES],
+        },
+        'housing_chart': {
+            'labels': [label for _, label in Housing.HOUSING_TYPE_CHOICES],
+            'occupied': [counters.get(f'housing_{code}_occupied', 0) for code in housing_types],
+            'available': [counters.get(f'housing_{code}_available', 0) for code in housing_types],
+        },
+    }
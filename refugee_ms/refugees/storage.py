@@ -0,0 +1,87 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+# Directory, under the storage root, holding the blobs; anything else is a file stored before it
+BLOB_DIR = 'blobs'
+# Partly written uploads, kept on the blobs' filesystem so finished ones can be renamed into place
+TEMP_DIR = os.path.join(BLOB_DIR, 'tmp')
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_DIR}/') and not name.startswith(f'{TEMP_DIR}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage keeping one copy of each distinct content, named by its SHA-256 hash.
+
+    Uploads are hashed while they stream to a temporary file; one whose content is
+    already stored is discarded and the existing blob's name returned. Only the
+    extension of the requested name is kept. Blobs are shared, so delete() leaves them
+    in place: blobs.py counts the references to each and collect_blobs removes the
+    unreferenced ones.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Equal content should land on the same name, never a suffixed copy
+        return name
+
+    def blob_name(self, digest, name):
+        extension = os.path.splitext(name)[1].lower()[:10]
+        return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+    def temp_dir(self):
+        path = self.path(TEMP_DIR)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def stream_to_temp(self, content):
+        """Copy content to a temporary file in chunks, hashing it; returns (path, hex digest, size)"""
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self.temp_dir(), delete=False) as temp:
+            try:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                temp.close()
+                os.remove(temp.name)
+                raise
+        return temp.name, digest.hexdigest(), size
+
+    def _save(self, name, content):
+        from .blobs import touch, record
+
+        if hasattr(content, 'sha256') and content.sha256 is None:
+            # Only the part of a streamed upload within its quota was kept (see uploads.py)
+            raise SuspiciousFileOperation(f'Refusing to store {content.name!r}: it is over its upload quota.')
+        # Uploads streamed in by DocumentUploadHandler are already hashed and on this filesystem
+        streamed = (getattr(content, 'sha256', None) is not None
+                    and os.path.dirname(content.temporary_file_path()) == self.temp_dir())
+        if streamed:
+            temp_path, digest, size = content.temporary_file_path(), content.sha256, content.size
+        else:
+            temp_path, digest, size = self.stream_to_temp(content)
+
+        name = self.blob_name(digest, name)
+        # Touching the blob's row keeps the collector off it; a missing row means it is gone
+        if touch(name):
+            if not streamed:
+                os.remove(temp_path)
+            return name
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(temp_path, self.file_permissions_mode)
+        os.replace(temp_path, self.path(name))
+        record(name, size, timezone.now())
+        return name
+
+    def delete(self, name):
+        if not is_blob_name(name):
+            super().delete(name)
@@ -0,0 +1,160 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task, HousingApplication, JobApplication
+
+# Registered task functions by name
+TASKS = {}
+
+# Seconds before a running task whose worker stopped answering is handed to another worker
+TASK_LOCK_TIMEOUT = 300
+# Seconds before the first retry; doubled after each further failure, up to RETRY_BACKOFF_MAX
+RETRY_BACKOFF = 30
+RETRY_BACKOFF_MAX = 3600
+# Candidate rows a worker looks at per claim attempt
+CLAIM_BATCH = 10
+# Days a successfully finished task's row is kept before prune_tasks() deletes it
+TASK_RETENTION_DAYS = 7
+# Rows deleted per statement while pruning
+PRUNE_BATCH = 1000
+
+
+def task(name, max_attempts=5):
+    """Register a function as a background task under name"""
+    def register(func):
+        func.task_name = name
+        func.max_attempts = max_attempts
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, delay=0, **payload):
+    """Queue a task to run once any delay (in seconds) has passed.
+
+    The row is written in the caller's transaction, so the task exists exactly when
+    the change it follows up on was committed. Payloads must be JSON-serializable.
+    """
+    if name not in TASKS:
+        raise LookupError(f'No task registered as {name!r}')
+    return Task.objects.create(
+        name=name, payload=payload, max_attempts=TASKS[name].max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BACKOFF * 2 ** (attempts - 1), RETRY_BACKOFF_MAX)
+
+
+def claimable(now):
+    """Tasks that are due, plus running ones whose worker has gone quiet"""
+    stale = now - timedelta(seconds=TASK_LOCK_TIMEOUT)
+    return Q(status='queued', run_after__lte=now) | Q(status='running', locked_at__lt=stale)
+
+
+def claim_task(worker):
+    """Take the next due task for worker, or return None when there is none.
+
+    Claiming is a guarded UPDATE that only matches while the task is still claimable,
+    so however many workers race for a row exactly one of them gets it, on any backend.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(claimable(now)).order_by('run_after', 'pk').values_list('pk', flat=True)
+    for pk in candidates[:CLAIM_BATCH]:
+        claimed = Task.objects.filter(claimable(now), pk=pk).update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def run_task(claimed):
+    """Run a claimed task and record the outcome; returns True if it succeeded"""
+    func = TASKS.get(claimed.name)
+    # Only the worker still holding the claim may record the outcome
+    mine = Task.objects.filter(pk=claimed.pk, status='running', locked_by=claimed.locked_by)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {claimed.name!r}')
+        func(**claimed.payload)
+    except Exception:
+        now = timezone.now()
+        if claimed.attempts >= claimed.max_attempts:
+            mine.update(status='failed', finished_at=now, last_error=traceback.format_exc())
+        else:
+            mine.update(
+                status='queued', locked_by='', locked_at=None, last_error=traceback.format_exc(),
+                run_after=now + timedelta(seconds=retry_delay(claimed.attempts)),
+            )
+        return False
+    mine.update(status='done', finished_at=timezone.now(), last_error='')
+    return True
+
+
+def prune_tasks(days=TASK_RETENTION_DAYS, now=None):
+    """Delete tasks that finished successfully more than days ago; returns how many.
+
+    Failed tasks are kept for inspection. Rows go PRUNE_BATCH at a time, so a large
+    backlog never holds the table in one long delete.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    finished = Task.objects.filter(status='done', finished_at__lt=cutoff)
+    pruned = 0
+    while True:
+        batch = list(finished.values_list('pk', flat=True)[:PRUNE_BATCH])
+        if not batch:
+            return pruned
+        pruned += Task.objects.filter(pk__in=batch).delete()[0]
+
+
+# Tasks
+
+@task('notify_housing_decision')
+def notify_housing_decision(application_id):
+    application = HousingApplication.objects.select_related('refugee__user', 'housing').filter(pk=application_id).first()
+    if application is None or not application.refugee.user.email:
+        return
+    send_mail(
+        subject=f'Your housing application for {application.housing.name}',
+        message=(f'Dear {application.refugee.user.get_full_name()},\n\n'
+                 f'Your application for {application.housing.name} has been {application.status}.'),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[application.refugee.user.email],
+    )
+
+
+@task('notify_job_decision')
+def notify_job_decision(application_id):
+    application = JobApplication.objects.select_related('refugee__user', 'job').filter(pk=application_id).first()
+    if application is None or not application.refugee.user.email:
+        return
+    send_mail(
+        subject=f'Your application for {application.job.title}',
+        message=(f'Dear {application.refugee.user.get_full_name()},\n\n'
+                 f'Your application for {application.job.title} at {application.job.employer} '
+                 f'has been {application.status}.'),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[application.refugee.user.email],
+    )
+
+
+@task('expire_jobs')
+def expire_jobs():
+    from .expiry import expire_jobs as sweep, schedule_next_sweep
+
+    sweep()
+    schedule_next_sweep()
+
+
+@task('process_document')
+def process_document(blob):
+    from .documents import process_blob
+
+    process_blob(blob)
@@ -1,6 +1,8 @@
-from django.test import TestCase, Client
+from django.conf import settings
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from .models import Refugee, Housing, Job, JobApplication, HousingApplication, NGO
@@ -290,3 +292,1447 @@ class RefugeeManagementSystemTests(TestCase):
         response = self.client.get(reverse('logout'))
         self.assertRedirects(response, reverse('login'))
         self.assertFalse('_auth_user_id' in self.client.session)
+
+
+def make_ngo(username='stats_ngo'):
+    user = User.objects.create_user(username=username, password='ngo12345', user_type='ngo')
+    return NGO.objects.create(
+        user=user,
+        organization_name=f'{username} org',
+        registration_number=f'REG-{username}',
+        description='Test NGO',
+        contact_email=f'{username}@example.org',
+        contact_phone='1234567890',
+        address='Test Address',
+        areas_of_focus='Housing',
+        established_date=timezone.now().date()
+    )
+
+def make_refugee(username, gender='M', **kwargs):
+    user = User.objects.create_user(username=username, password='refugee123', user_type='refugee',
+                                    first_name=username.title(), last_name='Test')
+    defaults = {
+        'gender': gender,
+        'family_size': 1,
+        'country_of_origin': 'Test Country',
+        'native_language': 'English',
+    }
+    defaults.update(kwargs)
+    return Refugee.objects.create(user=user, **defaults)
+
+def make_housing(ngo, name='Housing', **kwargs):
+    defaults = {
+        'description': 'Test Description',
+        'location': 'Test Location',
+        'address': 'Test Address',
+        'capacity': 4,
+        'housing_type': 'apartment',
+        'status': 'available',
+    }
+    defaults.update(kwargs)
+    return Housing.objects.create(ngo=ngo, name=name, **defaults)
+
+def make_job(ngo, title='Job', **kwargs):
+    defaults = {
+        'description': 'Test Description',
+        'location': 'Test Location',
+        'employer': 'Test Employer',
+        'job_type': 'full_time',
+        'requirements': 'None',
+        'deadline': timezone.now() + timedelta(days=30),
+    }
+    defaults.update(kwargs)
+    return Job.objects.create(ngo=ngo, title=title, **defaults)
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        make_refugee('alice', gender='F')
+        make_refugee('bob', gender='M')
+        make_refugee('carol', gender='F')
+        make_housing(self.ngo, 'Camp A', housing_type='camp', status='available')
+        make_housing(self.ngo, 'Camp B', housing_type='camp', status='occupied')
+        make_housing(self.ngo, 'Flat', housing_type='apartment', status='available')
+        make_job(self.ngo, 'Open')
+        make_job(self.ngo, 'Expired', deadline=timezone.now() - timedelta(days=1))
+        make_job(self.ngo, 'Closed', is_active=False)
+
+    def test_dashboard_stats_values(self):
+        from .expiry import expire_jobs
+        from .stats import get_dashboard_stats
+        expire_jobs()
+        stats = get_dashboard_stats()
+        self.assertEqual(stats['total_refugees'], 3)
+        self.assertEqual(stats['demographics']['data'], [1, 2, 0])
+        self.assertEqual(stats['total_housing'], 3)
+        self.assertEqual(stats['available_housing_count'], 2)
+        self.assertEqual(stats['housing_chart']['occupied'], [1, 0, 0, 0])
+        self.assertEqual(stats['housing_chart']['available'], [1, 0, 1, 0])
+        self.assertEqual(stats['total_jobs'], 3)
+        self.assertEqual(stats['active_jobs'], 1)
+        self.assertEqual(stats['pending_applications'], 0)
+
+    def test_dashboard_stats_query_count(self):
+        from .stats import get_dashboard_stats
+        get_dashboard_stats()
+        # Everything, active jobs included, comes from the counters table
+        with self.assertNumQueries(1):
+            get_dashboard_stats()
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.refugee = make_refugee('dave')
+        self.housing = make_housing(self.ngo, 'Shelter', housing_type='shelter')
+
+    def counters(self):
+        from .counters import read_counters
+        return read_counters()
+
+    def test_counters_follow_status_changes(self):
+        self.assertEqual(self.counters()['housing_shelter_available'], 1)
+        self.housing.status = 'occupied'
+        self.housing.save()
+        counters = self.counters()
+        self.assertEqual(counters['housing_shelter_available'], 0)
+        self.assertEqual(counters['housing_shelter_occupied'], 1)
+
+        application = HousingApplication.objects.create(refugee=self.refugee, housing=self.housing)
+        self.assertEqual(self.counters()['housing_applications_pending'], 1)
+        application = HousingApplication.objects.only('id').get(pk=application.pk)
+        application.status = 'approved'
+        application.save()
+        self.assertEqual(self.counters()['housing_applications_pending'], 0)
+
+        application.delete()
+        self.housing.delete()
+        counters = self.counters()
+        self.assertEqual(counters['housing_total'], 0)
+        self.assertEqual(counters['housing_applications_total'], 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .counters import compute_counters
+        from .models import DashboardCounter
+        # Queryset updates bypass signals and leave the counters stale
+        Refugee.objects.filter(pk=self.refugee.pk).update(gender='F')
+        DashboardCounter.objects.filter(name='refugees_total').update(value=42)
+        call_command('rebuild_dashboard_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), compute_counters())
+        self.assertEqual(self.counters()['refugees_gender_F'], 1)
+
+    def test_rebuild_overwrites_rows_written_concurrently(self):
+        from unittest import mock
+        from . import counters
+        from .models import DashboardCounter
+        compute = counters.compute_counters
+
+        def compute_while_another_rebuild_writes():
+            # Another first read of the empty table stores its counters meanwhile
+            DashboardCounter.objects.bulk_create([DashboardCounter(name='refugees_total', value=42),
+                                                  DashboardCounter(name='refugees_gender_X', value=3)])
+            return compute()
+
+        DashboardCounter.objects.all().delete()
+        with mock.patch.object(counters, 'compute_counters', compute_while_another_rebuild_writes):
+            values = self.counters()
+        self.assertEqual(values['refugees_total'], 1)
+        self.assertEqual(dict(DashboardCounter.objects.values_list('name', 'value')), values)
+
+
+class EmptyCacheMixin:
+    """Start each test with an empty cache.
+
+    TestCase never commits, so the on_commit scope bumps never run and fragments cached
+    by one test would otherwise be served to the next.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+
+class QueryBudgetMixin:
+    """Assert that a page costs the same number of queries however many rows it lists"""
+
+    def assertQueryBudget(self, url, budget, add_rows):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        # Stamp the fresh session so neither measured request rewrites it
+        self.client.get(url)
+        # Measure full renders, not cached fragments
+        cache.clear()
+        with CaptureQueriesContext(connection) as before:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        add_rows()
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(after), budget, '\n'.join(q['sql'] for q in after.captured_queries))
+        self.assertEqual(len(before), len(after), f'{url} issues queries per listed row')
+
+
+class ListQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.client.login(username='stats_ngo', password='ngo12345')
+        self.counter = 0
+        self.add_rows()
+
+    def add_rows(self):
+        for _ in range(3):
+            self.counter += 1
+            refugee = make_refugee(f'row{self.counter}')
+            housing = make_housing(self.ngo, f'Housing {self.counter}')
+            job = make_job(self.ngo, f'Job {self.counter}')
+            HousingApplication.objects.create(refugee=refugee, housing=housing)
+            JobApplication.objects.create(refugee=refugee, job=job)
+
+    def test_list_views(self):
+        for name in ('refugee_list', 'housing_list', 'job_list',
+                     'housing_application_list', 'job_application_list'):
+            with self.subTest(view=name):
+                self.assertQueryBudget(reverse(name), 10, self.add_rows)
+
+    def test_dashboard(self):
+        self.assertQueryBudget(reverse('dashboard'), 15, self.add_rows)
+
+    def test_detail_views(self):
+        job = Job.objects.first()
+        refugee = Refugee.objects.first()
+
+        def add_applications():
+            for _ in range(3):
+                self.counter += 1
+                JobApplication.objects.create(refugee=make_refugee(f'applicant{self.counter}'), job=job)
+                JobApplication.objects.create(refugee=refugee, job=make_job(self.ngo, f'Extra {self.counter}'))
+
+        self.assertQueryBudget(reverse('job_detail', kwargs={'pk': job.pk}), 10, add_applications)
+        self.assertQueryBudget(reverse('refugee_detail', kwargs={'pk': refugee.pk}), 10, add_applications)
+
+
+class KeysetPaginationTests(EmptyCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        self.client.login(username='stats_ngo', password='ngo12345')
+        self.jobs = [make_job(self.ngo, f'Job {i}') for i in range(7)]
+        # Rows sharing an ordering value must still be split cleanly by the id tiebreaker
+        Job.objects.filter(pk__in=[job.pk for job in self.jobs[2:5]]).update(posted_at=self.jobs[2].posted_at)
+
+    def test_walks_forward_and_back(self):
+        from .pagination import paginate_keyset
+        queryset = Job.objects.all()
+        expected = list(queryset.order_by('-posted_at', '-pk'))
+        pages = []
+        page = paginate_keyset(queryset, 'posted_at', 3)
+        self.assertFalse(page.has_previous)
+        while True:
+            pages.append(page)
+            if not page.has_next:
+                break
+            page = paginate_keyset(queryset, 'posted_at', 3, cursor=page.next_cursor)
+        self.assertEqual([job for p in pages for job in p], expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+
+        back = paginate_keyset(queryset, 'posted_at', 3, cursor=pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        back = paginate_keyset(queryset, 'posted_at', 3, cursor=back.previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous)
+
+    def test_list_view_uses_cursor(self):
+        from .views import JobListView
+        JobListView.paginate_by, original = 4, JobListView.paginate_by
+        self.addCleanup(setattr, JobListView, 'paginate_by', original)
+        response = self.client.get(reverse('job_list'))
+        self.assertEqual(len(response.context['jobs']), 4)
+        self.assertIsNone(response.context['previous_page_query'])
+        response = self.client.get(reverse('job_list') + '?' + response.context['next_page_query'])
+        self.assertEqual(len(response.context['jobs']), 3)
+        self.assertIsNone(response.context['next_page_query'])
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get(reverse('job_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ExplainViewsCommandTests(TestCase):
+    def test_job_list_uses_active_jobs_index(self):
+        from io import StringIO
+        from django.core.management import call_command
+        ngo = make_ngo()
+        make_refugee('erin')
+        make_job(ngo)
+        out = StringIO()
+        call_command('explain_views', user_type=['refugee'], view=['JobListView'], stdout=out)
+        self.assertIn('JobListView as refugee', out.getvalue())
+        self.assertIn('job_active_posted_idx', out.getvalue())
+
+
+class ListingSearchTests(EmptyCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        make_refugee('frank')
+        self.client.login(username='frank', password='refugee123')
+        self.welder = make_job(self.ngo, 'Welder', description='Welding and metal fabrication',
+                               requirements='Welding certificate')
+        self.cook = make_job(self.ngo, 'Cook', description='Kitchen work', requirements='Food safety; welding not needed')
+        self.closed = make_job(self.ngo, 'Senior Welder', description='Welding', is_active=False)
+        make_housing(self.ngo, 'Riverside Flat', amenities='Wifi, laundry')
+        make_housing(self.ngo, 'Hill Camp', housing_type='camp', amenities='Shared kitchen')
+
+    def test_job_search_is_ranked_and_scoped(self):
+        response = self.client.get(reverse('job_list'), {'q': 'weld'})
+        jobs = list(response.context['jobs'])
+        # The closed job matches too but refugees only see open listings
+        self.assertEqual(jobs, [self.welder, self.cook])
+        self.assertEqual(response.context['search_query'], 'weld')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.cook.description = 'Bakery and pastry'
+        self.cook.requirements = 'None'
+        self.cook.save()
+        response = self.client.get(reverse('job_list'), {'q': 'pastry'})
+        self.assertEqual(list(response.context['jobs']), [self.cook])
+        self.cook.delete()
+        response = self.client.get(reverse('job_list'), {'q': 'pastry'})
+        self.assertEqual(list(response.context['jobs']), [])
+
+    def test_housing_search(self):
+        response = self.client.get(reverse('housing_list'), {'q': 'laundry'})
+        self.assertEqual([h.name for h in response.context['housings']], ['Riverside Flat'])
+
+    def test_rebuild_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        Job.objects.filter(pk=self.cook.pk).update(title='Baker')
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('job_list'), {'q': 'baker'})
+        self.assertEqual(list(response.context['jobs']), [self.cook])
+
+
+class JobMatchingTests(EmptyCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        self.refugee = make_refugee('gina', skills='Carpentry, welding and metal work', education_level='Vocational')
+        self.client.login(username='gina', password='refugee123')
+        self.welder = make_job(self.ngo, 'Welder', requirements='Welding and metal work')
+        self.carpenter = make_job(self.ngo, 'Carpenter', requirements='Carpentry')
+        self.nurse = make_job(self.ngo, 'Nurse', requirements='Nursing degree')
+        self.closed = make_job(self.ngo, 'Metal Welder', requirements='Welding', is_active=False)
+
+    def test_index_ranks_by_bm25(self):
+        from .matching import JobIndex
+        index = JobIndex([1, 2, 3], ['python django', 'python', 'cooking'])
+        self.assertEqual([job_id for job_id, _ in index.top_k('django python', k=5)], [1, 2])
+        self.assertEqual(index.top_k('gardening'), [])
+        self.assertEqual(len(index.top_k('python', k=1)), 1)
+
+    def test_recommendations_skip_closed_and_applied_jobs(self):
+        from .matching import recommend_jobs
+        self.assertEqual(recommend_jobs(self.refugee), [self.welder, self.carpenter])
+        JobApplication.objects.create(refugee=self.refugee, job=self.welder)
+        self.assertEqual(recommend_jobs(self.refugee), [self.carpenter])
+
+    def test_new_jobs_invalidate_index(self):
+        from .matching import recommend_jobs
+        recommend_jobs(self.refugee)
+        welding_lead = make_job(self.ngo, 'Welding Lead', requirements='Welding, welding, metal work, carpentry')
+        self.assertEqual(recommend_jobs(self.refugee)[0], welding_lead)
+
+    def test_views(self):
+        response = self.client.get(reverse('recommended_jobs'))
+        self.assertEqual(list(response.context['jobs']), [self.welder, self.carpenter])
+        response = self.client.get(reverse('dashboard'))
+        # Recommendations first, then the newest remaining open jobs
+        self.assertEqual(response.context['available_jobs'], [self.welder, self.carpenter, self.nurse])
+
+
+class HousingAllocationTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.client.login(username='stats_ngo', password='ngo12345')
+        self.small = make_housing(self.ngo, 'Small', capacity=3)
+        self.large = make_housing(self.ngo, 'Large', capacity=5, current_occupancy=1)
+
+    def apply(self, refugee, housing):
+        return HousingApplication.objects.create(refugee=refugee, housing=housing)
+
+    def test_proposal_maximises_people_housed(self):
+        from .allocation import propose_allocation
+        family_of_four = make_refugee('four', family_size=4)
+        family_of_three = make_refugee('three', family_size=3)
+        couple = make_refugee('couple', family_size=2)
+        self.apply(family_of_four, self.large)
+        self.apply(family_of_three, self.small)
+        self.apply(family_of_three, self.large)
+        self.apply(couple, self.small)
+        allocation = propose_allocation(self.ngo)
+        # Four in Large and three in Small beats any placement that includes the couple
+        self.assertEqual(allocation.people_housed, 7)
+        self.assertTrue(allocation.exact)
+        self.assertEqual({(a.refugee_id, a.housing_id) for a in allocation.assignments},
+                         {(family_of_four.pk, self.large.pk), (family_of_three.pk, self.small.pk)})
+
+    def test_exact_solver_beats_greedy(self):
+        from .allocation import greedy_allocation, exact_allocation
+        # Largest-first places the family of three and then neither pair fits; two pairs house four
+        unit = make_housing(self.ngo, 'Unit', capacity=4)
+        applications = [self.apply(make_refugee(name, family_size=size), unit)
+                        for name, size in [('trio', 3), ('pair1', 2), ('pair2', 2)]]
+        capacities = {unit.pk: 4}
+        greedy = greedy_allocation(applications, capacities)
+        self.assertEqual(sum(a.refugee.family_size for a in greedy), 3)
+        assignments, optimal = exact_allocation(applications, capacities, lower_bound=greedy)
+        self.assertTrue(optimal)
+        self.assertEqual(sum(a.refugee.family_size for a in assignments), 4)
+
+    def test_apply_allocation_view(self):
+        family = make_refugee('family', family_size=3)
+        application = self.apply(family, self.small)
+        other = self.apply(make_refugee('other', family_size=2), self.large)
+        response = self.client.get(reverse('housing_allocation'))
+        self.assertEqual(response.context['allocation'].application_ids, [other.pk, application.pk])
+        response = self.client.post(reverse('housing_allocation'), {'application': [application.pk, other.pk]})
+        self.assertRedirects(response, reverse('housing_application_list'))
+        self.small.refresh_from_db()
+        self.large.refresh_from_db()
+        self.assertEqual((self.small.current_occupancy, self.small.status), (3, 'occupied'))
+        self.assertEqual((self.large.current_occupancy, self.large.status), (3, 'available'))
+
+    def test_apply_allocation_rechecks_capacity(self):
+        from .allocation import apply_allocation
+        first = self.apply(make_refugee('first', family_size=2), self.small)
+        second = self.apply(make_refugee('second', family_size=2), self.small)
+        approved, skipped = apply_allocation([first.pk, second.pk], ngo=self.ngo)
+        self.assertEqual((approved, skipped), ([first], [second.pk]))
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+
+class HousingApprovalTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.client.login(username='stats_ngo', password='ngo12345')
+        self.housing = make_housing(self.ngo, 'Last Beds', capacity=4, current_occupancy=1)
+
+    def apply(self, username, family_size):
+        return HousingApplication.objects.create(
+            refugee=make_refugee(username, family_size=family_size), housing=self.housing)
+
+    def approve(self, application):
+        return self.client.get(reverse('update_housing_application_status',
+                                       kwargs={'pk': application.pk, 'status': 'approved'}))
+
+    def test_approval_claims_room_and_fills_unit(self):
+        from .counters import read_counters
+        first, second = self.apply('first', 2), self.apply('second', 1)
+        self.approve(first)
+        self.housing.refresh_from_db()
+        self.assertEqual((self.housing.current_occupancy, self.housing.status), (3, 'available'))
+        self.approve(second)
+        self.housing.refresh_from_db()
+        self.assertEqual((self.housing.current_occupancy, self.housing.status), (4, 'occupied'))
+        counters = read_counters()
+        self.assertEqual(counters['housing_applications_pending'], 0)
+        self.assertEqual(counters['housing_apartment_occupied'], 1)
+
+    def test_last_bed_cannot_be_approved_twice(self):
+        from .allocation import approve_housing_application, ApprovalError
+        big, small = self.apply('big', 3), self.apply('small', 2)
+        approve_housing_application(big.pk)
+        with self.assertRaises(ApprovalError):
+            approve_housing_application(small.pk)
+        with self.assertRaises(ApprovalError):
+            approve_housing_application(big.pk)
+        self.housing.refresh_from_db()
+        self.assertEqual(self.housing.current_occupancy, 4)
+        small.refresh_from_db()
+        self.assertEqual(small.status, 'pending')
+
+    def test_a_family_is_approved_for_one_unit_only(self):
+        from django.db import IntegrityError, transaction
+        from .allocation import approve_housing_application, ApprovalError
+        refugee = make_refugee('twice', family_size=1)
+        other = make_housing(self.ngo, 'Other Beds', capacity=4)
+        here = HousingApplication.objects.create(refugee=refugee, housing=self.housing)
+        there = HousingApplication.objects.create(refugee=refugee, housing=other)
+        approve_housing_application(here.pk)
+        with self.assertRaises(ApprovalError):
+            approve_housing_application(there.pk)
+        other.refresh_from_db()
+        there.refresh_from_db()
+        self.assertEqual((other.current_occupancy, there.status), (0, 'pending'))
+        # The database refuses a second approval that skips the check
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            HousingApplication.objects.filter(pk=there.pk).update(status='approved')
+
+    def test_rejecting_approved_application_releases_room(self):
+        from .counters import compute_counters, read_counters
+        application = self.apply('family', 3)
+        self.approve(application)
+        self.client.get(reverse('update_housing_application_status',
+                                kwargs={'pk': application.pk, 'status': 'rejected'}))
+        self.housing.refresh_from_db()
+        self.assertEqual((self.housing.current_occupancy, self.housing.status), (1, 'available'))
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'rejected')
+        expected = {name: value for name, value in compute_counters().items() if value}
+        actual = {name: value for name, value in read_counters().items() if value}
+        self.assertEqual(actual, expected)
+
+
+class RefugeeIntakeTests(TestCase):
+    header = 'username,first_name,last_name,email,date_of_birth,gender,family_size,country_of_origin,native_language,skills\n'
+
+    def sheet(self, *rows):
+        import io
+        return io.BytesIO((self.header + ''.join(row + '\n' for row in rows)).encode())
+
+    def test_valid_rows_are_imported_and_bad_rows_reported(self):
+        from .counters import compute_counters, read_counters
+        from .intake import import_refugees
+        make_refugee('existing')
+        result = import_refugees(self.sheet(
+            'amina,Amina,Yusuf,amina@example.org,1990-05-01,F,4,Sudan,Arabic,Nursing',
+            'omar,Omar,Ali,,1985-01-31,M,1,Syria,Arabic,',
+            'bad,Bad,Row,not-an-email,1980-02-30,X,0,Syria,Arabic,',
+            'existing,Dup,User,,1985-01-31,M,1,Syria,Arabic,',
+            'omar,Omar,Again,,1985-01-31,M,1,Syria,Arabic,',
+        ), 'intake.csv', chunk_size=2)
+        self.assertEqual((result.rows, result.created, result.failed), (5, 2, 3))
+        self.assertEqual({line for line, _, _ in result.errors}, {4, 5, 6})
+        self.assertEqual({field for line, field, _ in result.errors if line == 4}, {'email', 'date_of_birth', 'gender', 'family_size'})
+        amina = Refugee.objects.select_related('user').get(user__username='amina')
+        self.assertEqual((amina.user.user_type, amina.family_size, amina.status), ('refugee', 4, 'pending'))
+        self.assertFalse(amina.user.has_usable_password())
+        expected = {name: value for name, value in compute_counters().items() if value}
+        actual = {name: value for name, value in read_counters().items() if value}
+        self.assertEqual(actual, expected)
+
+    def test_usernames_taken_during_the_import_are_reported(self):
+        from types import SimpleNamespace
+        from unittest import mock
+        from django.db import transaction
+        from . import intake
+
+        def atomic_after_signup():
+            # Someone signs up as omar between the chunk's username check and its write
+            if not User.objects.filter(username='omar').exists():
+                User.objects.create_user(username='omar', password='omar12345', user_type='refugee')
+            return transaction.atomic()
+
+        with mock.patch.object(intake, 'transaction', SimpleNamespace(atomic=atomic_after_signup)):
+            result = intake.import_refugees(self.sheet(
+                'amina,Amina,Yusuf,,1990-05-01,F,4,Sudan,Arabic,',
+                'omar,Omar,Ali,,1985-01-31,M,1,Syria,Arabic,',
+            ), 'intake.csv')
+        self.assertEqual((result.rows, result.created, result.failed), (2, 1, 1))
+        self.assertEqual([(line, field) for line, field, _ in result.errors], [(3, 'username')])
+        self.assertTrue(Refugee.objects.filter(user__username='amina').exists())
+        self.assertFalse(Refugee.objects.filter(user__username='omar').exists())
+
+    def test_dry_run_and_missing_columns(self):
+        from .intake import IntakeFormatError, import_refugees
+        import io
+        result = import_refugees(self.sheet('amina,Amina,Yusuf,,1990-05-01,F,4,Sudan,Arabic,'), 'intake.csv', dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(User.objects.filter(username='amina').exists())
+        with self.assertRaises(IntakeFormatError):
+            import_refugees(io.BytesIO(b'username,gender\namina,F\n'), 'intake.csv')
+
+    def test_admin_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        User.objects.create_superuser(username='root', password='root12345', user_type='admin')
+        self.client.login(username='root', password='root12345')
+        upload = SimpleUploadedFile('intake.csv', self.sheet('amina,Amina,Yusuf,,1990-05-01,F,4,Sudan,Arabic,').read())
+        response = self.client.post(reverse('admin:refugees_refugee_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Refugee.objects.filter(user__username='amina').exists())
+        self.assertContains(self.client.get(reverse('admin:refugees_refugee_changelist')), 'Import from file')
+
+    def test_admin_upload_needs_add_permission(self):
+        User.objects.create_user(username='clerk', password='clerk12345', user_type='admin', is_staff=True)
+        self.client.login(username='clerk', password='clerk12345')
+        self.assertEqual(self.client.get(reverse('admin:refugees_refugee_import')).status_code, 403)
+
+
+class DataExportTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.other_ngo = make_ngo('other_ngo')
+        self.refugee = make_refugee('exported', medical_conditions='asthma')
+        self.housing = make_housing(self.ngo, 'River Shelter')
+        self.other_housing = make_housing(self.other_ngo, 'Hill House')
+        HousingApplication.objects.create(refugee=self.refugee, housing=self.housing)
+        HousingApplication.objects.create(refugee=self.refugee, housing=self.other_housing, status='approved')
+
+    def download(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_is_scoped_like_the_list_view(self):
+        import csv
+        self.client.login(username='stats_ngo', password='ngo12345')
+        body = self.download(reverse('export_data', args=['housing-applications', 'csv']))
+        rows = list(csv.DictReader(body.splitlines()))
+        self.assertEqual([row['housing'] for row in rows], ['River Shelter'])
+        self.assertEqual(rows[0]['refugee'], 'exported')
+
+    def test_columns_filters_and_jsonl(self):
+        import json
+        self.client.login(username='stats_ngo', password='ngo12345')
+        body = self.download(reverse('export_data', args=['refugees', 'jsonl']) + '?columns=username,family_size')
+        self.assertEqual([json.loads(line) for line in body.splitlines()],
+                         [{'username': 'exported', 'family_size': 1}])
+        self.assertNotIn('asthma', self.download(reverse('export_data', args=['refugees', 'csv'])))
+        url = reverse('export_data', args=['housing-applications', 'csv'])
+        self.assertEqual(self.client.get(url + '?columns=password').status_code, 400)
+        self.assertEqual(self.client.get(url + '?since=yesterday').status_code, 400)
+        self.assertEqual(self.client.get(url + '?since=2024-13-45').status_code, 400)
+
+    def test_refugees_cannot_export(self):
+        self.client.login(username='exported', password='refugee123')
+        response = self.client.get(reverse('export_data', args=['refugees', 'csv']))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+    def test_export_command(self):
+        import io
+        from django.core.management import call_command
+        out = io.StringIO()
+        call_command('export_data', 'housing-applications', '--filter', 'status=approved',
+                     '--columns', 'housing,status', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['housing,status', 'Hill House,approved'])
+
+    def test_export_command_rejects_impossible_dates(self):
+        from django.core.management import CommandError, call_command
+        with self.assertRaisesMessage(CommandError, 'Invalid date: 2024-13-45'):
+            call_command('export_data', 'housing-applications', '--since', '2024-13-45')
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.other_ngo = make_ngo('other_ngo')
+        self.refugee = make_refugee('api_refugee', skills='welding')
+        for i in range(3):
+            make_housing(self.ngo, f'Shelter {i}', cost_per_month='125.50')
+        self.other_housing = make_housing(self.other_ngo, 'Elsewhere')
+        self.client.login(username='stats_ngo', password='ngo12345')
+
+    def test_list_is_scoped_and_cursor_paginated(self):
+        url = reverse('api-housing-list', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual([row['name'] for row in first['results']], ['Shelter 2', 'Shelter 1'])
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['name'] for row in second['results']], ['Shelter 0'])
+        self.assertIsNone(second['next'])
+
+    def test_fast_path_matches_serializer(self):
+        from .serializers import HousingSerializer
+        response = self.client.get(reverse('api-housing-list', kwargs={'version': 'v1'}))
+        expected = HousingSerializer(
+            Housing.objects.filter(ngo=self.ngo).select_related('ngo').order_by('-created_at', '-id'), many=True
+        ).data
+        self.assertEqual(response.json()['results'], [dict(row) for row in expected])
+
+    def test_sparse_fieldsets(self):
+        url = reverse('api-refugee-list', kwargs={'version': 'v1'})
+        rows = self.client.get(url, {'fields': 'username,skills'}).json()['results']
+        self.assertEqual(rows, [{'username': 'api_refugee', 'skills': 'welding'}])
+        self.assertEqual(self.client.get(url, {'fields': 'username,password'}).status_code, 400)
+        detail = self.client.get(reverse('api-refugee-detail', kwargs={'version': 'v1', 'pk': self.refugee.pk}),
+                                 {'fields': 'family_size'})
+        self.assertEqual(detail.json(), {'family_size': 1})
+
+    def test_list_query_count_is_constant(self):
+        url = reverse('api-housing-application-list', kwargs={'version': 'v1'})
+        for housing in Housing.objects.filter(ngo=self.ngo):
+            HousingApplication.objects.create(refugee=self.refugee, housing=housing)
+        # The first request stamps the fresh session for sliding expiry
+        self.client.get(url)
+        # User, NGO profile and the page itself; the session is read from the cache and not rewritten
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 3)
+        with self.assertNumQueries(4):
+            # The NGO serializer reads prefetched listings, so it falls back to model instances
+            self.client.get(reverse('api-ngo-list', kwargs={'version': 'v1'}))
+
+    def test_refugee_sees_only_open_listings_and_unknown_version_404s(self):
+        self.client.login(username='api_refugee', password='refugee123')
+        self.assertEqual(self.client.get('/api/v2/housing/').status_code, 404)
+        names = [row['name'] for row in self.client.get('/api/v1/housing/').json()['results']]
+        self.assertEqual(len(names), 4)
+        own = self.client.get('/api/v1/refugees/').json()['results']
+        self.assertEqual([row['id'] for row in own], [self.refugee.pk])
+
+
+class ConditionalGetTests(EmptyCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        self.housing = make_housing(self.ngo, 'River Shelter')
+        self.spare = make_housing(self.ngo, 'Spare Shelter')
+        self.client.login(username='stats_ngo', password='ngo12345')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_returns_304_until_the_object_changes(self):
+        url = reverse('housing_detail', args=[self.housing.pk])
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.housing.capacity = 8
+        self.housing.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_list_etag_tracks_changes_deletions_and_viewer(self):
+        url = reverse('housing_list')
+        first = self.client.get(url)
+        self.assertEqual(self.revalidate(url, first).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spare.delete()
+        second = self.revalidate(url, first)
+        self.assertEqual(second.status_code, 200)
+        searched = self.client.get(url, {'q': 'river'})
+        self.assertNotEqual(searched['ETag'], second['ETag'])
+        self.assertEqual(self.client.get(url, {'q': 'river'}, HTTP_IF_NONE_MATCH=searched['ETag']).status_code, 304)
+        User.objects.create_user(username='admin2', password='admin12345', user_type='admin')
+        self.client.login(username='admin2', password='admin12345')
+        self.assertEqual(self.revalidate(url, second).status_code, 200)
+
+    def test_application_decision_invalidates_list(self):
+        refugee = make_refugee('applicant')
+        application = HousingApplication.objects.create(refugee=refugee, housing=self.housing)
+        url = reverse('housing_application_list')
+        first = self.client.get(url)
+        from .allocation import approve_housing_application
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_housing_application(application.pk)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_list_revalidation_does_not_aggregate_the_list(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('housing_list')
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'refugees_housing' in q['sql']])
+
+    def test_pending_messages_force_a_render(self):
+        url = reverse('job_list')
+        first = self.client.get(url)
+        # Applying to a missing profile flashes a message and redirects back
+        self.client.get(reverse('create_refugee_profile'))
+        response = self.revalidate(url, first)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Only refugee users')
+
+
+class FragmentCachingTests(EmptyCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        self.other_ngo = make_ngo('other_ngo')
+        self.housing = make_housing(self.ngo, 'River Shelter')
+        make_housing(self.other_ngo, 'Hill Shelter')
+        make_refugee('hana')
+        self.client.login(username='hana', password='refugee123')
+
+    def render(self, url, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_repeat_render_is_served_from_cache(self):
+        url = reverse('housing_list')
+        first, uncached = self.render(url)
+        second, cached = self.render(url)
+        self.assertIsNone(first.context['cached_listing'])
+        self.assertIsNotNone(second.context['cached_listing'])
+        self.assertLess(cached, uncached)
+        self.assertContains(second, 'River Shelter')
+
+    def test_saving_a_listing_expires_the_fragment(self):
+        url = reverse('housing_list')
+        self.render(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.housing.name = 'Lake Shelter'
+            self.housing.save()
+        response, _ = self.render(url)
+        self.assertIsNone(response.context['cached_listing'])
+        self.assertContains(response, 'Lake Shelter')
+
+    def test_ngo_fragments_are_per_ngo(self):
+        self.client.login(username='stats_ngo', password='ngo12345')
+        response, _ = self.render(reverse('housing_list'))
+        self.assertContains(response, 'River Shelter')
+        self.client.login(username='other_ngo', password='ngo12345')
+        response, _ = self.render(reverse('housing_list'))
+        self.assertIsNone(response.context['cached_listing'])
+        self.assertContains(response, 'Hill Shelter')
+        self.assertNotContains(response, 'River Shelter')
+
+    def test_searches_are_not_cached(self):
+        url = reverse('housing_list')
+        self.render(url, q='river')
+        response, _ = self.render(url, q='river')
+        self.assertIsNone(response.context['cached_listing'])
+        self.assertEqual(response.context['fragment_timeout'], 0)
+
+    def test_approval_expires_dashboard_fragments(self):
+        from .allocation import approve_housing_application
+        application = HousingApplication.objects.create(refugee=Refugee.objects.get(user__username='hana'),
+                                                        housing=self.housing)
+        self.client.login(username='stats_ngo', password='ngo12345')
+        before = self.client.get(reverse('dashboard')).context['dashboard_vary']
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_housing_application(application.pk)
+        after = self.client.get(reverse('dashboard')).context['dashboard_vary']
+        self.assertNotEqual(before, after)
+
+
+class SessionStrategyTests(TestCase):
+    def setUp(self):
+        make_refugee('ines')
+        self.client.login(username='ines', password='refugee123')
+        self.client.get(reverse('job_list'))
+
+    def session_writes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('job_list'))
+        self.assertEqual(response.status_code, 200)
+        writes = [q['sql'] for q in queries.captured_queries
+                  if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+        return response, writes
+
+    def test_fresh_session_is_not_rewritten(self):
+        response, writes = self.session_writes()
+        self.assertEqual(writes, [])
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_session_is_renewed_near_expiry(self):
+        import time
+        from .sessions import REFRESHED_AT_KEY
+        session = self.client.session
+        session[REFRESHED_AT_KEY] = int(time.time()) - settings.SESSION_COOKIE_AGE + settings.SESSION_REFRESH_WITHIN - 1
+        session.save()
+        response, writes = self.session_writes()
+        self.assertTrue(writes)
+        self.assertEqual(response.cookies[settings.SESSION_COOKIE_NAME]['max-age'], settings.SESSION_COOKIE_AGE)
+        self.assertGreaterEqual(self.client.session[REFRESHED_AT_KEY], int(time.time()) - 1)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions(self):
+        # The session middleware picks its engine when first loaded, so start a new client
+        self.client = self.client_class()
+        self.client.login(username='ines', password='refugee123')
+        self.client.get(reverse('job_list'))
+        response, writes = self.session_writes()
+        self.assertEqual(response.context['user'].username, 'ines')
+        self.assertEqual(writes, [])
+
+
+class HealthCheckTests(TestCase):
+    def test_reports_database_status(self):
+        response = self.client.get(reverse('health_check'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['database'], 'ok')
+
+        from unittest import mock
+        from django.db import OperationalError
+        with mock.patch('refugees.views.connection.cursor', side_effect=OperationalError('down')):
+            response = self.client.get(reverse('health_check'))
+        self.assertEqual(response.status_code, 503)
+
+
+class SqliteTuningTests(TestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        from django.db import connection
+        from .sqlite import configure_connection
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            original = cursor.fetchone()[0]
+        self.addCleanup(connection.cursor().execute, f'PRAGMA cache_size = {original}')
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234, 'busy_timeout': 2500}):
+            configure_connection(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -1234)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 2500)
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        from . import routers
+        self.router = routers.ReplicaRouter()
+        # Writes made while setting up the test would otherwise pin this context to the primary
+        token = routers._wrote.set(False)
+        self.addCleanup(routers._wrote.reset, token)
+
+    def test_reads_go_to_the_replica_until_the_request_writes(self):
+        from .routers import read_alias, reading_from
+        self.assertIsNone(self.router.db_for_read(Housing))
+        with reading_from('replica1'):
+            self.assertEqual(self.router.db_for_read(Housing), 'replica1')
+            self.assertEqual(self.router.db_for_write(Housing), 'default')
+            self.assertIsNone(self.router.db_for_read(Housing))
+        # No replicas are configured here, so reads stay on the primary
+        self.assertIsNone(read_alias())
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .routers import PIN_COOKIE_NAME, PrimaryPinningMiddleware, reading_from
+        seen = []
+
+        def view(request):
+            with reading_from('replica1'):
+                seen.append(self.router.db_for_read(Housing))
+                if request.method == 'POST':
+                    self.router.db_for_write(Housing)
+            return HttpResponse()
+
+        middleware = PrimaryPinningMiddleware(view)
+        self.assertNotIn(PIN_COOKIE_NAME, middleware(RequestFactory().get('/')).cookies)
+        pin = middleware(RequestFactory().post('/')).cookies[PIN_COOKIE_NAME]
+        self.assertEqual(pin['max-age'], settings.READ_YOUR_WRITES_SECONDS)
+        request = RequestFactory().get('/')
+        request.COOKIES[PIN_COOKIE_NAME] = pin.value
+        middleware(request)
+        self.assertEqual(seen, ['replica1', 'replica1', None])
+
+    def test_only_writing_requests_set_the_pin(self):
+        from .routers import PIN_COOKIE_NAME
+        job = make_job(make_ngo(), 'Cook')
+        make_refugee('jon')
+        self.client.login(username='jon', password='refugee123')
+        response = self.client.get(reverse('job_detail', args=[job.pk]))
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+        response = self.client.post(reverse('apply_for_job', args=[job.pk]))
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.refugee = make_refugee('kim')
+        User.objects.filter(pk=self.refugee.user_id).update(email='kim@example.org')
+        self.housing = make_housing(self.ngo, 'Dock Shelter', capacity=4)
+        self.client.login(username='stats_ngo', password='ngo12345')
+
+    def run_worker(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('run_tasks', '--burst', stdout=StringIO())
+
+    def test_decision_emails_are_sent_by_the_worker(self):
+        from django.core import mail
+        from .models import Task
+        application = HousingApplication.objects.create(refugee=self.refugee, housing=self.housing)
+        url = reverse('update_housing_application_status', args=[application.pk, 'approved'])
+        self.client.get(url)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(Task.objects.get().status, 'queued')
+        self.run_worker()
+        self.assertEqual(Task.objects.get().status, 'done')
+        self.assertEqual(mail.outbox[0].to, ['kim@example.org'])
+        self.assertIn('approved', mail.outbox[0].body)
+
+    def test_refused_decisions_queue_nothing(self):
+        from .models import Task
+        application = HousingApplication.objects.create(refugee=self.refugee, housing=self.housing, status='rejected')
+        self.client.get(reverse('update_housing_application_status', args=[application.pk, 'rejected']))
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_back_off_then_give_up(self):
+        from unittest import mock
+        from .models import Task
+        from .tasks import TASKS, claim_task, enqueue, run_task, task
+
+        @task('test_flaky', max_attempts=2)
+        def flaky():
+            raise RuntimeError('mail server down')
+        self.addCleanup(TASKS.pop, 'test_flaky')
+
+        queued = enqueue('test_flaky')
+        self.assertFalse(run_task(claim_task('worker-a')))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('mail server down', queued.last_error)
+        self.assertGreater(queued.run_after, timezone.now())
+        self.assertIsNone(claim_task('worker-a'))
+
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('refugees.tasks.timezone.now', return_value=later):
+            self.assertFalse(run_task(claim_task('worker-b')))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+
+    def test_each_task_is_claimed_once_and_stale_claims_are_reclaimed(self):
+        from unittest import mock
+        from .tasks import claim_task, enqueue
+        queued = enqueue('notify_job_decision', application_id=0)
+        self.assertEqual(claim_task('worker-a').pk, queued.pk)
+        self.assertIsNone(claim_task('worker-b'))
+        # worker-a went away mid-task
+        later = timezone.now() + timedelta(hours=1)
+        with mock.patch('refugees.tasks.timezone.now', return_value=later):
+            reclaimed = claim_task('worker-b')
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (queued.pk, 'worker-b', 2))
+
+    def test_old_finished_tasks_are_pruned(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .models import Task
+        now = timezone.now()
+        Task.objects.create(name='notify_job_decision', status='done', finished_at=now - timedelta(days=8))
+        recent_done = Task.objects.create(name='notify_job_decision', status='done', finished_at=now - timedelta(days=1))
+        old_failed = Task.objects.create(name='notify_job_decision', status='failed', finished_at=now - timedelta(days=30))
+        out = StringIO()
+        call_command('run_tasks', '--burst', stdout=out)
+        self.assertIn('Deleted 1 tasks', out.getvalue())
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)), {recent_done.pk, old_failed.pk})
+        call_command('run_tasks', '--burst', '--keep-done-days', '0', stdout=StringIO())
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), [old_failed.pk])
+
+
+class JobExpiryTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.refugee = make_refugee('lena')
+        self.open = make_job(self.ngo, 'Open')
+        self.expired = make_job(self.ngo, 'Expired', deadline=timezone.now() - timedelta(hours=1))
+        self.closed = make_job(self.ngo, 'Closed', is_active=False)
+        self.on_expired = JobApplication.objects.create(refugee=self.refugee, job=self.expired)
+        self.on_closed = JobApplication.objects.create(refugee=self.refugee, job=self.closed)
+        self.on_open = JobApplication.objects.create(refugee=self.refugee, job=self.open)
+        self.shortlisted = JobApplication.objects.create(refugee=make_refugee('mona'), job=self.closed, status='shortlisted')
+
+    def test_sweep_closes_jobs_and_expires_pending_applications(self):
+        from .counters import compute_counters, read_counters
+        from .expiry import expire_jobs
+        self.assertEqual(expire_jobs(), (1, 2))
+        self.assertEqual(list(Job.objects.filter(is_active=True)), [self.open])
+        statuses = dict(JobApplication.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[self.on_expired.pk], 'expired')
+        self.assertEqual(statuses[self.on_closed.pk], 'expired')
+        self.assertEqual(statuses[self.on_open.pk], 'pending')
+        self.assertEqual(statuses[self.shortlisted.pk], 'shortlisted')
+        counters, expected = read_counters(), compute_counters()
+        for name in ('jobs_total', 'jobs_active', 'job_applications_total', 'job_applications_pending'):
+            self.assertEqual(counters[name], expected[name])
+        self.assertEqual(expire_jobs(), (0, 0))
+
+    def test_sweep_expires_cached_listings(self):
+        from .caching import scope_version
+        from .expiry import expire_jobs
+        before = scope_version('jobs', f'jobs:ngo:{self.ngo.pk}', 'job_applications')
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_jobs()
+        self.assertNotEqual(scope_version('jobs', f'jobs:ngo:{self.ngo.pk}', 'job_applications'), before)
+
+    def test_saving_a_job_schedules_one_sweep_for_its_deadline(self):
+        from .models import Task
+        with self.captureOnCommitCallbacks(execute=True):
+            job = make_job(self.ngo, 'Later', deadline=timezone.now() + timedelta(days=2))
+        sweep = Task.objects.get(name='expire_jobs')
+        self.assertAlmostEqual(sweep.run_after, job.deadline, delta=timedelta(seconds=5))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_job(self.ngo, 'Even later', deadline=timezone.now() + timedelta(days=3))
+        self.assertEqual(Task.objects.filter(name='expire_jobs').count(), 1)
+
+    def test_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        call_command('expire_jobs', stdout=out)
+        self.assertIn('Closed 1 expired jobs; expired 2 pending applications.', out.getvalue())
+        self.assertFalse(Job.objects.get(pk=self.expired.pk).is_active)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.ngo = make_ngo()
+        self.job = make_job(self.ngo, 'Welder')
+        for username in ('omar', 'olga', 'xomar'):
+            JobApplication.objects.create(refugee=make_refugee(username), job=self.job)
+        User.objects.create_superuser(username='root', password='root12345', user_type='admin')
+        self.client.login(username='root', password='root12345')
+
+    def test_changelist_skips_full_counts(self):
+        from django.test.utils import CaptureQueriesContext
+        from django.db import connection
+        url = reverse('admin:refugees_jobapplication_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+        # Rows come with their refugee, user and job in the same query
+        self.assertEqual(len([query for query in queries if 'refugees_jobapplication' in query['sql']]), 1)
+
+    def test_search_matches_prefixes_across_relations(self):
+        url = reverse('admin:refugees_jobapplication_changelist')
+        response = self.client.get(url, {'q': 'OM'})
+        self.assertEqual([row.refugee.user.username for row in response.context['cl'].result_list], ['omar'])
+        response = self.client.get(reverse('admin:refugees_refugee_changelist'), {'q': 'o'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_filtered_counts_stop_at_the_limit(self):
+        from unittest import mock
+        from .pagination import ApproximateCountPaginator
+        with mock.patch.object(ApproximateCountPaginator, 'count_limit', 2):
+            paginator = ApproximateCountPaginator(Refugee.objects.filter(status='pending').order_by('pk'), 1)
+            self.assertEqual(paginator.count, 2)
+            # Unfiltered tables take their size from the maintained counters
+            self.assertEqual(ApproximateCountPaginator(Refugee.objects.order_by('pk'), 1).count, 3)
+            # ...or, for models without one, an exact count rather than the capped one
+            self.assertEqual(ApproximateCountPaginator(User.objects.order_by('pk'), 1).count, User.objects.count())
+
+
+class TemporaryMediaMixin:
+    """Store uploads in a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class DocumentStorageTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_refugee('alice')
+        self.bob = make_refugee('bob')
+
+    def upload(self, refugee, content, name='passport.pdf'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        refugee.documents = SimpleUploadedFile(name, content)
+        refugee.save()
+        return refugee.documents.name
+
+    def blob(self, name):
+        from .models import StoredBlob
+        return StoredBlob.objects.get(name=name)
+
+    def test_equal_uploads_share_one_blob(self):
+        import hashlib
+        import os
+        first = self.upload(self.alice, b'scan of a passport')
+        second = self.upload(self.bob, b'scan of a passport', name='PASSPORT_copy.PDF')
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(hashlib.sha256(b'scan of a passport').hexdigest() + '.pdf'))
+        self.assertEqual(self.blob(first).references, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.alice.documents.path))), 1)
+        with Refugee.objects.get(pk=self.bob.pk).documents.open('rb') as stored:
+            self.assertEqual(stored.read(), b'scan of a passport')
+
+    def test_unreferenced_blobs_are_collected(self):
+        import os
+        from io import StringIO
+        from django.core.management import call_command
+        shared = self.upload(self.alice, b'curriculum vitae')
+        self.upload(self.bob, b'curriculum vitae')
+        path = self.alice.documents.path
+        self.upload(self.alice, b'a newer curriculum vitae')
+        self.bob.delete()
+        self.assertEqual(self.blob(shared).references, 0)
+        stray = os.path.join(os.path.dirname(os.path.dirname(path)), 'tmp', 'abandoned')
+        os.makedirs(os.path.dirname(stray), exist_ok=True)
+        open(stray, 'wb').close()
+
+        out = StringIO()
+        call_command('collect_blobs', '--grace', '0', stdout=out)
+        self.assertIn('Deleted 1 unreferenced blobs and 1 stray files', out.getvalue())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(Refugee.objects.get(pk=self.alice.pk).documents.path))
+
+    def test_recount_corrects_drift(self):
+        from .blobs import recount_references
+        from .models import StoredBlob
+        name = self.upload(self.alice, b'birth certificate')
+        StoredBlob.objects.filter(name=name).update(references=5)
+        self.assertEqual(recount_references(), 1)
+        self.assertEqual(self.blob(name).references, 1)
+
+
+class DocumentUploadTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.refugee = make_refugee('nadia', date_of_birth='1990-01-01')
+        self.client.login(username='nadia', password='refugee123')
+        self.url = reverse('refugee_update', args=[self.refugee.pk])
+
+    def post(self, upload):
+        from django.forms.models import model_to_dict
+        data = {key: value for key, value in model_to_dict(self.refugee).items()
+                if key not in ('id', 'user', 'documents') and value is not None}
+        return self.client.post(self.url, {**data, 'documents': upload})
+
+    def test_documents_stream_into_storage_without_a_second_copy(self):
+        import os
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import StoredBlob, Task
+        from .storage import ContentAddressedStorage
+        scan = SimpleUploadedFile('scan.pdf', b'%PDF-1.4 passport scan', content_type='application/pdf')
+        with mock.patch.object(ContentAddressedStorage, 'stream_to_temp', side_effect=AssertionError('copied')):
+            response = self.post(scan)
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.refugee.refresh_from_db()
+        with self.refugee.documents.open('rb') as stored:
+            self.assertEqual(stored.read(), b'%PDF-1.4 passport scan')
+        self.assertEqual(StoredBlob.objects.get().references, 1)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'blobs', 'tmp')), [])
+        self.assertEqual(Task.objects.get().payload, {'blob': self.refugee.documents.name})
+
+    def test_oversized_uploads_are_refused(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .models import StoredBlob
+        photo = SimpleUploadedFile('photo.jpg', b'x' * 2048, content_type='image/jpeg')
+        with mock.patch.dict('refugees.uploads.UPLOAD_QUOTAS', {'image': 1024}):
+            response = self.post(photo)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Image files can be at most', str(response.context['form'].errors['documents']))
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_processing_records_the_content_type(self):
+        from io import StringIO
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+        from .models import StoredBlob
+        self.post(SimpleUploadedFile('photo.png', b'\x89PNG\r\n\x1a\n' + b'\x00' * 32, content_type='image/png'))
+        call_command('run_tasks', '--burst', stdout=StringIO())
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.content_type, 'image/png')
+        self.assertIsNotNone(blob.processed_at)
+
+
+class AsyncViewTests(EmptyCacheMixin, TestCase):
+    """The async variants served under ASGI render what the sync views do"""
+
+    def setUp(self):
+        super().setUp()
+        self.ngo = make_ngo()
+        self.housing = make_housing(self.ngo, 'River Shelter')
+        self.job = make_job(self.ngo, 'Cook')
+        self.refugee = make_refugee('amir')
+        HousingApplication.objects.create(refugee=self.refugee, housing=self.housing)
+        JobApplication.objects.create(refugee=self.refugee, job=self.job)
+        User.objects.create_user(username='async_admin', password='admin12345', user_type='admin')
+
+    def use_async_views(self, enabled):
+        import importlib
+        from django.urls import clear_url_caches
+        from refugee_ms import urls as root_urls
+        from . import urls
+        with self.settings(ASYNC_VIEWS=enabled):
+            importlib.reload(urls)
+        importlib.reload(root_urls)
+        clear_url_caches()
+
+    def fetch(self, client, path, **headers):
+        from asgiref.sync import async_to_sync
+        if isinstance(client, Client):
+            return client.get(path, headers=headers)
+        return async_to_sync(client.get)(path, headers=headers)
+
+    def pages(self):
+        return [
+            reverse('dashboard'), reverse('refugee_list'), reverse('housing_list'), reverse('job_list'),
+            reverse('job_list') + '?q=cook', reverse('housing_application_list'), reverse('job_application_list'),
+            reverse('refugee_detail', args=[self.refugee.pk]), reverse('housing_detail', args=[self.housing.pk]),
+            reverse('job_detail', args=[self.job.pk]),
+        ]
+
+    def render_all(self, client, paths):
+        import re
+        responses = {path: self.fetch(client, path) for path in paths}
+        # CSRF tokens are masked afresh on every render
+        return {path: (response.status_code, response.get('ETag'),
+                       re.sub(r'csrfmiddlewaretoken" value="[^"]*', '', response.content.decode()))
+                for path, response in responses.items()}
+
+    def test_pages_match_the_sync_views(self):
+        from django.test import AsyncClient
+        from django.urls import resolve
+        from . import async_views
+        for username, password in (('stats_ngo', 'ngo12345'), ('async_admin', 'admin12345'), ('amir', 'refugee123')):
+            with self.subTest(user=username):
+                user = User.objects.get(username=username)
+                client, async_client = Client(), AsyncClient()
+                client.force_login(user)
+                async_client.force_login(user)
+                paths = self.pages()
+                expected = self.render_all(client, paths)
+                self.use_async_views(True)
+                try:
+                    self.assertIs(resolve(reverse('dashboard')).func, async_views.dashboard)
+                    # Once with the fragments cached by the sync views, once rendering them afresh
+                    self.assertEqual(self.render_all(async_client, paths), expected)
+                    cache.clear()
+                    # Clearing the cache restarts the scope versions that list ETags are built from
+                    self.assertEqual({path: (status, body) for path, (status, _, body)
+                                      in self.render_all(async_client, paths).items()},
+                                     {path: (status, body) for path, (status, _, body) in expected.items()})
+                finally:
+                    self.use_async_views(False)
+
+    def test_permissions_and_revalidation(self):
+        from django.test import AsyncClient
+        self.use_async_views(True)
+        self.addCleanup(self.use_async_views, False)
+        client = AsyncClient()
+        detail = reverse('refugee_detail', args=[self.refugee.pk])
+        self.assertRedirects(self.fetch(client, detail), f"{reverse('login')}?next={detail}",
+                             fetch_redirect_response=False)
+        client.force_login(User.objects.get(username='amir'))
+        first = self.fetch(client, detail)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.fetch(client, detail, if_none_match=first['ETag']).status_code, 304)
+        self.assertRedirects(self.fetch(client, reverse('refugee_list')), reverse('dashboard'),
+                             fetch_redirect_response=False)
+        self.assertEqual(self.fetch(client, reverse('job_detail', args=[self.job.pk + 100])).status_code, 404)
+        client.force_login(make_refugee('bea').user)
+        self.assertEqual(self.fetch(client, detail).status_code, 403)
+
+    def test_middleware_runs_async(self):
+        from asgiref.sync import async_to_sync, iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .routers import PIN_COOKIE_NAME, PrimaryPinningMiddleware, ReplicaRouter
+
+        async def view(request):
+            if request.method == 'POST':
+                ReplicaRouter().db_for_write(Housing)
+            return HttpResponse()
+
+        middleware = PrimaryPinningMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertNotIn(PIN_COOKIE_NAME, async_to_sync(middleware)(RequestFactory().get('/')).cookies)
+        self.assertIn(PIN_COOKIE_NAME, async_to_sync(middleware)(RequestFactory().post('/')).cookies)
+
+
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        from .instrumentation import RECORDS
+        self.records = RECORDS
+        self.records.clear()
+        self.addCleanup(self.records.clear)
+        self.ngo = make_ngo()
+        make_job(self.ngo, 'Cook')
+        make_job(self.ngo, 'Driver')
+        self.client.login(username='stats_ngo', password='ngo12345')
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_sampled_requests_record_their_cost(self):
+        from asgiref.sync import async_to_sync
+        from django.db import connection
+        from django.test import AsyncClient
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('job_list'))
+        data = self.records[-1]
+        self.assertEqual((data['view'], data['method'], data['status']), ('job_list', 'GET', 200))
+        self.assertEqual(data['queries'], len(queries))
+        self.assertEqual(data['bytes'], len(response.content))
+        self.assertGreater(data['template_ms'], 0)
+        self.assertGreaterEqual(data['ms'], data['sql_ms'])
+
+        # Under ASGI the view's queries run in other threads but still count
+        client = AsyncClient()
+        client.force_login(self.ngo.user)
+        async_to_sync(client.get)(reverse('housing_list'))
+        self.assertEqual(self.records[-1]['view'], 'housing_list')
+        self.assertGreater(self.records[-1]['queries'], 0)
+
+        with self.settings(PERF_SAMPLE_RATE=0.0):
+            self.client.get(reverse('job_list'))
+        self.assertEqual(len(self.records), 2)
+
+    def test_repeated_queries_are_fingerprinted(self):
+        from .instrumentation import fingerprint, recording
+        self.assertEqual(fingerprint('SELECT a FROM t WHERE b IN (%s, %s, %s) LIMIT 21'),
+                         'SELECT a FROM t WHERE b IN (...) LIMIT ?')
+        with recording() as record:
+            for job in Job.objects.all():
+                job.ngo
+        data = record.as_dict('job_list', 'GET', 200, 0)
+        self.assertEqual(data['queries'], 3)
+        self.assertEqual(data['duplicate_queries'], 1)
+        self.assertEqual(data['duplicates'][0][1], 2)
+        self.assertIn('refugees_ngo', data['duplicates'][0][0])
+
+    def test_perfreport(self):
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        log = os.path.join(directory.name, 'perf.jsonl')
+        with self.settings(PERF_SAMPLE_RATE=1.0, PERF_LOG_FILE=log, PERF_FLUSH_EVERY=1):
+            for _ in range(3):
+                self.client.get(reverse('job_list'))
+            self.client.get(reverse('dashboard'))
+            self.client.get('/no-such-page/')
+            out = StringIO()
+            call_command('perfreport', stdout=out)
+        report = out.getvalue()
+        self.assertIn('4 requests over 2 views', report)
+        job_list = next(line for line in report.splitlines() if line.startswith('job_list '))
+        self.assertEqual(job_list.split()[1], '3')
+        self.assertIn('No requests recorded for:', report)
+        self.assertNotIn('(unresolved)', report)
+        out = StringIO()
+        call_command('perfreport', '--file', log, '--all', stdout=out)
+        self.assertIn('(unresolved)', out.getvalue())
+
+        # A line cut short by a crashed worker is skipped and counted
+        with open(log, 'a') as handle:
+            handle.write('{"at": 1, "view": "job_li')
+        out = StringIO()
+        call_command('perfreport', '--file', log, stdout=out)
+        self.assertIn('Skipped 1 malformed lines', out.getvalue())
+        self.assertIn('4 requests over 2 views', out.getvalue())
+
+    @override_settings(PERF_SAMPLE_RATE=1.0)
+    def test_staff_see_this_process_records(self):
+        self.client.get(reverse('job_list'))
+        self.assertEqual(self.client.get(reverse('perf_summary')).status_code, 403)
+        User.objects.create_user(username='perf_staff', password='staff12345', user_type='admin', is_staff=True)
+        self.client.login(username='perf_staff', password='staff12345')
+        summary = self.client.get(reverse('perf_summary')).json()
+        self.assertEqual(summary['views']['job_list']['requests'], 1)
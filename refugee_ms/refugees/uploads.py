@@ -0,0 +1,108 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from .models import document_storage
+
+# Form fields holding refugee documents; other uploads are left to Django's handlers
+DOCUMENT_FIELDS = ('documents', 'resume')
+
+# Largest accepted document, in bytes, per kind
+UPLOAD_QUOTAS = {
+    'image': 10 * 1024 * 1024,
+    'pdf': 25 * 1024 * 1024,
+    'other': 5 * 1024 * 1024,
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff', '.bmp')
+
+
+def document_kind(name, content_type):
+    """Which UPLOAD_QUOTAS entry applies to an upload, going by its declared type and extension"""
+    extension = os.path.splitext(name or '')[1].lower()
+    if content_type == 'application/pdf' or extension == '.pdf':
+        return 'pdf'
+    if (content_type or '').startswith('image/') or extension in IMAGE_EXTENSIONS:
+        return 'image'
+    return 'other'
+
+
+def check_upload(upload):
+    """Raise ValidationError if a newly uploaded document is over its quota; returns it otherwise"""
+    if isinstance(upload, UploadedFile):
+        kind = document_kind(upload.name, upload.content_type)
+        quota = UPLOAD_QUOTAS[kind]
+        if upload.size > quota:
+            label = 'PDF' if kind == 'pdf' else {'image': 'Image', 'other': 'Document'}[kind]
+            raise ValidationError(
+                f'{label} files can be at most {quota / 2 ** 20:.0f} MB; this one is {upload.size / 2 ** 20:.1f} MB.'
+            )
+    return upload
+
+
+class StreamedUpload(UploadedFile):
+    """A document written by DocumentUploadHandler straight into the document storage's temp directory"""
+
+    def __init__(self, name, content_type, charset, content_type_extra, directory):
+        file = tempfile.NamedTemporaryFile(suffix='.upload', dir=directory)
+        super().__init__(file, name, content_type, 0, charset, content_type_extra)
+        self.digest = hashlib.sha256()
+        self.sha256 = None
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # The storage moved it into place
+            pass
+
+
+class DocumentUploadHandler(FileUploadHandler):
+    """Stream document uploads to the document storage, hashing them and enforcing UPLOAD_QUOTAS.
+
+    The body is written once, into a temp file the storage renames into place, instead
+    of being spooled to FILE_UPLOAD_TEMP_DIR and copied again on save. Once an upload
+    passes its quota the rest of it is read but not written, and check_upload() turns it
+    into a form error. Fields outside DOCUMENT_FIELDS go to the next handler.
+    """
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.upload = None
+        if field_name not in DOCUMENT_FIELDS:
+            return
+        self.quota = UPLOAD_QUOTAS[document_kind(file_name, content_type)]
+        self.upload = StreamedUpload(file_name, content_type, charset, content_type_extra,
+                                     document_storage().temp_dir())
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.upload is None:
+            return raw_data
+        if start + len(raw_data) <= self.quota:
+            self.upload.digest.update(raw_data)
+            self.upload.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.upload is None:
+            return None
+        upload = self.upload
+        upload.size = file_size
+        if file_size <= self.quota:
+            upload.sha256 = upload.digest.hexdigest()
+        upload.file.flush()
+        upload.file.seek(0)
+        self.upload = None
+        return upload
+
+    def upload_interrupted(self):
+        if getattr(self, 'upload', None) is not None:
+            self.upload.close()
@@ -1,15 +1,30 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import include, path, re_path
+from rest_framework.routers import DefaultRouter
+from . import api, async_views, views
+
+# Under ASGI the read-only pages are served by their async variants
+read_views = async_views if settings.ASYNC_VIEWS else views
+
+api_router = DefaultRouter()
+api_router.register('refugees', api.RefugeeViewSet, basename='api-refugee')
+api_router.register('ngos', api.NGOViewSet, basename='api-ngo')
+api_router.register('housing', api.HousingViewSet, basename='api-housing')
+api_router.register('jobs', api.JobViewSet, basename='api-job')
+api_router.register('housing-applications', api.HousingApplicationViewSet, basename='api-housing-application')
+api_router.register('job-applications', api.JobApplicationViewSet, basename='api-job-application')
 
 urlpatterns = [
     # Landing page as home
     path('', views.landing_page, name='home'),
+    path('healthz/', views.health_check, name='health_check'),
+    path('perf/', views.perf_summary, name='perf_summary'),
     
     # Authentication URLs
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register, name='register'),
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/', read_views.dashboard, name='dashboard'),
     
     # Profile URLs
     path('refugees/create/', views.create_refugee_profile, name='create_refugee_profile'),
@@ -17,30 +32,38 @@ urlpatterns = [
     path('ngo/<int:pk>/update/', views.NGOUpdateView.as_view(), name='ngo_update'),
     
     # Refugee URLs
-    path('refugees/', views.RefugeeListView.as_view(), name='refugee_list'),
-    path('refugees/<int:pk>/', views.RefugeeDetailView.as_view(), name='refugee_detail'),
+    path('refugees/', read_views.RefugeeListView.as_view(), name='refugee_list'),
+    path('refugees/<int:pk>/', read_views.RefugeeDetailView.as_view(), name='refugee_detail'),
     path('refugees/<int:pk>/update/', views.RefugeeUpdateView.as_view(), name='refugee_update'),
     path('refugees/<int:pk>/delete/', views.RefugeeDeleteView.as_view(), name='refugee_delete'),
     
     # Housing URLs
-    path('housing/', views.HousingListView.as_view(), name='housing_list'),
+    path('housing/', read_views.HousingListView.as_view(), name='housing_list'),
     path('housing/create/', views.HousingCreateView.as_view(), name='housing_create'),
-    path('housing/<int:pk>/', views.HousingDetailView.as_view(), name='housing_detail'),
+    path('housing/<int:pk>/', read_views.HousingDetailView.as_view(), name='housing_detail'),
     path('housing/<int:pk>/update/', views.HousingUpdateView.as_view(), name='housing_update'),
     path('housing/<int:pk>/delete/', views.HousingDeleteView.as_view(), name='housing_delete'),
     path('housing/<int:pk>/apply/', views.apply_for_housing, name='apply_for_housing'),
     
     # Job URLs
-    path('jobs/', views.JobListView.as_view(), name='job_list'),
+    path('jobs/', read_views.JobListView.as_view(), name='job_list'),
     path('jobs/create/', views.JobCreateView.as_view(), name='job_create'),
-    path('jobs/<int:pk>/', views.JobDetailView.as_view(), name='job_detail'),
+    path('jobs/recommended/', views.recommended_jobs, name='recommended_jobs'),
+    path('jobs/<int:pk>/', read_views.JobDetailView.as_view(), name='job_detail'),
     path('jobs/<int:pk>/update/', views.JobUpdateView.as_view(), name='job_update'),
     path('jobs/<int:pk>/delete/', views.JobDeleteView.as_view(), name='job_delete'),
     path('jobs/<int:pk>/apply/', views.apply_for_job, name='apply_for_job'),
     
     # Application URLs
-    path('applications/housing/', views.HousingApplicationListView.as_view(), name='housing_application_list'),
-    path('applications/jobs/', views.JobApplicationListView.as_view(), name='job_application_list'),
+    path('applications/housing/', read_views.HousingApplicationListView.as_view(), name='housing_application_list'),
+    path('applications/housing/allocate/', views.housing_allocation, name='housing_allocation'),
+    path('applications/jobs/', read_views.JobApplicationListView.as_view(), name='job_application_list'),
     path('applications/housing/<int:pk>/<str:status>/', views.update_housing_application_status, name='update_housing_application_status'),
     path('applications/jobs/<int:pk>/<str:status>/', views.update_job_application_status, name='update_job_application_status'),
+    
+    # Data exports
+    path('export/<slug:dataset>.<slug:file_format>', views.export_data, name='export_data'),
+    
+    # Versioned REST API
+    re_path(r'^api/(?P<version>v1)/', include(api_router.urls)),
 ]
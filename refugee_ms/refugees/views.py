@@ -1,22 +1,71 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
+from django.core.exceptions import PermissionDenied
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Count, Q
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Q, Prefetch
 from django.utils import timezone
 from datetime import timedelta
 import json
 
 from .models import Refugee, Housing, Job, JobApplication, CustomUser, HousingApplication, NGO
 from .forms import RefugeeForm, HousingForm, JobForm, JobApplicationForm, CustomUserCreationForm, HousingApplicationForm, NGOProfileForm
+from .stats import get_dashboard_stats
+from .pagination import KeysetPaginationMixin
+from .search import SearchMixin
+from .conditional import ConditionalGetMixin
+from .routers import ReadReplicaMixin, read_from_replica
+from .caching import FRAGMENT_CACHE_TIMEOUT, FragmentCacheMixin, cached_value, scope_version
+from .export import EXPORTS, EXPORT_FORMATS, ExportError, export_rows, filter_export, stream_export
+from .matching import recommend_jobs
+from .tasks import enqueue
+from .instrumentation import RECORDS, summarize
+from .allocation import (
+    propose_allocation, apply_allocation, approve_housing_application, reject_housing_application, ApprovalError
+)
+
+# Relation-loading plans: the related rows each template touches, fetched in the same query
+REFUGEE_RELATIONS = ('user',)
+HOUSING_RELATIONS = ('ngo',)
+JOB_RELATIONS = ('ngo',)
+HOUSING_APPLICATION_RELATIONS = ('refugee__user', 'housing__ngo')
+JOB_APPLICATION_RELATIONS = ('refugee__user', 'job__ngo')
+
+# Data the shared dashboard figures are computed from
+DASHBOARD_STATS_SCOPES = ['refugees', 'housing', 'jobs', 'housing_applications', 'job_applications']
+RECENT_ACTIVITY_SCOPES = ['housing_applications', 'job_applications', 'housing', 'jobs']
 
 def landing_page(request):
     """Landing page view that shows different content based on authentication status"""
     return render(request, 'refugees/landing.html')
 
+def health_check(request):
+    """Report whether the database answers, for load balancers and connection poolers"""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError:
+        return JsonResponse({'database': 'unavailable'}, status=503)
+    return JsonResponse({'database': 'ok', 'vendor': connection.vendor})
+
+@login_required
+def perf_summary(request):
+    """Staff-only per-view costs of the requests this process recorded most recently.
+
+    Reads QueryInstrumentationMiddleware's in-memory buffer, so it works without
+    PERF_LOG_FILE; each worker process answers with its own records.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    records = list(RECORDS)
+    return JsonResponse({'requests': len(records), 'views': summarize(records)})
+
 def login_view(request):
     """Custom login view to handle user authentication"""
     if request.method == 'POST':
@@ -50,115 +99,139 @@ def register(request):
     return render(request, 'refugees/register.html', {'form': form})
 
 @login_required
+@read_from_replica
 def dashboard(request):
     if not request.user.is_authenticated:
         return redirect('login')
     
+    context = dashboard_profile_context(request.user)
+    
+    # Common statistics for all users, cached until the figures behind them change
+    stats = cached_value('dashboard_stats', DASHBOARD_STATS_SCOPES, get_dashboard_stats)
+    context.update(dashboard_stats_context(stats))
+    context['recent_activities'] = cached_value('recent_activities', RECENT_ACTIVITY_SCOPES, recent_activities)
+    
+    # Shared lists below are lazy querysets rendered inside {% cache %} fragments, so a
+    # cache hit skips their queries; dashboard_vary keys them per user type (and per NGO)
+    context['fragment_timeout'] = FRAGMENT_CACHE_TIMEOUT
+    try:
+        lists = dashboard_lists(request.user)
+    except AttributeError:
+        # A refugee or NGO user without a profile yet
+        lists = None
+    if lists is not None:
+        context.update({name: queryset for name, (queryset, fragment) in lists.items()})
+        audience, scopes = dashboard_vary_scopes(request.user)
+        context['dashboard_vary'] = f'{audience}|{scope_version(*scopes)}'
+        if request.user.user_type == 'refugee':
+            context['refugee'] = request.user.refugee
+            # Best matches for the refugee's skills, topped up with the newest openings
+            context['available_jobs'] = recommended_or_recent_jobs(request.user.refugee, 5)
+        elif request.user.user_type == 'ngo':
+            context['ngo'] = request.user.ngo
+        else:
+            context['total_ngos'] = cached_value('total_ngos', ['ngos'], NGO.objects.count)
+    
+    return render(request, 'refugees/dashboard.html', context)
+
+def dashboard_profile_context(user):
     # Check if user has a profile (only for refugee and ngo users)
     has_profile = True  # Default to True for admin users
-    if request.user.user_type == 'refugee':
-        has_profile = hasattr(request.user, 'refugee')
-    elif request.user.user_type == 'ngo':
-        has_profile = hasattr(request.user, 'ngo')
-    
-    context = {
-        'user_type': request.user.user_type,
+    if user.user_type == 'refugee':
+        has_profile = hasattr(user, 'refugee')
+    elif user.user_type == 'ngo':
+        has_profile = hasattr(user, 'ngo')
+    return {
+        'user_type': user.user_type,
         'has_profile': has_profile
     }
-    
-    # Common statistics for all users
-    context.update({
-        'total_refugees': Refugee.objects.count(),
-        'total_housing': Housing.objects.count(),
-        'total_jobs': Job.objects.count(),
-        'available_housing_count': Housing.objects.filter(status='available').count(),
-        'active_jobs': Job.objects.filter(is_active=True, deadline__gt=timezone.now()).count(),
-        'pending_applications': HousingApplication.objects.filter(status='pending').count() + 
-                             JobApplication.objects.filter(status='pending').count(),
-    })
-    
-    # Demographics data for charts
-    demographics = {
-        'labels': ['Male', 'Female', 'Other'],
-        'data': [
-            Refugee.objects.filter(gender='M').count(),
-            Refugee.objects.filter(gender='F').count(),
-            Refugee.objects.filter(gender='O').count(),
+
+def dashboard_lists(user):
+    """The dashboard's lists for user as {template variable: (lazy queryset, the {% cache %} fragment showing it)}.
+
+    The fragment is None for lists rendered outside any. Returns None for users without
+    a dashboard list, and raises AttributeError while a refugee or NGO has no profile.
+    """
+    if user.user_type == 'refugee':
+        refugee = user.refugee
+        return {
+            'housing_applications': (HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS).filter(refugee=refugee).order_by('-application_date')[:5], None),
+            'job_applications': (JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS).filter(refugee=refugee).order_by('-applied_at')[:5], None),
+            'available_housing': (Housing.objects.select_related(*HOUSING_RELATIONS).filter(status='available').order_by('-created_at')[:5], 'dashboard_available_housing'),
+        }
+    if user.user_type == 'ngo':
+        ngo = user.ngo
+        return {
+            'housing_listings': (Housing.objects.filter(ngo=ngo).order_by('-created_at')[:5], 'dashboard_housing_listings'),
+            'job_listings': (Job.objects.filter(ngo=ngo).order_by('-posted_at')[:5], 'dashboard_job_listings'),
+            'housing_applications': (HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS).filter(housing__ngo=ngo).order_by('-application_date')[:5], 'dashboard_housing_applications'),
+            'job_applications': (JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS).filter(job__ngo=ngo).order_by('-applied_at')[:5], 'dashboard_job_applications'),
+        }
+    if user.user_type == 'admin':
+        return {
+            'recent_applications': (HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS).order_by('-application_date')[:5], 'dashboard_recent_applications'),
+            'recent_job_applications': (JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS).order_by('-applied_at')[:5], 'dashboard_recent_job_applications'),
+        }
+    return None
+
+def dashboard_vary_scopes(user):
+    """The audience and scopes the dashboard's cached fragments are keyed on"""
+    if user.user_type == 'refugee':
+        return 'refugee', ['housing']
+    if user.user_type == 'ngo':
+        ngo_id = user.ngo.pk
+        return f'ngo:{ngo_id}', [
+            f'housing:ngo:{ngo_id}', f'jobs:ngo:{ngo_id}',
+            f'housing_applications:ngo:{ngo_id}', f'job_applications:ngo:{ngo_id}',
         ]
+    return 'admin', ['housing_applications', 'job_applications']
+
+def dashboard_stats_context(stats):
+    """Template variables for the dashboard's shared figures and charts"""
+    return {
+        'total_refugees': stats['total_refugees'],
+        'total_housing': stats['total_housing'],
+        'total_jobs': stats['total_jobs'],
+        'available_housing_count': stats['available_housing_count'],
+        'active_jobs': stats['active_jobs'],
+        'pending_applications': stats['pending_applications'],
+        # Demographics data for charts
+        'demographics_labels': json.dumps(stats['demographics']['labels']),
+        'demographics_data': json.dumps(stats['demographics']['data']),
+        # Housing data for charts
+        'housing_labels': json.dumps(stats['housing_chart']['labels']),
+        'housing_occupied_data': json.dumps(stats['housing_chart']['occupied']),
+        'housing_available_data': json.dumps(stats['housing_chart']['available']),
     }
-    context['demographics_labels'] = json.dumps(demographics['labels'])
-    context['demographics_data'] = json.dumps(demographics['data'])
-    
-    # Housing data for charts
-    housing_types = Housing.HOUSING_TYPE_CHOICES
-    housing_labels = [type[1] for type in housing_types]
-    housing_occupied = []
-    housing_available = []
-    
-    for type_code, _ in housing_types:
-        type_housing = Housing.objects.filter(housing_type=type_code)
-        housing_occupied.append(type_housing.filter(status='occupied').count())
-        housing_available.append(type_housing.filter(status='available').count())
-    
-    context['housing_labels'] = json.dumps(housing_labels)
-    context['housing_occupied_data'] = json.dumps(housing_occupied)
-    context['housing_available_data'] = json.dumps(housing_available)
-    
-    # Recent activities
-    recent_activities = []
-    
-    # Add recent housing applications
-    for app in HousingApplication.objects.order_by('-application_date')[:5]:
-        recent_activities.append({
+
+def recent_activities():
+    """The five newest housing and job applications as dashboard activity entries"""
+    activities = []
+    for app in HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS).order_by('-application_date')[:5]:
+        activities.append({
             'title': f'Housing Application: {app.housing.name}',
             'description': f'Application from {app.refugee.user.get_full_name()}',
             'timestamp': app.application_date
         })
-    
-    # Add recent job applications
-    for app in JobApplication.objects.order_by('-applied_at')[:5]:
-        recent_activities.append({
+    for app in JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS).order_by('-applied_at')[:5]:
+        activities.append({
             'title': f'Job Application: {app.job.title}',
             'description': f'Application from {app.refugee.user.get_full_name()}',
             'timestamp': app.applied_at
         })
-    
-    # Sort activities by timestamp and take the 5 most recent
-    recent_activities.sort(key=lambda x: x['timestamp'], reverse=True)
-    context['recent_activities'] = recent_activities[:5]
-    
-    if request.user.user_type == 'refugee':
-        try:
-            refugee = request.user.refugee
-            context.update({
-                'refugee': refugee,
-                'housing_applications': HousingApplication.objects.filter(refugee=refugee).order_by('-application_date')[:5],
-                'job_applications': JobApplication.objects.filter(refugee=refugee).order_by('-applied_at')[:5],
-                'available_housing': Housing.objects.filter(status='available').order_by('-created_at')[:5],
-                'available_jobs': Job.objects.filter(is_active=True, deadline__gt=timezone.now()).order_by('-posted_at')[:5]
-            })
-        except AttributeError:
-            pass
-    elif request.user.user_type == 'ngo':
-        try:
-            ngo = request.user.ngo
-            context.update({
-                'ngo': ngo,
-                'housing_listings': Housing.objects.filter(ngo=ngo).order_by('-created_at')[:5],
-                'job_listings': Job.objects.filter(ngo=ngo).order_by('-posted_at')[:5],
-                'housing_applications': HousingApplication.objects.filter(housing__ngo=ngo).order_by('-application_date')[:5],
-                'job_applications': JobApplication.objects.filter(job__ngo=ngo).order_by('-applied_at')[:5]
-            })
-        except AttributeError:
-            pass
-    elif request.user.user_type == 'admin':
-        context.update({
-            'total_ngos': NGO.objects.count(),
-            'recent_applications': HousingApplication.objects.order_by('-application_date')[:5],
-            'recent_job_applications': JobApplication.objects.order_by('-applied_at')[:5]
-        })
-    
-    return render(request, 'refugees/dashboard.html', context)
+    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    return activities[:5]
+
+def recommended_or_recent_jobs(refugee, count):
+    jobs = recommend_jobs(refugee, k=count)
+    if len(jobs) < count:
+        jobs += list(
+            Job.objects.select_related(*JOB_RELATIONS)
+            .filter(is_active=True)
+            .exclude(pk__in=[job.pk for job in jobs])
+            .order_by('-posted_at')[:count - len(jobs)]
+        )
+    return jobs
 
 # Refugee Views
 @login_required
@@ -207,10 +280,14 @@ def create_refugee_profile(request):
     
     return render(request, 'refugees/create_refugee_profile.html', {'form': form})
 
-class RefugeeListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+class RefugeeListView(ReadReplicaMixin, LoginRequiredMixin, UserPassesTestMixin, KeysetPaginationMixin, ConditionalGetMixin, ListView):
     model = Refugee
     template_name = 'refugees/refugee_list.html'
     context_object_name = 'refugees'
+    keyset_field = 'registered_at'
+    
+    def get_freshness_scopes(self):
+        return ['refugees']
     
     def test_func(self):
         return self.request.user.user_type in ['admin', 'ngo']  # Only allow admin and NGO users
@@ -221,16 +298,23 @@ class RefugeeListView(LoginRequiredMixin, UserPassesTestMixin, ListView):
     
     def get_queryset(self):
         # For refugees, only show their own profile
+        queryset = Refugee.objects.select_related(*REFUGEE_RELATIONS)
         if self.request.user.user_type == 'refugee':
-            return Refugee.objects.filter(user=self.request.user)
+            return queryset.filter(user=self.request.user)
         else:
             # For NGOs and admins, show all refugees
-            return Refugee.objects.all()
+            return queryset.all()
 
-class RefugeeDetailView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class RefugeeDetailView(ReadReplicaMixin, LoginRequiredMixin, UserPassesTestMixin, ConditionalGetMixin, DetailView):
     model = Refugee
+    queryset = Refugee.objects.select_related(*REFUGEE_RELATIONS).prefetch_related(
+        Prefetch('jobapplication_set', queryset=JobApplication.objects.select_related('job'))
+    )
     template_name = 'refugees/refugee_detail.html'
     
+    def get_freshness_sources(self):
+        return [Refugee.objects.filter(pk=self.kwargs['pk']), JobApplication.objects.filter(refugee_id=self.kwargs['pk'])]
+    
     def test_func(self):
         return self.request.user.user_type in ['admin', 'ngo'] or self.get_object().user == self.request.user
 
@@ -250,31 +334,48 @@ class RefugeeDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 # Housing Views
-class HousingListView(LoginRequiredMixin, ListView):
+class HousingListView(ReadReplicaMixin, LoginRequiredMixin, SearchMixin, ConditionalGetMixin, FragmentCacheMixin, KeysetPaginationMixin, ListView):
     model = Housing
     template_name = 'refugees/housing_list.html'
     context_object_name = 'housings'
+    keyset_field = 'created_at'
+    fragment_name = 'housing_listing'
+    
+    def get_freshness_scopes(self):
+        return self.get_fragment_scopes()
+    
+    def get_fragment_scopes(self):
+        if self.request.user.user_type == 'ngo':
+            return [f'housing:ngo:{self.request.user.ngo.pk}', 'ngos']
+        return ['housing', 'ngos']
     
     def get_queryset(self):
+        queryset = Housing.objects.select_related(*HOUSING_RELATIONS)
         if self.request.user.user_type == 'refugee':
             # Show only available housing for refugees
-            return Housing.objects.filter(status='available')
+            queryset = queryset.filter(status='available')
         elif self.request.user.user_type == 'ngo':
             # Show NGO's own listings
-            return Housing.objects.filter(ngo=self.request.user.ngo)
+            queryset = queryset.filter(ngo=self.request.user.ngo)
         elif self.request.user.user_type == 'admin':
             # Show all housing for admin
-            return Housing.objects.all()
-        return Housing.objects.none()
+            queryset = queryset.all()
+        else:
+            queryset = Housing.objects.none()
+        return self.apply_search(queryset)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user_type'] = self.request.user.user_type
         return context
 
-class HousingDetailView(DetailView):
+class HousingDetailView(ReadReplicaMixin, ConditionalGetMixin, DetailView):
     model = Housing
+    queryset = Housing.objects.select_related(*HOUSING_RELATIONS)
     template_name = 'refugees/housing_detail.html'
+    
+    def get_freshness_sources(self):
+        return [Housing.objects.filter(pk=self.kwargs['pk'])]
 
 class HousingCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Housing
@@ -307,31 +408,50 @@ class HousingDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return self.request.user.user_type in ['admin', 'ngo']
 
 # Job Views
-class JobListView(LoginRequiredMixin, ListView):
+class JobListView(ReadReplicaMixin, LoginRequiredMixin, SearchMixin, ConditionalGetMixin, FragmentCacheMixin, KeysetPaginationMixin, ListView):
     model = Job
     template_name = 'refugees/job_list.html'
     context_object_name = 'jobs'
+    keyset_field = 'posted_at'
+    fragment_name = 'job_listing'
+    
+    def get_freshness_scopes(self):
+        return self.get_fragment_scopes()
+    
+    def get_fragment_scopes(self):
+        if self.request.user.user_type == 'ngo':
+            return [f'jobs:ngo:{self.request.user.ngo.pk}', 'ngos']
+        return ['jobs', 'ngos']
     
     def get_queryset(self):
+        queryset = Job.objects.select_related(*JOB_RELATIONS)
         if self.request.user.user_type == 'refugee':
             # Show only active jobs for refugees
-            return Job.objects.filter(is_active=True, deadline__gt=timezone.now())
+            queryset = queryset.filter(is_active=True)
         elif self.request.user.user_type == 'ngo':
             # Show NGO's own listings
-            return Job.objects.filter(ngo=self.request.user.ngo)
+            queryset = queryset.filter(ngo=self.request.user.ngo)
         elif self.request.user.user_type == 'admin':
             # Show all jobs for admin
-            return Job.objects.all()
-        return Job.objects.none()
+            queryset = queryset.all()
+        else:
+            queryset = Job.objects.none()
+        return self.apply_search(queryset)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['user_type'] = self.request.user.user_type
         return context
 
-class JobDetailView(DetailView):
+class JobDetailView(ReadReplicaMixin, ConditionalGetMixin, DetailView):
     model = Job
+    queryset = Job.objects.select_related(*JOB_RELATIONS).prefetch_related(
+        Prefetch('jobapplication_set', queryset=JobApplication.objects.select_related('refugee__user'))
+    )
     template_name = 'refugees/job_detail.html'
+    
+    def get_freshness_sources(self):
+        return [Job.objects.filter(pk=self.kwargs['pk']), JobApplication.objects.filter(job_id=self.kwargs['pk'])]
 
 class JobCreateView(LoginRequiredMixin, CreateView):
     model = Job
@@ -366,6 +486,23 @@ class JobDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     def test_func(self):
         return self.request.user.user_type in ['admin', 'ngo']
 
+@login_required
+def recommended_jobs(request):
+    if request.user.user_type != 'refugee':
+        messages.error(request, 'Only refugees can view job recommendations.')
+        return redirect('job_list')
+    
+    try:
+        refugee = request.user.refugee
+    except Refugee.DoesNotExist:
+        messages.error(request, 'Please complete your refugee profile first.')
+        return redirect('create_refugee_profile')
+    
+    return render(request, 'refugees/recommended_jobs.html', {
+        'refugee': refugee,
+        'jobs': recommend_jobs(refugee, k=20),
+    })
+
 # Job Application Views
 @login_required
 def apply_for_job(request, pk):
@@ -391,18 +528,27 @@ def apply_for_job(request, pk):
     messages.success(request, f'Successfully applied for {job.title}!')
     return redirect('job_detail', pk=pk)
 
-class JobApplicationListView(LoginRequiredMixin, ListView):
+class JobApplicationListView(ReadReplicaMixin, LoginRequiredMixin, KeysetPaginationMixin, ConditionalGetMixin, ListView):
     model = JobApplication
     template_name = 'refugees/job_application_list.html'
     context_object_name = 'applications'
+    keyset_field = 'applied_at'
+    
+    def get_freshness_scopes(self):
+        # The list shows each application's job alongside it
+        if self.request.user.user_type == 'ngo':
+            ngo_id = self.request.user.ngo.pk
+            return [f'job_applications:ngo:{ngo_id}', f'jobs:ngo:{ngo_id}']
+        return ['job_applications', 'jobs']
     
     def get_queryset(self):
+        queryset = JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS)
         if self.request.user.user_type == 'refugee':
-            return JobApplication.objects.filter(refugee=self.request.user.refugee)
+            return queryset.filter(refugee=self.request.user.refugee)
         elif self.request.user.user_type == 'ngo':
-            return JobApplication.objects.filter(job__ngo=self.request.user.ngo)
+            return queryset.filter(job__ngo=self.request.user.ngo)
         elif self.request.user.user_type == 'admin':
-            return JobApplication.objects.all()
+            return queryset.all()
         return JobApplication.objects.none()
     
     def get_context_data(self, **kwargs):
@@ -467,18 +613,27 @@ def apply_for_housing(request, pk):
         'housing': housing
     })
 
-class HousingApplicationListView(LoginRequiredMixin, ListView):
+class HousingApplicationListView(ReadReplicaMixin, LoginRequiredMixin, KeysetPaginationMixin, ConditionalGetMixin, ListView):
     model = HousingApplication
     template_name = 'refugees/housing_application_list.html'
     context_object_name = 'applications'
+    keyset_field = 'application_date'
+    
+    def get_freshness_scopes(self):
+        # The list shows each application's housing alongside it
+        if self.request.user.user_type == 'ngo':
+            ngo_id = self.request.user.ngo.pk
+            return [f'housing_applications:ngo:{ngo_id}', f'housing:ngo:{ngo_id}']
+        return ['housing_applications', 'housing']
     
     def get_queryset(self):
+        queryset = HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS)
         if self.request.user.user_type == 'refugee':
-            return HousingApplication.objects.filter(refugee=self.request.user.refugee)
+            return queryset.filter(refugee=self.request.user.refugee)
         elif self.request.user.user_type == 'ngo':
-            return HousingApplication.objects.filter(housing__ngo=self.request.user.ngo)
+            return queryset.filter(housing__ngo=self.request.user.ngo)
         elif self.request.user.user_type == 'admin':
-            return HousingApplication.objects.all()
+            return queryset.all()
         return HousingApplication.objects.none()
     
     def get_context_data(self, **kwargs):
@@ -502,7 +657,7 @@ def update_housing_application_status(request, pk, status):
         messages.error(request, 'You do not have permission to update application status.')
         return redirect('dashboard')
     
-    application = get_object_or_404(HousingApplication, pk=pk)
+    application = get_object_or_404(HousingApplication.objects.select_related(*HOUSING_APPLICATION_RELATIONS), pk=pk)
     
     # Check if the user has permission to update this application
     if request.user.user_type == 'ngo' and application.housing.ngo != request.user.ngo:
@@ -513,18 +668,20 @@ def update_housing_application_status(request, pk, status):
         messages.error(request, 'Invalid status.')
         return redirect('housing_application_list')
     
-    application.status = status
-    application.save()
-    
-    if status == 'approved':
-        # Update housing status to occupied
-        housing = application.housing
-        housing.status = 'occupied'
-        housing.save()
-        messages.success(request, f'Housing application for {application.refugee.user.get_full_name()} has been approved.')
-    else:
-        messages.success(request, f'Housing application for {application.refugee.user.get_full_name()} has been rejected.')
+    # Decide under lock so concurrent approvals cannot overfill the housing; the refugee
+    # is notified by a background task queued in the same transaction
+    try:
+        with transaction.atomic():
+            if status == 'approved':
+                approve_housing_application(application.pk)
+            else:
+                reject_housing_application(application.pk)
+            enqueue('notify_housing_decision', application_id=application.pk)
+    except ApprovalError as error:
+        messages.error(request, str(error))
+        return redirect('housing_application_list')
     
+    messages.success(request, f'Housing application for {application.refugee.user.get_full_name()} has been {status}.')
     return redirect('housing_application_list')
 
 @login_required
@@ -533,7 +690,7 @@ def update_job_application_status(request, pk, status):
         messages.error(request, 'You do not have permission to update application status.')
         return redirect('dashboard')
     
-    application = get_object_or_404(JobApplication, pk=pk)
+    application = get_object_or_404(JobApplication.objects.select_related(*JOB_APPLICATION_RELATIONS), pk=pk)
     
     # Check if the user has permission to update this application
     if request.user.user_type == 'ngo' and application.job.ngo != request.user.ngo:
@@ -544,8 +701,86 @@ def update_job_application_status(request, pk, status):
         messages.error(request, 'Invalid status.')
         return redirect('job_application_list')
     
-    application.status = status
-    application.save()
+    with transaction.atomic():
+        application.status = status
+        application.save()
+        enqueue('notify_job_decision', application_id=application.pk)
     
     messages.success(request, f'Job application for {application.refugee.user.get_full_name()} has been {status}.')
     return redirect('job_application_list')
+
+@login_required
+def housing_allocation(request):
+    if request.user.user_type not in ['admin', 'ngo']:
+        messages.error(request, 'You do not have permission to allocate housing.')
+        return redirect('dashboard')
+    
+    ngo = None
+    if request.user.user_type == 'ngo':
+        try:
+            ngo = request.user.ngo
+        except NGO.DoesNotExist:
+            messages.error(request, 'Please complete your NGO profile first.')
+            return redirect('create_ngo_profile')
+    
+    if request.method == 'POST':
+        application_ids = [pk for pk in request.POST.getlist('application') if pk.isdigit()]
+        with transaction.atomic():
+            approved, skipped = apply_allocation(application_ids, ngo=ngo)
+            for application in approved:
+                enqueue('notify_housing_decision', application_id=application.pk)
+        housed = sum(application.refugee.family_size for application in approved)
+        messages.success(request, f'Approved {len(approved)} housing applications, housing {housed} people.')
+        if skipped:
+            messages.warning(request, f'{len(skipped)} applications could no longer be approved and were left unchanged.')
+        return redirect('housing_application_list')
+    
+    return render(request, 'refugees/housing_allocation.html', {
+        'allocation': propose_allocation(ngo=ngo),
+    })
+
+def list_view_queryset(view_class, request):
+    """Rows a list view would show this request, including ?q= search but without its result cap"""
+    view = view_class()
+    view.setup(request)
+    view.search_limit = None
+    queryset = view.get_queryset()
+    if isinstance(view, SearchMixin) and view.get_search_query():
+        # Drop the rank ordering so callers can re-order and filter freely
+        queryset = view.model.objects.filter(pk__in=queryset.values('pk'))
+    return queryset
+
+# List view whose queryset scopes each export to what the requesting user may see
+EXPORT_VIEWS = {
+    'refugees': RefugeeListView,
+    'housing': HousingListView,
+    'jobs': JobListView,
+    'housing-applications': HousingApplicationListView,
+    'job-applications': JobApplicationListView,
+}
+
+@login_required
+def export_data(request, dataset, file_format):
+    if request.user.user_type not in ['admin', 'ngo']:
+        messages.error(request, 'Only administrators and NGOs can export data.')
+        return redirect('dashboard')
+    if dataset not in EXPORTS or file_format not in EXPORT_FORMATS:
+        raise Http404('No such export.')
+    spec = EXPORTS[dataset]
+
+    queryset = list_view_queryset(EXPORT_VIEWS[dataset], request)
+
+    requested = [column for column in request.GET.get('columns', '').split(',') if column]
+    try:
+        columns = spec.select_columns(requested)
+        queryset = filter_export(spec, queryset, request.GET)
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+
+    response = StreamingHttpResponse(
+        stream_export(file_format, columns, export_rows(spec, queryset, columns)),
+        content_type=EXPORT_FORMATS[file_format],
+    )
+    filename = f'{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response